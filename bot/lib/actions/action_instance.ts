@@ -12,6 +12,7 @@ export abstract class ActionInstance {
 
   private wrappedMessage: string = '';
   private wrappedState: ActionInstanceState = ActionInstanceState.READY;
+  private wrappedUpdatedTime: Date = new Date();
 
   constructor(
       readonly id: string, readonly actionName: string,
@@ -36,6 +37,10 @@ export abstract class ActionInstance {
     return this.wrappedState;
   }
 
+  get updatedTime(): Date {
+    return this.wrappedUpdatedTime;
+  }
+
   /**
    * Cancels the action instance.
    */
@@ -49,6 +54,7 @@ export abstract class ActionInstance {
     await this.cancelRun();
 
     this.wrappedState = ActionInstanceState.CANCELED;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('cancel', this);
     consola.log(`action ${this.actionName}#${this.id} canceled`);
   }
@@ -65,6 +71,7 @@ export abstract class ActionInstance {
     await this.pauseRun();
 
     this.wrappedState = ActionInstanceState.PAUSED;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('pause', this);
     consola.log(`action ${this.actionName}#${this.id} paused`);
   }
@@ -85,6 +92,7 @@ export abstract class ActionInstance {
     await this.resumeRun();
 
     this.wrappedState = ActionInstanceState.RUNNING;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('resume', this);
     consola.log(`action ${this.actionName}#${this.id} resumed`);
   }
@@ -105,6 +113,7 @@ export abstract class ActionInstance {
     await this.startRun();
 
     this.wrappedState = ActionInstanceState.RUNNING;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('start', this);
     consola.log(`action ${this.actionName}#${this.id} started`);
   }
@@ -114,6 +123,7 @@ export abstract class ActionInstance {
   protected fail(reason: string): void {
     this.wrappedMessage = reason;
     this.wrappedState = ActionInstanceState.FAILED;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('fail', this, reason);
     consola.log(`action ${this.actionName}#${this.id} failed: ${reason}`);
   }
@@ -126,6 +136,7 @@ export abstract class ActionInstance {
 
   protected succeed(): void {
     this.wrappedState = ActionInstanceState.SUCCEEDED;
+    this.wrappedUpdatedTime = new Date();
     this.eventEmitter.emit('succeed', this);
     consola.log(`action ${this.actionName}#${this.id} succeeded`);
   }
@@ -1,4 +1,5 @@
 import consola from 'consola';
+import EventEmitter from 'events';
 import minecraftData from 'minecraft-data';
 import mineflayer from 'mineflayer';
 import collectblock from 'mineflayer-collectblock';
@@ -12,10 +13,14 @@ import {ActionInstanceState} from './actions/action_instance_state.js';
 import {Arg} from './arg.js';
 import {BotEvent} from './events/bot_event.js';
 import {ChatEvent} from './events/chat_event.js';
+import {JobEvent} from './events/job_event.js';
 import {WhisperEvent} from './events/whisper_event.js';
+import {ObservationHistory} from './observation_history.js';
 
 export class Bot {
+  readonly eventEmitter = new EventEmitter();
   readonly mcdata: minecraftData.IndexedData;
+  readonly observationHistory = new ObservationHistory();
 
   private actions: Record<string, Action> = {};
   private events: BotEvent[] = [];
@@ -75,7 +80,13 @@ export class Bot {
     }
     const action = this.actions[actionName];
 
-    this.jobs[id] = action.instantiate(id, args, this);
+    const job = action.instantiate(id, args, this);
+    for (const name of
+             ['start', 'pause', 'resume', 'cancel', 'fail', 'succeed']) {
+      job.eventEmitter.on(name, () => this.onJobEvent(job));
+    }
+
+    this.jobs[id] = job;
 
     return id;
   }
@@ -152,6 +163,15 @@ export class Bot {
     return false;
   }
 
+  /**
+   * Records an event and notifies event subscribers.
+   * @param event The event.
+   */
+  private addEvent(event: BotEvent): void {
+    this.events.push(event);
+    this.eventEmitter.emit('event', event);
+  }
+
   private createMineflayerBot(
       host: string, port: number, username: string,
       version: string): mineflayer.Bot {
@@ -207,11 +227,43 @@ export class Bot {
         ],
         new Date());
 
-    this.events.push(event);
+    this.addEvent(event);
     consola.log(`event ${event.name}#${event.id} {username: ${
         username}, message: ${message}}`);
   }
 
+  private onJobEvent(job: ActionInstance): void {
+    const event = new JobEvent(
+        nanoid(),
+        [
+          {
+            name: 'id',
+            value: job.id,
+          },
+          {
+            name: 'action',
+            value: job.actionName,
+          },
+          {
+            name: 'args',
+            value: Object.values(job.args),
+          },
+          {
+            name: 'state',
+            value: job.state,
+          },
+          {
+            name: 'message',
+            value: job.message,
+          }
+        ],
+        new Date());
+
+    this.addEvent(event);
+    consola.log(`event ${event.name}#${event.id} {id: ${job.id}, state: ${
+        job.state}}`);
+  }
+
   private onWhisperEvent(username: string, message: string): void {
     const event = new WhisperEvent(
         nanoid(),
@@ -227,7 +279,7 @@ export class Bot {
         ],
         new Date());
 
-    this.events.push(event);
+    this.addEvent(event);
     consola.log(`event ${event.name}#${event.id} {username: ${
         username}, message: ${message}}`);
   }
@@ -0,0 +1,41 @@
+import {Arg} from '../arg.js';
+
+import {BotEvent} from './bot_event.js';
+
+const NAME = 'job';
+
+const DESCRIPTION = 'A job changes its state.';
+
+const PARAMETERS = [
+  {
+    name: 'id',
+    description: 'The ID of the job.',
+    type: 'string',
+  },
+  {
+    name: 'action',
+    description: 'The action name of the job.',
+    type: 'string',
+  },
+  {
+    name: 'args',
+    description: 'The arguments of the job.',
+    type: 'object',
+  },
+  {
+    name: 'state',
+    description: 'The new state of the job.',
+    type: 'string',
+  },
+  {
+    name: 'message',
+    description: 'The message of the job.',
+    type: 'string',
+  }
+];
+
+export class JobEvent extends BotEvent {
+  constructor(id: string, args: ReadonlyArray<Arg>, updated: Date) {
+    super(id, NAME, DESCRIPTION, args, PARAMETERS, updated);
+  }
+}
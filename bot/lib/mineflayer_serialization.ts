@@ -24,7 +24,7 @@ export interface SerializedBot {
   readonly quickBarSlot: number;
   readonly isSleeping: boolean;
   readonly biome?: SerializedBiome;
-  readonly blocksNearby: ReadonlyArray<SerializedBlock>;
+  readonly blocksNearby: ReadonlyArray<SerializedBlockCount>;
 }
 
 export interface SerializedBiome {
@@ -39,6 +39,10 @@ export interface SerializedBlock {
   readonly displayName: string;
 }
 
+export interface SerializedBlockCount extends SerializedBlock {
+  readonly count: number;
+}
+
 export interface SerializedBlockDetailed extends SerializedBlock {
   readonly biome: SerializedBiome;
   readonly position: Vec3;
@@ -155,6 +159,7 @@ function botToJson(bot: Bot): SerializedBot {
       const blocks: Record < string, {
         name: string;
         displayName: string;
+        count: number;
       }
       > = {};
 
@@ -164,10 +169,14 @@ function botToJson(bot: Bot): SerializedBot {
             const block = bot.blockAt(position.offset(x, y, z));
 
             if (block !== null) {
-              blocks[block.name] = {
-                name: block.name,
-                displayName: block.displayName,
-              };
+              if (blocks[block.name] === undefined) {
+                blocks[block.name] = {
+                  name: block.name,
+                  displayName: block.displayName,
+                  count: 0,
+                };
+              }
+              blocks[block.name].count++;
             }
           }
         }
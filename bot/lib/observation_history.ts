@@ -0,0 +1,132 @@
+import {nanoid} from 'nanoid';
+
+import {SerializedBlockCount, SerializedBot, SerializedEntity} from './mineflayer_serialization.js';
+
+/**
+ * The changes between two observations. Entities and nearby blocks are diffed
+ * one by one, other fields as a whole.
+ */
+export interface ObservationDelta {
+  // Fields other than entities and blocksNearby that were added or changed.
+  readonly fields: Readonly<Record<string, unknown>>;
+  readonly removedFields: ReadonlyArray<string>;
+  // Entities that were added or changed, e.g. moved, keyed by id.
+  readonly entities: Readonly<Record<string, SerializedEntity>>;
+  readonly removedEntities: ReadonlyArray<string>;
+  // Nearby blocks that were added or whose counts changed.
+  readonly blocksNearby: ReadonlyArray<SerializedBlockCount>;
+  readonly removedBlocksNearby: ReadonlyArray<string>;
+}
+
+/**
+ * An observation with its parts serialized, so that they are compared as
+ * strings and serialized only once.
+ */
+interface Revision {
+  readonly id: string;
+  readonly fields: Readonly<Record<string, string>>;
+  readonly entities: Readonly<Record<string, string>>;
+  readonly blocksNearby: Readonly<Record<string, string>>;
+}
+
+/**
+ * The latest observations sent to clients, so that a client can be sent only
+ * the changes since the observation it has.
+ */
+export class ObservationHistory {
+  private revisions: Revision[] = [];
+
+  /**
+   * @param capacity The number of observations kept, so that as many clients
+   *     observing at once can be sent deltas.
+   */
+  constructor(readonly capacity: number = 8) {}
+
+  /**
+   * Records an observation.
+   * @param observation The observation.
+   * @returns The revision of the observation.
+   */
+  add(observation: SerializedBot): string {
+    const fields: Record<string, string> = {};
+    for (const [key, value] of Object.entries(observation)) {
+      if (key !== 'entities' && key !== 'blocksNearby' && value !== undefined) {
+        fields[key] = JSON.stringify(value);
+      }
+    }
+
+    const entities: Record<string, string> = {};
+    for (const [id, entity] of Object.entries(observation.entities)) {
+      entities[id] = JSON.stringify(entity);
+    }
+
+    const blocksNearby: Record<string, string> = {};
+    for (const block of observation.blocksNearby) {
+      blocksNearby[block.name] = JSON.stringify(block);
+    }
+
+    const revision = {
+      id: nanoid(),
+      fields: fields,
+      entities: entities,
+      blocksNearby: blocksNearby,
+    };
+
+    this.revisions.push(revision);
+    if (this.revisions.length > this.capacity) {
+      this.revisions.shift();
+    }
+
+    return revision.id;
+  }
+
+  /**
+   * Gets the changes from an earlier observation to the latest one.
+   * @param since The revision of the earlier observation.
+   * @returns The changes, or undefined if the revision is no longer kept.
+   */
+  getDelta(since: string): ObservationDelta|undefined {
+    const base = this.revisions.find((revision) => revision.id === since);
+    if (base === undefined) {
+      return undefined;
+    }
+    const latest = this.revisions[this.revisions.length - 1];
+
+    const [fields, removedFields] = diff(base.fields, latest.fields);
+    const [entities, removedEntities] = diff(base.entities, latest.entities);
+    const [blocksNearby, removedBlocksNearby] =
+        diff(base.blocksNearby, latest.blocksNearby);
+
+    return {
+      fields: fields,
+      removedFields: removedFields,
+      entities: entities as Record<string, SerializedEntity>,
+      removedEntities: removedEntities,
+      blocksNearby: Object.values(blocksNearby) as SerializedBlockCount[],
+      removedBlocksNearby: removedBlocksNearby,
+    };
+  }
+}
+
+/**
+ * Diffs two maps of serialized values.
+ * @param base The earlier values.
+ * @param latest The latest values.
+ * @returns The added or changed values, deserialized, and the removed keys.
+ */
+function diff(
+    base: Readonly<Record<string, string>>,
+    latest: Readonly<Record<string, string>>):
+    [Record<string, unknown>, string[]] {
+  const changed: Record<string, unknown> = {};
+  for (const [key, value] of Object.entries(latest)) {
+    if (base[key] !== value) {
+      changed[key] = JSON.parse(value);
+    }
+  }
+
+  const removed =
+      Object.keys(base).filter((key) => !Object.hasOwn(latest, key));
+
+  return [changed, removed];
+}
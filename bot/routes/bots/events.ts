@@ -3,11 +3,24 @@ import assert from "assert";
 import consola from "consola";
 import express from "express";
 
-import {} from "../../lib/events/bot_event.js";
+import { BotEvent } from "../../lib/events/bot_event.js";
 import { Bot } from "../../lib/bot.js";
 
 export const router = express.Router();
 
+// The interval of comments sent to keep idle event streams alive.
+const STREAM_HEARTBEAT_INTERVAL = 15000;
+
+function serializeEvent(event: BotEvent) {
+  return {
+    id: event.id,
+    name: event.name,
+    description: event.description,
+    updated: new Date(event.updatedTime).toISOString(),
+    args: event.args,
+  };
+}
+
 router.route("/").get((req, res) => {
   try {
     const bot: Bot = req.app.locals.bot;
@@ -25,15 +38,7 @@ router.route("/").get((req, res) => {
         data: {
           items: events
             .filter((event) => new Date(event.updatedTime) > sinceDate) // 过滤更新时间在 since 之后的事件
-            .map((event) => {
-              return {
-                id: event.id,
-                name: event.name,
-                description: event.description,
-                updated: new Date(event.updatedTime).toISOString(),
-                args: event.args,
-              };
-            }),
+            .map(serializeEvent),
         },
       });
     } else {
@@ -55,3 +60,75 @@ router.route("/").get((req, res) => {
     });
   }
 });
+
+// Streams events as server-sent events. Every message carries the same payload
+// as GET / with the events that occurred since the previous message. The first
+// message holds the events that occurred after the since parameter, if given.
+router.route("/stream").get((req, res) => {
+  try {
+    const bot: Bot = req.app.locals.bot;
+    const since: string | undefined = req.query.since as string | undefined;
+
+    const sinceDate = since !== undefined ? new Date(since) : new Date();
+    if (isNaN(sinceDate.getTime())) {
+      return res.status(400).send({
+        apiVersion: "0.0.0",
+        error: {
+          code: 400,
+          message: `'since' cannot be parsed as a date.`,
+        },
+      });
+    }
+
+    const send = (events: ReadonlyArray<BotEvent>) => {
+      res.write(
+        `data: ${JSON.stringify({
+          apiVersion: "0.0.0",
+          data: {
+            items: events.map(serializeEvent),
+          },
+        })}\n\n`
+      );
+    };
+
+    res.status(200).set({
+      "Content-Type": "text/event-stream",
+      "Cache-Control": "no-cache",
+      Connection: "keep-alive",
+    });
+    res.flushHeaders();
+
+    const backlog = bot
+      .getEvents()
+      .filter((event) => new Date(event.updatedTime) > sinceDate);
+    if (backlog.length > 0) {
+      send(backlog);
+    }
+
+    const onEvent = (event: BotEvent) => send([event]);
+    bot.eventEmitter.on("event", onEvent);
+
+    const heartbeat = setInterval(() => {
+      res.write(": heartbeat\n\n");
+    }, STREAM_HEARTBEAT_INTERVAL);
+
+    req.on("close", () => {
+      clearInterval(heartbeat);
+      bot.eventEmitter.off("event", onEvent);
+    });
+  } catch (error) {
+    assert(error instanceof Error);
+
+    consola.error(`Error: ${error.message}`);
+    if (res.headersSent) {
+      return res.end();
+    }
+    return res.status(500).send({
+      apiVersion: "0.0.0",
+      error: {
+        code: 500,
+        message: `Internal server error occured.`,
+      },
+    });
+  }
+});
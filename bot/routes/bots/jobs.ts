@@ -3,11 +3,23 @@ import assert from 'assert';
 import consola from 'consola';
 import express from 'express';
 
+import {ActionInstance} from '../../lib/actions/action_instance.js';
 import {ActionInstanceState} from '../../lib/actions/action_instance_state.js';
 import {Bot} from '../../lib/bot.js';
 
 export const router = express.Router();
 
+function serializeJob(job: ActionInstance) {
+  return {
+    id: job.id,
+    action: job.actionName,
+    args: Object.values(job.args),
+    state: job.state,
+    message: job.message,
+    updated: job.updatedTime.toISOString(),
+  };
+}
+
 router.route('/').post((req, res) => {
   try {
     const bot: Bot = req.app.locals.bot;
@@ -217,24 +229,83 @@ router.route('/:jobID/:operation')
           }
         }) as express.RequestHandler);
 
+router.route('/:jobID').get((req, res) => {
+  try {
+    const bot: Bot = req.app.locals.bot;
+
+    const job = bot.getJob(req.params.jobID);
+    if (job === undefined) {
+      return res.status(404).send({
+        apiVersion: '0.0.0',
+        error: {
+          code: 404,
+          message: `Job ID not found!`,
+        },
+      });
+    }
+
+    return res.status(200).send({
+      apiVersion: '0.0.0',
+      data: serializeJob(job),
+    });
+  } catch (error) {
+    assert(error instanceof Error);
+
+    consola.error(`Error: ${error.message}`);
+    return res.status(500).send({
+      apiVersion: '0.0.0',
+      error: {
+        code: 500,
+        message: `Internal server error occured.`,
+      },
+    });
+  }
+});
+
+// Lists jobs, optionally filtered by a comma-separated list of states and by
+// the time of their last state change, in the order they were created. Pages
+// are selected with offset and limit; next is the offset of the next page, or
+// null if there are no more jobs.
 router.route('/').get((req, res) => {
   try {
     const bot: Bot = req.app.locals.bot;
 
-    const jobs = bot.getJobs();
+    const states = req.query.states as string | undefined;
+    const since = req.query.since as string | undefined;
+    const offset = parseInt((req.query.offset as string | undefined) ?? '0');
+    const limit = req.query.limit === undefined ?
+        undefined :
+        parseInt(req.query.limit as string);
+
+    const sinceDate = since === undefined ? undefined : new Date(since);
+    if ((sinceDate !== undefined && isNaN(sinceDate.getTime())) ||
+        isNaN(offset) || offset < 0 ||
+        (limit !== undefined && (isNaN(limit) || limit < 1))) {
+      return res.status(400).send({
+        apiVersion: '0.0.0',
+        error: {
+          code: 400,
+          message: `The request is invalid.`,
+        },
+      });
+    }
+
+    const stateSet =
+        states === undefined ? undefined : new Set(states.split(','));
+
+    const jobs = bot.getJobs().filter((job) => {
+      return (stateSet === undefined || stateSet.has(job.state)) &&
+          (sinceDate === undefined || job.updatedTime > sinceDate);
+    });
+
+    const end = limit === undefined ? jobs.length : offset + limit;
 
     return res.status(200).send({
       apiVersion: '0.0.0',
       data: {
-        items: jobs.map((job) => {
-          return {
-            id: job.id,
-            action: job.actionName,
-            args: Object.values(job.args),
-            state: job.state,
-            message: job.message,
-          };
-        }),
+        items: jobs.slice(offset, end).map(serializeJob),
+        total: jobs.length,
+        next: end < jobs.length ? end : null,
       },
     });
   } catch (error) {
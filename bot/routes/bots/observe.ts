@@ -36,6 +36,11 @@ router.route('/').post((req, res) => {
         },
         'data': {
           'type': 'object',
+          'properties': {
+            'revision': {
+              'type': 'string',
+            },
+          },
         }
       },
       'required': ['apiVersion', 'data'],
@@ -53,10 +58,30 @@ router.route('/').post((req, res) => {
       });
     }
 
+    const observation = createSerializedBot(bot.mineflayerBot);
+    const revision = bot.observationHistory.add(observation);
+
+    // Send only the changes if the client has an observation still kept.
+    const since: string|undefined = responseJson.data.revision;
+    const delta = since !== undefined ?
+        bot.observationHistory.getDelta(since) :
+        undefined;
+    if (delta !== undefined) {
+      return res.status(200).send({
+        apiVersion: '0.0.0',
+        data: {
+          revision: revision,
+          baseRevision: since,
+          delta: delta,
+        },
+      });
+    }
+
     return res.status(200).send({
       apiVersion: '0.0.0',
       data: {
-        bot: createSerializedBot(bot.mineflayerBot),
+        revision: revision,
+        bot: observation,
       },
     });
 
@@ -4,7 +4,8 @@
 
 import dotenv
 
-from policymaker import PolicyMaker
+from policymaker import PolicyMaker, ValidationMode
+from policymaker.models import backends
 
 
 async def main():
@@ -15,6 +16,21 @@ async def main():
     log_level = os.environ.get("LOG_LEVEL", "INFO")
     openai_api_key = os.environ.get("OPENAI_API_KEY", None)
     registry_address = os.environ.get("REGISTRY_ADDRESS", None)
+    num_bots = os.environ.get("NUM_BOTS", "1")
+    validation_mode = os.environ.get("VALIDATION_MODE", "strict")
+    validation_sample_rate = os.environ.get("VALIDATION_SAMPLE_RATE", "10")
+    observation_max_tokens = os.environ.get("OBSERVATION_MAX_TOKENS", "256")
+    model_cache_ttl = os.environ.get("MODEL_CACHE_TTL", "0")
+    model_cache_path = os.environ.get("MODEL_CACHE_PATH", None)
+    model_requests_per_minute = os.environ.get("MODEL_REQUESTS_PER_MINUTE", "3500")
+    model_tokens_per_minute = os.environ.get("MODEL_TOKENS_PER_MINUTE", "90000")
+    model_max_concurrency = os.environ.get("MODEL_MAX_CONCURRENCY", "8")
+    model_max_retries = os.environ.get("MODEL_MAX_RETRIES", "5")
+    model_backend = os.environ.get("MODEL_BACKEND", "openai")
+    model_name = os.environ.get("MODEL_NAME", None)
+    model_base_url = os.environ.get("MODEL_BASE_URL", None)
+    model_replay_path = os.environ.get("MODEL_REPLAY_PATH", None)
+    model_record_path = os.environ.get("MODEL_RECORD_PATH", None)
 
     setup_logging(log_level)
 
@@ -23,15 +39,79 @@ async def main():
     if bot_port.isdigit() is False:
         raise ValueError("BOT_PORT environment variable is not a digit string")
 
-    if openai_api_key is None:
+    if model_backend not in backends.get_backends():
+        raise ValueError(f"invalid model backend: {model_backend}")
+
+    if model_backend == "openai" and openai_api_key is None:
         raise ValueError("OPENAI_API_KEY environment variable not set")
 
+    if model_backend == "local" and model_base_url is None:
+        raise ValueError("MODEL_BASE_URL environment variable not set")
+
+    if model_backend == "replay" and model_replay_path is None:
+        raise ValueError("MODEL_REPLAY_PATH environment variable not set")
+
+    if model_backend == "replay" and model_record_path is not None:
+        raise ValueError("MODEL_RECORD_PATH cannot be set with the replay backend")
+
+    if num_bots.isdigit() is False:
+        raise ValueError("NUM_BOTS environment variable is not a digit string")
+
+    if validation_mode not in [mode.value for mode in ValidationMode]:
+        raise ValueError(f"invalid validation mode: {validation_mode}")
+
+    if validation_sample_rate.isdigit() is False:
+        raise ValueError(
+            "VALIDATION_SAMPLE_RATE environment variable is not a digit string"
+        )
+
+    if observation_max_tokens.isdigit() is False:
+        raise ValueError(
+            "OBSERVATION_MAX_TOKENS environment variable is not a digit string"
+        )
+
+    if model_cache_ttl.isdigit() is False:
+        raise ValueError("MODEL_CACHE_TTL environment variable is not a digit string")
+
+    if model_requests_per_minute.isdigit() is False:
+        raise ValueError(
+            "MODEL_REQUESTS_PER_MINUTE environment variable is not a digit string"
+        )
+
+    if model_tokens_per_minute.isdigit() is False:
+        raise ValueError(
+            "MODEL_TOKENS_PER_MINUTE environment variable is not a digit string"
+        )
+
+    if model_max_concurrency.isdigit() is False:
+        raise ValueError(
+            "MODEL_MAX_CONCURRENCY environment variable is not a digit string"
+        )
+
+    if model_max_retries.isdigit() is False:
+        raise ValueError("MODEL_MAX_RETRIES environment variable is not a digit string")
+
     policy_maker = PolicyMaker(
         {
             "bot_host": bot_host,
             "bot_port": int(bot_port),
             "openai_api_key": openai_api_key,
             "registry_address": registry_address,
+            "num_bots": int(num_bots),
+            "validation_mode": ValidationMode(validation_mode),
+            "validation_sample_rate": int(validation_sample_rate),
+            "observation_max_tokens": int(observation_max_tokens),
+            "model_cache_ttl": int(model_cache_ttl),
+            "model_cache_path": model_cache_path,
+            "model_requests_per_minute": int(model_requests_per_minute),
+            "model_tokens_per_minute": int(model_tokens_per_minute),
+            "model_max_concurrency": int(model_max_concurrency),
+            "model_max_retries": int(model_max_retries),
+            "model_backend": model_backend,
+            "model_name": model_name,
+            "model_base_url": model_base_url,
+            "model_replay_path": model_replay_path,
+            "model_record_path": model_record_path,
         }
     )
 
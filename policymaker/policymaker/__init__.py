@@ -1,6 +1,8 @@
+from .bot_apis.validation import ValidationMode
 from .policy_maker import PolicyMaker, PolicyMakerOptions
 
 __all__ = [
     "PolicyMaker",
     "PolicyMakerOptions",
+    "ValidationMode",
 ]
@@ -1,38 +1,157 @@
 import asyncio
 import logging
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import Any, Dict, List, NotRequired, Optional, TypedDict
 
 from policymaker.bot_apis.observation_data import ObservationData
 
 from .bot import Bot
-from .models.gpt35turbo_wrapper import GPT35TurboWrapper
-from .prompts.prompt_yield_jobs import PromptYieldJobs
+from .models import backends
+from .models.cached_model_wrapper import CachedModelWrapper
+from .models.model_wrapper import ModelWrapper
+from .models.rate_limited_model_wrapper import RateLimitedModelWrapper
+from .prompts.observation_encoder import ObservationEncoder
+from .prompts.prompt_yield_jobs import AnswerItem, PromptYieldJobs
 
 
 class AgentOptions(TypedDict):
     """Options for the language model agent.
 
     Attributes:
-        openai_api_key: The OpenAI API key.
+        openai_api_key: The OpenAI API key, or the API key of the local server,
+            if any.
+        observation_max_tokens: The token budget of the observation in each
+            prompt.
+        model_cache_ttl: The number of seconds answers of the model are reused
+            for identical prompts, or 0 to disable the cache.
+        model_cache_path: The path of the SQLite database keeping answers of the
+            model across runs, or None to keep them in memory only.
+        model_requests_per_minute: The quota of requests to the model per minute,
+            or 0 for no quota.
+        model_tokens_per_minute: The quota of tokens sent to and received from the
+            model per minute, or 0 for no quota.
+        model_max_concurrency: The maximum number of requests to the model in
+            flight.
+        model_max_retries: The number of times a request to the model failing
+            with a transient error is retried.
+        model_backend: The name of the backend serving the model, see
+            models.backends.
+        model_name: The name of the model, or None for the default of the
+            backend.
+        model_base_url: The URL of the API of the local backend.
+        model_replay_path: The path of the recorded answers of the replay
+            backend.
+        model_record_path: The path to record the answers of the model to, for
+            the replay backend, or None not to record them.
     """
 
-    openai_api_key: str
+    openai_api_key: Optional[str]
+    observation_max_tokens: NotRequired[int]
+    model_cache_ttl: NotRequired[float]
+    model_cache_path: NotRequired[Optional[str]]
+    model_requests_per_minute: NotRequired[int]
+    model_tokens_per_minute: NotRequired[int]
+    model_max_concurrency: NotRequired[int]
+    model_max_retries: NotRequired[int]
+    model_backend: NotRequired[str]
+    model_name: NotRequired[Optional[str]]
+    model_base_url: NotRequired[Optional[str]]
+    model_replay_path: NotRequired[Optional[str]]
+    model_record_path: NotRequired[Optional[str]]
 
 
 class Agent:
-    def __init__(self, options: AgentOptions, bot: Bot):
+    """An agent asking a language model for actions and performing them.
+
+    The agent runs as a pipeline of three concurrent stages: the observe stage
+    keeps the observation fresh, the think stage asks the model for a plan and
+    the act stage performs the actions of the plans. The next plan is made
+    while the last action of the current one is performed, and plans made
+    before an action failed are dropped.
+    """
+
+    _JOB_TIMEOUT: float = 300.0
+    _MAX_PENDING_PLANS: int = 1
+    _OBSERVE_INTERVAL: float = 1.0
+
+    def __init__(
+        self, options: AgentOptions, bot: Bot, model: Optional[ModelWrapper] = None
+    ):
+        """Initialize an agent.
+
+        Args:
+            options: The options for the agent.
+            bot: The bot to control.
+            model: A model shared with other agents, or None to create one from the
+                options.
+        """
+
         self._options: AgentOptions = options
 
         self._bot: Bot = bot
         self._is_running: bool = False
         self._logger = logging.getLogger("agent")
-        self._model = GPT35TurboWrapper(options["openai_api_key"])
+        self._model: ModelWrapper = (
+            model if model is not None else Agent.create_model(options)
+        )
         self._tasks: List[asyncio.Task] = []
 
         # Logic related stuff
         self._observation_data: Optional[ObservationData] = None
+        self._observation_encoder = ObservationEncoder(
+            options.get("observation_max_tokens", 256)
+        )
         self._prompt_yield_jobs = PromptYieldJobs()
 
+        # Pipeline related stuff
+        self._epoch: int = 0
+        self._observation_count: int = 0
+        self._observation_event: asyncio.Event = asyncio.Event()
+        self._plans: asyncio.Queue[_Plan] = asyncio.Queue(Agent._MAX_PENDING_PLANS)
+        self._think_event: asyncio.Event = asyncio.Event()
+        self._thinking_plan: Optional[_Plan] = None
+
+    @staticmethod
+    def create_model(options: AgentOptions) -> ModelWrapper:
+        """Creates the model of an agent.
+
+        Args:
+            options: The options for the agent.
+
+        Returns:
+            The model of the backend, rate limited unless it replays recorded
+            answers, and wrapped in a cache if enabled.
+        """
+
+        backend = options.get("model_backend", "openai")
+        model = backends.create_model(
+            backend,
+            {
+                "api_key": options["openai_api_key"],
+                "model_name": options.get("model_name", None),
+                "base_url": options.get("model_base_url", None),
+                "replay_path": options.get("model_replay_path", None),
+                "record_path": options.get("model_record_path", None),
+                # Retries are left to the rate limiter, which paces them.
+                "max_retries": 0,
+            },
+        )
+        if backend != "replay":
+            model = RateLimitedModelWrapper(
+                model,
+                requests_per_minute=options.get("model_requests_per_minute", 3500),
+                tokens_per_minute=options.get("model_tokens_per_minute", 90000),
+                max_concurrency=options.get("model_max_concurrency", 8),
+                max_retries=options.get("model_max_retries", 5),
+            )
+        if options.get("model_cache_ttl", 0) > 0:
+            model = CachedModelWrapper(
+                model,
+                ttl=options["model_cache_ttl"],
+                sqlite_path=options.get("model_cache_path", None),
+            )
+
+        return model
+
     async def start(self):
         """Starts the agent."""
 
@@ -41,7 +160,11 @@ async def start(self):
 
         assert len(self._tasks) == 0
 
-        self._tasks.append(asyncio.create_task(self._run()))
+        self._tasks.append(asyncio.create_task(self._observe_stage()))
+        self._tasks.append(asyncio.create_task(self._think_stage()))
+        self._tasks.append(asyncio.create_task(self._act_stage()))
+
+        self._is_running = True
 
     async def stop(self):
         """Stops the agent."""
@@ -52,8 +175,12 @@ async def stop(self):
         for task in self._tasks:
             task.cancel()
 
+        # Let the stages unwind before the plans they hold are cancelled.
+        await asyncio.gather(*self._tasks, return_exceptions=True)
         self._tasks.clear()
 
+        self._cancel_plans()
+
         self._is_running = False
 
     def _generate_prompt(self) -> str:
@@ -63,7 +190,7 @@ def _generate_prompt(self) -> str:
         # TODO: Generate the prompt.
 
         return self._prompt_yield_jobs.generate(
-            game_info=str(self._observation_data["blocksNearby"])
+            game_info=self._observation_encoder.encode(self._observation_data)
         )
 
     async def _perform_action(self, action: str, args: Dict[str, Any]):
@@ -71,42 +198,159 @@ async def _perform_action(self, action: str, args: Dict[str, Any]):
 
         await self._bot.start_job(job_id)
 
-        while True:
-            await asyncio.sleep(0)
+        try:
+            job = await self._bot.wait_for_job(job_id, Agent._JOB_TIMEOUT)
+
+        except asyncio.TimeoutError:
+            await self._bot.cancel_job(job_id)
+            raise RuntimeError(f"job {job_id} timed out")
+
+        if job["state"] == "FAILED":
+            raise RuntimeError(f"job {job_id} failed: {job['message']}")
 
-            job_data = await self._bot.get_jobs()
+    async def _read_answer(
+        self, prompt: str, items: asyncio.Queue[Optional[AnswerItem]]
+    ):
+        """Streams the answer to a prompt and queues its items as they complete.
 
-            for job_id in job_data:
-                job = job_data[job_id]
-                if job["id"] != job_id:
-                    continue
+        Args:
+            prompt: The prompt.
+            items: The queue of the items, ended with None.
+        """
 
-                if job["state"] == "CANCELED" or job["state"] == "SUCCEEDED":
-                    break
+        try:
+            async for item in self._prompt_yield_jobs.parse_answer_stream(
+                self._model.ask_stream(prompt)
+            ):
+                self._logger.info(f"{item}")
+                items.put_nowait(item)
 
-                elif job["state"] == "FAILED":
-                    raise RuntimeError(f"job {job_id} failed: {job['message']}")
+        finally:
+            items.put_nowait(None)
 
-    async def _run(self):
-        prompt_yield_jobs = PromptYieldJobs()
+    async def _observe_stage(self):
+        """Refreshes the observation continuously, so that it is up to date when a
+        plan is made."""
 
         while True:
             try:
-                await asyncio.sleep(1)
-
                 self._observation_data = await self._bot.observe()
+                self._observation_count += 1
+                self._observation_event.set()
+
+            except Exception as e:
+                self._logger.error(f"an error occurred while observing: {e}")
+
+            await asyncio.sleep(Agent._OBSERVE_INTERVAL)
+
+    async def _think_stage(self):
+        """Makes a plan from a fresh observation whenever the act stage is about to
+        run out of actions, i.e. when it starts the last action of its plan, when
+        it finishes its plan or when an action fails."""
+
+        while True:
+            await self._think_event.wait()
+            self._think_event.clear()
+            epoch = self._epoch
+
+            # Wait for an observation made after thinking was asked for, which may
+            # be while the last action of the previous plan is still running.
+            count = self._observation_count
+            while self._observation_count <= count:
+                self._observation_event.clear()
+                await self._observation_event.wait()
 
-                prompt = self._generate_prompt()
+            if epoch != self._epoch:
+                # An action failed meanwhile, and asked for another plan.
+                continue
 
-                # Ask the model for the answer.
-                ans_str = await self._model.ask(prompt)
+            try:
+                plan = _Plan(epoch, self._generate_prompt())
+
+            except Exception as e:
+                self._logger.error(f"an error occurred while making a plan: {e}")
+                self._think_event.set()
+                continue
+
+            plan.reader = asyncio.create_task(
+                self._read_answer(plan.prompt, plan.items)
+            )
+            self._thinking_plan = plan
+
+            # Wait for the act stage to take the previous plan, and for the answer.
+            await self._plans.put(plan)
+            await asyncio.wait([plan.reader])
+            self._thinking_plan = None
+
+            if not plan.reader.cancelled() and plan.reader.exception() is not None:
+                self._logger.error(
+                    "an error occurred while reading the answer:"
+                    f" {plan.reader.exception()}"
+                )
 
-                self._logger.info(f"{ans_str}")
+    async def _act_stage(self):
+        """Performs the actions of the plans in order, dropping plans made before an
+        action failed."""
 
-                ans = prompt_yield_jobs.parse_answer(ans_str)
+        self._think_event.set()
+
+        while True:
+            plan = await self._plans.get()
+            if plan.epoch != self._epoch:
+                plan.cancel()
+                continue
+
+            is_next_plan_asked = False
+            try:
+                while (item := await plan.items.get()) is not None:
+                    if plan.is_complete():
+                        # Think about the next plan while performing the last action.
+                        self._think_event.set()
+                        is_next_plan_asked = True
 
-                for item in ans["items"]:
                     await self._perform_action(item["action"], item["args"])
 
             except Exception as e:
-                self._logger.error(f"an error occurred while running the agent: {e}")
+                self._logger.error(f"an error occurred while performing actions: {e}")
+
+                # Plans made before the failure assume that it succeeded.
+                self._epoch += 1
+                plan.cancel()
+                self._cancel_plans()
+                is_next_plan_asked = False
+
+            if not is_next_plan_asked:
+                self._think_event.set()
+
+    def _cancel_plans(self):
+        """Cancels the plans being made or waiting to be performed."""
+
+        if self._thinking_plan is not None:
+            self._thinking_plan.cancel()
+
+        while not self._plans.empty():
+            self._plans.get_nowait().cancel()
+
+
+class _Plan:
+    """A plan made by the model, whose actions are queued as they are generated."""
+
+    def __init__(self, epoch: int, prompt: str):
+        self.epoch: int = epoch
+        self.prompt: str = prompt
+        self.items: asyncio.Queue[Optional[AnswerItem]] = asyncio.Queue()
+        self.reader: Optional[asyncio.Task] = None
+
+    def is_complete(self) -> bool:
+        """Checks whether the answer is complete and all of its actions were
+        taken from the queue, i.e. only its end is queued."""
+
+        return (
+            self.reader is not None and self.reader.done() and self.items.qsize() == 1
+        )
+
+    def cancel(self):
+        """Stops reading the answer."""
+
+        if self.reader is not None:
+            self.reader.cancel()
@@ -1,21 +1,35 @@
 import asyncio
 import copy
 import logging
-from datetime import datetime
-from typing import Any, Callable, Coroutine, Dict, List, TypedDict
-
+from datetime import datetime, timezone
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Coroutine,
+    Dict,
+    List,
+    NotRequired,
+    Optional,
+    TypedDict,
+)
+
+import aiohttp
 import jsonschema
 
 from policymaker.bot_apis.get_events_response import GetEventsResponse
 from policymaker.bot_apis.get_status_response import GetStatusResponse
 
 from .bot_apis.action_data import ActionData
+from .bot_apis.api_error import ApiError
 from .bot_apis.client import Client as BotApiClient
 from .bot_apis.event_data import EventData
 from .bot_apis.get_actions_response import GetActionsResponse
+from .bot_apis.get_job_response import GetJobResponse
 from .bot_apis.get_jobs_response import GetJobsResponse
 from .bot_apis.job_data import JobData
 from .bot_apis.observation_data import ObservationData
+from .bot_apis.observation_state import ObservationState
 from .bot_apis.post_actions_response import PostActionsResponse
 from .bot_apis.post_jobs_response import PostJobsResponse
 from .bot_apis.post_observe_response import PostObserveResponse
@@ -43,24 +57,52 @@ class BotOptions(TypedDict):
     Attributes:
         host: The host to connect to.
         port: The port to connect to.
+        connection_limit: The maximum number of pooled HTTP connections.
+        connection_limit_per_host: The maximum number of pooled HTTP connections to
+            the same host.
+        dns_cache_ttl: The number of seconds to cache resolved DNS entries for.
+        keepalive_timeout: The number of seconds to keep an idle connection alive.
+        event_stream: Whether to receive events from the bot's event stream rather
+            than polling for them. Falls back to polling if the bot has no stream.
+        delta_observations: Whether to observe only the changes since the last
+            observation. Falls back to full observations if the bot does not
+            support them.
     """
 
     host: str
     port: int
+    connection_limit: NotRequired[int]
+    connection_limit_per_host: NotRequired[int]
+    dns_cache_ttl: NotRequired[int]
+    keepalive_timeout: NotRequired[float]
+    event_stream: NotRequired[bool]
+    delta_observations: NotRequired[bool]
 
 
 class Bot:
     """A bot that can be run."""
 
+    _API_CLIENT_OPTION_KEYS: List[str] = [
+        "connection_limit",
+        "connection_limit_per_host",
+        "dns_cache_ttl",
+        "keepalive_timeout",
+    ]
     _BOT_NOT_RUNNING_ERROR_MESSAGE: str = "bot is not running"
+    _EVENT_STREAM_RECONNECT_DELAY: float = 1.0
+    _FINISHED_JOB_STATES: List[str] = ["CANCELED", "SUCCEEDED", "FAILED"]
     _UPDAVE_EVENTS_INTERVAL: float = 0.1
     _UPDATE_STATUS_INTERVAL: float = 0.1
 
-    def __init__(self, options: BotOptions):
+    def __init__(
+        self, options: BotOptions, session: Optional[aiohttp.ClientSession] = None
+    ):
         """Initialize a bot.
 
         Args:
             options: The options for the bot.
+            session: An HTTP session shared with other bots, or None for the bot to
+                own one.
         """
 
         self._options: BotOptions = copy.deepcopy(options)
@@ -69,15 +111,29 @@ def __init__(self, options: BotOptions):
             {
                 "host": self._options["host"],
                 "port": self._options["port"],
-            }
+                **{
+                    key: self._options[key]
+                    for key in Bot._API_CLIENT_OPTION_KEYS
+                    if key in self._options
+                },
+            },
+            session,
         )
         self._event_handlers: Dict[
             str, List[Callable[[EventData], Coroutine[Any, Any, None]]]
         ] = {}
+        self._events_cursor: datetime = datetime.now(timezone.utc)
         self._is_running: bool = False
+        # A map from job IDs to futures resolved when the jobs finish.
+        self._job_futures: Dict[str, asyncio.Future[JobData]] = {}
         self._logger = logging.getLogger("bot")
+        self._observation_state: ObservationState = ObservationState()
+        # Serializes observations, so that every delta applies to the latest one.
+        self._observe_lock: asyncio.Lock = asyncio.Lock()
         self._tasks: List[asyncio.Task] = []
 
+        self.on_event("job", self._on_job_event)
+
     async def start(self):
         """Starts the bot."""
 
@@ -86,6 +142,8 @@ async def start(self):
 
         assert len(self._tasks) == 0
 
+        await self._api_client.open()
+
         self._tasks.append(asyncio.create_task(self._update_events()))
         self._tasks.append(asyncio.create_task(self._update_status()))
 
@@ -100,8 +158,18 @@ async def stop(self):
         for task in self._tasks:
             task.cancel()
 
+        # Wait for the tasks to finish cancelling before closing the client they use.
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
         self._tasks.clear()
 
+        for future in self._job_futures.values():
+            future.cancel()
+
+        self._job_futures.clear()
+
+        await self._api_client.close()
+
         self._is_running = False
 
     async def create_action(
@@ -193,19 +261,126 @@ async def create_job(self, action: str, args: Dict[str, Any]) -> str:
 
         return response_data["id"]
 
-    async def get_jobs(self) -> Dict[str, JobData]:
-        """Gets all jobs.
+    async def get_job(self, job: str) -> JobData:
+        """Gets a job.
+
+        Args:
+            job: The ID of the job.
+
+        Returns:
+            The job.
+        """
+
+        if not self._is_running:
+            raise RuntimeError(Bot._BOT_NOT_RUNNING_ERROR_MESSAGE)
+
+        response_data = await self._api_client.get(f"/jobs/{job}")
+
+        return GetJobResponse(response_data).data()
+
+    async def get_jobs(
+        self,
+        states: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Dict[str, JobData]:
+        """Gets jobs, in the order they were created.
+
+        Args:
+            states: Only get jobs in these states, or all jobs if None.
+            since: Only get jobs whose state changed after this time, or all jobs if
+                None.
+            limit: The maximum number of jobs to get, or no limit if None.
+            offset: The number of matching jobs to skip.
 
         Returns:
             The jobs.
         """
 
+        return (await self._get_jobs_page(states, since, limit, offset)).data()
+
+    async def iter_jobs(
+        self,
+        states: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+        page_size: int = 100,
+    ) -> AsyncIterator[JobData]:
+        """Iterates over jobs page by page, in the order they were created.
+
+        Args:
+            states: Only get jobs in these states, or all jobs if None.
+            since: Only get jobs whose state changed after this time, or all jobs if
+                None.
+            page_size: The number of jobs to fetch per request.
+
+        Yields:
+            The jobs.
+        """
+
+        offset: Optional[int] = 0
+        while offset is not None:
+            response = await self._get_jobs_page(states, since, page_size, offset)
+
+            for job in response.data().values():
+                yield job
+
+            offset = response.next_offset()
+
+    async def wait_for_job(self, job: str, timeout: Optional[float] = None) -> JobData:
+        """Waits for a job to finish, i.e. to be canceled, to succeed or to fail.
+
+        The wait is driven by job events from the bot, so it costs no requests
+        besides one initial state check. Concurrent waits on the same job share
+        one future.
+
+        Args:
+            job: The ID of the job to wait for.
+            timeout: The maximum number of seconds to wait, or None to wait forever.
+
+        Returns:
+            The job in its final state.
+
+        Raises:
+            asyncio.TimeoutError: If the job does not finish within the timeout.
+        """
+
         if not self._is_running:
             raise RuntimeError(Bot._BOT_NOT_RUNNING_ERROR_MESSAGE)
 
-        response_data = await self._api_client.get("/jobs")
+        future = self._job_futures.get(job)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._job_futures[job] = future
+
+            # The job may have finished before the future was registered.
+            try:
+                job_data = await self.get_job(job)
+
+            except BaseException as e:
+                self._job_futures.pop(job, None)
+
+                error = e
+                if isinstance(e, ApiError) and e.code == 404:
+                    error = ValueError(f"job {job} does not exist")
+
+                # Concurrent waits sharing the future fail along.
+                if isinstance(e, asyncio.CancelledError):
+                    future.cancel()
+                else:
+                    future.set_exception(error)
+                    # Retrieve the exception, in case nobody else waits.
+                    future.exception()
+
+                if error is e:
+                    raise
+                raise error from e
+
+            if job_data["state"] in Bot._FINISHED_JOB_STATES and not future.done():
+                self._job_futures.pop(job, None)
+                future.set_result(job_data)
 
-        return GetJobsResponse(response_data).data()
+        return await asyncio.wait_for(asyncio.shield(future), timeout)
 
     async def start_job(self, job: str):
         """Starts a job.
@@ -258,6 +433,9 @@ async def cancel_job(self, job: str):
     async def observe(self) -> ObservationData:
         """Observes the world
 
+        With delta observations, the returned observation is the same object every
+        time and is updated in place by later observations.
+
         Returns:
             The bot's observation of the world.
         """
@@ -265,9 +443,25 @@ async def observe(self) -> ObservationData:
         if not self._is_running:
             raise RuntimeError(Bot._BOT_NOT_RUNNING_ERROR_MESSAGE)
 
-        response_data = await self._api_client.post("/observe", {})
+        if not self._options.get("delta_observations", True):
+            response_data = await self._api_client.post("/observe", {})
+
+            return PostObserveResponse(response_data).data()
+
+        async with self._observe_lock:
+            state = self._observation_state
+            request = {} if state.revision is None else {"revision": state.revision}
+            response_data = await self._api_client.post("/observe", request)
+
+            try:
+                return state.update(PostObserveResponse(response_data))
+
+            except ValueError as e:
+                self._logger.warning(f"observing in full again: {e}")
+                state.reset()
+                response_data = await self._api_client.post("/observe", {})
 
-        return PostObserveResponse(response_data).data()
+                return state.update(PostObserveResponse(response_data))
 
     def on_event(self, event: str, handler: Callable[[EventData], Coroutine]):
         """Registers an event handler.
@@ -295,40 +489,126 @@ def off_event(self, event: str, handler: Callable[[EventData], Coroutine]):
 
         self._event_handlers[event].remove(handler)
 
+    async def _dispatch_events(self, response: GetEventsResponse):
+        for event in response.data().values():
+            # Update the cursor if the event is newer.
+            updated = datetime.fromisoformat(event["updated"])
+            if updated > self._events_cursor:
+                self._events_cursor = updated
+
+            # Invoke the event handlers of this event concurrently.
+            event_handlers = self._event_handlers.get(event["name"], [])
+            results = await asyncio.gather(
+                *[event_handler(event) for event_handler in event_handlers],
+                return_exceptions=True,
+            )
+            for result in results:
+                if isinstance(result, Exception):
+                    self._logger.error(
+                        f"Failed to handle event {event['name']}#{event['id']}: "
+                        f"{result}"
+                    )
+
+    async def _get_jobs_page(
+        self,
+        states: Optional[List[str]],
+        since: Optional[datetime],
+        limit: Optional[int],
+        offset: int,
+    ) -> GetJobsResponse:
+        if not self._is_running:
+            raise RuntimeError(Bot._BOT_NOT_RUNNING_ERROR_MESSAGE)
+
+        response_data = await self._api_client.get(
+            "/jobs",
+            {
+                "states": ",".join(states) if states is not None else None,
+                "since": since.isoformat() if since is not None else None,
+                "limit": str(limit) if limit is not None else None,
+                "offset": str(offset),
+            },
+        )
+
+        return GetJobsResponse(response_data)
+
+    async def _on_job_event(self, event: EventData):
+        if event["args"]["state"] not in Bot._FINISHED_JOB_STATES:
+            return
+
+        future = self._job_futures.pop(event["args"]["id"], None)
+        if future is None or future.done():
+            return
+
+        future.set_result(
+            JobData(
+                {
+                    "id": event["args"]["id"],
+                    "action": event["args"]["action"],
+                    "args": {
+                        arg["name"]: arg["value"] for arg in event["args"]["args"]
+                    },
+                    "state": event["args"]["state"],
+                    "message": event["args"]["message"],
+                }
+            )
+        )
+
+    async def _poll_events(self):
+        response_data = await self._api_client.get(
+            "/events",
+            {
+                "since": self._events_cursor.isoformat(),
+            },
+        )
+
+        await self._dispatch_events(GetEventsResponse(response_data))
+
+    async def _stream_events(self):
+        async for response_data in self._api_client.stream(
+            "/events/stream",
+            {
+                "since": self._events_cursor.isoformat(),
+            },
+        ):
+            await self._dispatch_events(GetEventsResponse(response_data))
+
     async def _update_events(self):
-        # A datetime DateTime of the last update
-        last_updated: datetime = datetime.now()
+        # The time of the newest event received. It is sent as the since cursor on
+        # every poll and every stream (re)connection so that no event is missed.
+        self._events_cursor = datetime.now(timezone.utc)
+
+        use_stream = self._options.get("event_stream", True)
 
         while True:
-            await asyncio.sleep(Bot._UPDAVE_EVENTS_INTERVAL)
+            if use_stream:
+                try:
+                    await self._stream_events()
 
-            try:
-                response_data = await self._api_client.get(
-                    "/events",
-                    {
-                        "since": last_updated.isoformat(),
-                    },
-                )
+                except ApiError as e:
+                    if e.code == 404:
+                        self._logger.warning(
+                            "bot does not support event streams, falling back to "
+                            "polling"
+                        )
+                        use_stream = False
+                        continue
 
-                response = GetEventsResponse(response_data)
+                    self._logger.error(f"Failed to stream events: {e}")
 
-                # Invoke the events.
-                for event in response.data().values():
-                    # Allow other tasks to run.
-                    await asyncio.sleep(0)
+                except Exception as e:
+                    self._logger.error(f"Failed to stream events: {e}")
 
-                    # Update the last updated time if the event is newer.
-                    updated = datetime.fromisoformat(event["updated"])
-                    if updated > last_updated:
-                        last_updated = updated
+                # Reconnect after a delay.
+                await asyncio.sleep(Bot._EVENT_STREAM_RECONNECT_DELAY)
 
-                    # Invoke the event handler.
-                    event_handlers = self._event_handlers.get(event["name"], [])
-                    for event_handler in event_handlers:
-                        await event_handler(event)
+            else:
+                await asyncio.sleep(Bot._UPDAVE_EVENTS_INTERVAL)
 
-            except Exception as e:
-                self._logger.error(f"Failed to update events: {e}")
+                try:
+                    await self._poll_events()
+
+                except Exception as e:
+                    self._logger.error(f"Failed to update events: {e}")
 
     async def _update_status(self):
         while True:
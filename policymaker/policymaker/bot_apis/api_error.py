@@ -1,11 +1,17 @@
+from typing import Optional
+
+
 class ApiError(Exception):
     """An error from the bot API."""
 
-    def __init__(self, message: str):
+    def __init__(self, message: str, code: Optional[int] = None):
         """Initialize a BotApiError.
 
         Args:
             message: The message for the error.
+            code: The error code returned by the bot API, if any.
         """
 
         super().__init__(message)
+
+        self.code: Optional[int] = code
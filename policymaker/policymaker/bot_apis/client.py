@@ -1,9 +1,10 @@
-import urllib.parse
-from typing import Any, Dict, TypedDict
+import json
+from typing import Any, AsyncIterator, Dict, List, NotRequired, Optional, TypedDict
 
 import aiohttp
 import jsonschema
 
+from . import validation
 from .api_error import ApiError
 
 _API_VERSION = "0.0.0"
@@ -61,66 +62,151 @@ class ClientOptions(TypedDict):
     Attributes:
         host: The host to connect to.
         port: The port to connect to.
+        connection_limit: The maximum number of pooled connections.
+        connection_limit_per_host: The maximum number of pooled connections to the
+            same host.
+        dns_cache_ttl: The number of seconds to cache resolved DNS entries for.
+        keepalive_timeout: The number of seconds to keep an idle connection alive.
     """
 
     host: str
     port: int
+    connection_limit: NotRequired[int]
+    connection_limit_per_host: NotRequired[int]
+    dns_cache_ttl: NotRequired[int]
+    keepalive_timeout: NotRequired[float]
 
 
 class Client:
-    """A client for the bot API."""
+    """A client for the bot API.
 
-    def __init__(self, options: ClientOptions):
+    The client owns a long-lived HTTP session so that requests reuse pooled
+    keep-alive connections, or uses a session shared by several clients, e.g.
+    the clients of a fleet of bots. It must be opened before use and closed
+    afterwards.
+    """
+
+    _CLIENT_NOT_OPEN_ERROR_MESSAGE: str = "client is not open"
+    _DEFAULT_CONNECTION_LIMIT: int = 100
+    _DEFAULT_CONNECTION_LIMIT_PER_HOST: int = 8
+    _DEFAULT_DNS_CACHE_TTL: int = 300
+    _DEFAULT_KEEPALIVE_TIMEOUT: float = 30.0
+    # The bot sends a heartbeat every 15 seconds on idle streams.
+    _STREAM_READ_TIMEOUT: float = 60.0
+
+    def __init__(
+        self,
+        options: ClientOptions,
+        session: Optional[aiohttp.ClientSession] = None,
+    ):
         """Initialize a bot API client.
 
         Args:
             options: The options for the bot API client.
+            session: A session shared with other clients, or None to own one. The
+                connection options are ignored for a shared session, which is
+                left open on close.
         """
 
         self._options: ClientOptions = options
 
-    async def get(self, path: str, queries: Dict[str, str] = {}) -> Dict[str, Any]:
+        self._base_url: str = f"http://{options['host']}:{options['port']}/api"
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._shared_session: Optional[aiohttp.ClientSession] = session
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the client is open."""
+
+        return self._session is not None and not self._session.closed
+
+    async def open(self):
+        """Opens the HTTP session and its connection pool."""
+
+        if self.is_open:
+            raise RuntimeError("client is already open")
+
+        if self._shared_session is not None:
+            self._session = self._shared_session
+            return
+
+        self._session = Client.create_session(
+            self._options.get("connection_limit", Client._DEFAULT_CONNECTION_LIMIT),
+            self._options.get(
+                "connection_limit_per_host",
+                Client._DEFAULT_CONNECTION_LIMIT_PER_HOST,
+            ),
+            self._options.get("dns_cache_ttl", Client._DEFAULT_DNS_CACHE_TTL),
+            self._options.get("keepalive_timeout", Client._DEFAULT_KEEPALIVE_TIMEOUT),
+        )
+
+    async def close(self):
+        """Closes the HTTP session and releases all pooled connections."""
+
+        if not self.is_open:
+            raise RuntimeError(Client._CLIENT_NOT_OPEN_ERROR_MESSAGE)
+
+        assert self._session is not None
+
+        if self._session is not self._shared_session:
+            await self._session.close()
+
+        self._session = None
+
+    @staticmethod
+    def create_session(
+        connection_limit: int = _DEFAULT_CONNECTION_LIMIT,
+        connection_limit_per_host: int = _DEFAULT_CONNECTION_LIMIT_PER_HOST,
+        dns_cache_ttl: int = _DEFAULT_DNS_CACHE_TTL,
+        keepalive_timeout: float = _DEFAULT_KEEPALIVE_TIMEOUT,
+    ) -> aiohttp.ClientSession:
+        """Creates an HTTP session with a connection pool.
+
+        Args:
+            connection_limit: The maximum number of pooled connections, or 0 for no
+                limit.
+            connection_limit_per_host: The maximum number of pooled connections to
+                the same host.
+            dns_cache_ttl: The number of seconds to cache resolved DNS entries for.
+            keepalive_timeout: The number of seconds to keep an idle connection
+                alive.
+
+        Returns:
+            The session.
+        """
+
+        connector = aiohttp.TCPConnector(
+            limit=connection_limit,
+            limit_per_host=connection_limit_per_host,
+            use_dns_cache=True,
+            ttl_dns_cache=dns_cache_ttl,
+            keepalive_timeout=keepalive_timeout,
+        )
+
+        return aiohttp.ClientSession(connector=connector)
+
+    async def get(
+        self, path: str, queries: Dict[str, Optional[str]] = {}
+    ) -> Dict[str, Any]:
         """Gets a resource from the bot API.
 
         Args:
             path: The path to the resource.
+            queries: The query parameters.
 
         Returns:
             The resource.
         """
 
-        # Prepend a slash to the path if it doesn't already have one.
-        if not path.startswith("/"):
-            path = f"/{path}"
-
-        # URL encode the queries.
-        queries = {
-            k: urllib.parse.quote(v) for k, v in queries.items() if v is not None
-        }
-
-        response_data: Any = None
+        # Drop unset queries. aiohttp URL encodes the rest.
+        queries = {k: v for k, v in queries.items() if v is not None}
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(
-                    f"http://{self._options['host']}:{self._options['port']}/api{path}",
-                    params=queries,
-                ) as response:
-                    response_data = await response.json()
+            response_data = await self._request("GET", path, params=queries)
         except Exception as e:
             raise RuntimeError(f"error while getting from bot API: {e}")
 
-        # Validate the response format.
-        try:
-            jsonschema.validate(instance=response_data, schema=_GENERAL_SCHEMA)
-        except jsonschema.ValidationError as e:
-            raise jsonschema.ValidationError(f"invalid response from bot API: {e}")
-
-        # If the API returned an error, raise an ApiError.
-        if "error" in response_data:
-            raise ApiError(f"error from bot API: {response_data['error']['message']}")
-        else:
-            return response_data["data"]
+        return Client._unwrap(response_data)
 
     async def post(self, path: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Posts data to the bot API.
@@ -133,34 +219,100 @@ async def post(self, path: str, data: Dict[str, Any]) -> Dict[str, Any]:
             The response.
         """
 
+        try:
+            response_data = await self._request(
+                "POST",
+                path,
+                json={
+                    "apiVersion": _API_VERSION,
+                    "data": data,
+                },
+            )
+        except Exception as e:
+            raise RuntimeError(f"error while posting to bot API: {e}")
+
+        return Client._unwrap(response_data)
+
+    async def stream(
+        self, path: str, queries: Dict[str, Optional[str]] = {}
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Subscribes to a server-sent event stream of the bot API.
+
+        Args:
+            path: The path to the stream.
+            queries: The query parameters.
+
+        Yields:
+            The data of each message in the stream.
+        """
+
+        if not self.is_open:
+            raise RuntimeError(Client._CLIENT_NOT_OPEN_ERROR_MESSAGE)
+
+        assert self._session is not None
+
         # Prepend a slash to the path if it doesn't already have one.
         if not path.startswith("/"):
             path = f"/{path}"
 
-        response_data: Any = None
+        # Drop unset queries. aiohttp URL encodes the rest.
+        queries = {k: v for k, v in queries.items() if v is not None}
 
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"http://{self._options['host']}:{self._options['port']}/api{path}",
-                    json={
-                        "apiVersion": _API_VERSION,
-                        "data": data,
-                    },
-                ) as response:
-                    response_data = await response.json()
-        except Exception as e:
-            raise RuntimeError(f"error while posting to bot API: {e}")
+        async with self._session.get(
+            f"{self._base_url}{path}",
+            params=queries,
+            timeout=aiohttp.ClientTimeout(
+                total=None, sock_read=Client._STREAM_READ_TIMEOUT
+            ),
+        ) as response:
+            if response.content_type != "text/event-stream":
+                # Errors are returned as regular JSON responses.
+                Client._unwrap(await response.json())
+                raise RuntimeError("bot API did not return an event stream")
+
+            data_lines: List[str] = []
+            async for raw_line in response.content:
+                line = raw_line.decode("utf-8").rstrip("\r\n")
+
+                # An empty line terminates a message.
+                if line == "":
+                    if len(data_lines) > 0:
+                        yield Client._unwrap(json.loads("\n".join(data_lines)))
+                        data_lines = []
+
+                elif line.startswith("data:"):
+                    data_lines.append(line[len("data:") :].removeprefix(" "))
+
+                # Other fields and comments (heartbeats) are ignored.
 
+    async def _request(self, method: str, path: str, **kwargs: Any) -> Any:
+        if not self.is_open:
+            raise RuntimeError(Client._CLIENT_NOT_OPEN_ERROR_MESSAGE)
+
+        assert self._session is not None
+
+        # Prepend a slash to the path if it doesn't already have one.
+        if not path.startswith("/"):
+            path = f"/{path}"
+
+        async with self._session.request(
+            method, f"{self._base_url}{path}", **kwargs
+        ) as response:
+            return await response.json()
+
+    @staticmethod
+    def _unwrap(response_data: Any) -> Dict[str, Any]:
         # Validate the response format.
         try:
-            jsonschema.validate(instance=response_data, schema=_GENERAL_SCHEMA)
-
+            validation.validate(response_data, _GENERAL_SCHEMA, sampled=False)
         except jsonschema.ValidationError as e:
             raise jsonschema.ValidationError(f"invalid response from bot API: {e}")
 
         # If the API returned an error, raise an ApiError.
         if "error" in response_data:
-            raise ApiError(f"error from bot API: {response_data['error']['message']}")
+            raise ApiError(
+                f"error from bot API: {response_data['error']['message']}",
+                response_data["error"]["code"],
+            )
         else:
             return response_data["data"]
@@ -1,4 +1,4 @@
-from typing import Dict
+from typing import Dict, Optional
 
 from .job_data import JobData
 from .response import Response
@@ -17,11 +17,30 @@ def data(self) -> Dict[str, JobData]:
                     "args": {arg["name"]: arg["value"] for arg in job["args"]},
                     "state": job["state"],
                     "message": job["message"],
+                    **({"updated": job["updated"]} if "updated" in job else {}),
                 }
             )
             for job in self._data["items"]
         }
 
+    def next_offset(self) -> Optional[int]:
+        """Return the offset of the next page.
+
+        Returns:
+            The offset of the next page, or None if this is the last page.
+        """
+
+        return self._data.get("next", None)
+
+    def total(self) -> int:
+        """Return the number of jobs matching the query across all pages.
+
+        Returns:
+            The number of jobs.
+        """
+
+        return self._data.get("total", len(self._data["items"]))
+
 
 _JOB_JSON_SCHEMA = {
     "type": "object",
@@ -51,6 +70,9 @@ def data(self) -> Dict[str, JobData]:
         "message": {
             "type": "string",
         },
+        "updated": {
+            "type": "string",
+        },
     },
     "required": ["id", "action", "args", "state", "message"],
 }
@@ -62,6 +84,12 @@ def data(self) -> Dict[str, JobData]:
             "type": "array",
             "items": _JOB_JSON_SCHEMA,
         },
+        "total": {
+            "type": "integer",
+        },
+        "next": {
+            "type": ["integer", "null"],
+        },
     },
     "required": ["items"],
 }
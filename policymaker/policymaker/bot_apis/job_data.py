@@ -1,4 +1,4 @@
-from typing import Any, Dict, TypedDict
+from typing import Any, Dict, NotRequired, TypedDict
 
 
 class JobData(TypedDict):
@@ -7,3 +7,4 @@ class JobData(TypedDict):
     args: Dict[str, Any]
     state: str
     message: str
+    updated: NotRequired[str]
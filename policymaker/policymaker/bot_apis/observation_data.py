@@ -17,6 +17,7 @@ class Biome(TypedDict):
 class Block(TypedDict):
     name: str
     displayName: str
+    count: NotRequired[int]
 
 
 class Effect(TypedDict):
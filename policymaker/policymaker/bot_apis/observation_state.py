@@ -0,0 +1,112 @@
+from typing import Dict, Optional
+
+from .observation_data import ObservationData
+from .post_observe_response import ObservationDelta, PostObserveResponse
+
+
+class ObservationState:
+    """The latest observation of a bot and its revision.
+
+    Full observations replace the state, and deltas are applied to it in place,
+    so the observation returned by update() is the same object every time and
+    holds the latest observation after each update.
+    """
+
+    def __init__(self):
+        self._data: Optional[ObservationData] = None
+        self._revision: Optional[str] = None
+        # A map from the names of the nearby blocks to their indices.
+        self._block_indices: Dict[str, int] = {}
+
+    @property
+    def data(self) -> Optional[ObservationData]:
+        """The latest observation, or None if nothing was observed yet."""
+
+        return self._data
+
+    @property
+    def revision(self) -> Optional[str]:
+        """The revision of the latest observation, or None if unknown."""
+
+        return self._revision
+
+    def reset(self):
+        """Forgets the latest observation, so that the next one is full."""
+
+        self._data = None
+        self._revision = None
+        self._block_indices.clear()
+
+    def update(self, response: PostObserveResponse) -> ObservationData:
+        """Updates the state from a response to an observe request.
+
+        Args:
+            response: The response.
+
+        Returns:
+            The latest observation.
+
+        Raises:
+            ValueError: If the response is a delta from another revision than the
+                latest one.
+        """
+
+        delta = response.delta()
+        if delta is None:
+            self._replace(response.data())
+
+        else:
+            if self._data is None or response.base_revision() != self._revision:
+                raise ValueError(
+                    f"delta from revision {response.base_revision()} cannot be applied"
+                    f" to revision {self._revision}"
+                )
+
+            self._apply(delta)
+
+        self._revision = response.revision()
+
+        return self._data
+
+    def _replace(self, data: ObservationData):
+        if self._data is None:
+            self._data = data
+
+        else:
+            self._data.clear()
+            self._data.update(data)
+
+        self._index_blocks()
+
+    def _apply(self, delta: ObservationDelta):
+        data = self._data
+
+        data.update(delta["fields"])
+        for field in delta["removedFields"]:
+            data.pop(field, None)
+
+        entities = data["entities"]
+        entities.update(delta["entities"])
+        for entity in delta["removedEntities"]:
+            entities.pop(entity, None)
+
+        blocks = data["blocksNearby"]
+        for block in delta["blocksNearby"]:
+            index = self._block_indices.get(block["name"])
+            if index is None:
+                self._block_indices[block["name"]] = len(blocks)
+                blocks.append(block)
+
+            else:
+                blocks[index] = block
+
+        if len(delta["removedBlocksNearby"]) > 0:
+            removed = set(delta["removedBlocksNearby"])
+            blocks[:] = [block for block in blocks if block["name"] not in removed]
+            self._index_blocks()
+
+    def _index_blocks(self):
+        self._block_indices = {
+            block["name"]: index
+            for index, block in enumerate(self._data["blocksNearby"])
+        }
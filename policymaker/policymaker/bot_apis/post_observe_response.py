@@ -1,299 +1,234 @@
-from typing import Dict
+from typing import Dict, List, Optional, TypedDict
 
 from .observation_data import ObservationData
 from .response import Response
 
 
+class ObservationDelta(TypedDict):
+    """Changes between two observations of the bot.
+
+    Attributes:
+        fields: The fields other than entities and blocksNearby that were added or
+            changed.
+        removedFields: The names of the fields that were removed.
+        entities: The entities that were added or changed, keyed by id.
+        removedEntities: The ids of the entities that were removed.
+        blocksNearby: The nearby blocks that were added or changed.
+        removedBlocksNearby: The names of the nearby blocks that were removed.
+    """
+
+    fields: Dict
+    removedFields: List[str]
+    entities: Dict[str, Dict]
+    removedEntities: List[str]
+    blocksNearby: List[Dict]
+    removedBlocksNearby: List[str]
+
+
 class PostObserveResponse(Response):
     def __init__(self, data: Dict):
         super().__init__(data, _JSON_SCHEMA)
 
-    def data(self) -> ObservationData:
+    def data(self) -> Optional[ObservationData]:
+        """Returns the full observation, or None if the response is a delta."""
+
+        if "bot" not in self._data:
+            return None
+
         return ObservationData(**(self._data["bot"]))
 
+    def delta(self) -> Optional[ObservationDelta]:
+        """Returns the changes since the base revision, or None if the response is
+        a full observation."""
 
-_JSON_SCHEMA = {
-    "$schema": "http://json-schema.org/draft-07/schema#",
+        return self._data.get("delta")
+
+    def revision(self) -> Optional[str]:
+        """Returns the revision of the observation, or None if the bot does not
+        support revisions."""
+
+        return self._data.get("revision")
+
+    def base_revision(self) -> Optional[str]:
+        """Returns the revision the delta is relative to."""
+
+        return self._data.get("baseRevision")
+
+
+_ENTITY_SCHEMA = {
     "type": "object",
     "properties": {
-        "bot": {
+        "id": {"type": "integer"},
+        "displayName": {"type": ["string", "null"]},
+        "name": {"type": ["string", "null"]},
+        "position": {
             "type": "object",
             "properties": {
-                "username": {"type": "string"},
-                "version": {"type": "string"},
-                "entity": {
-                    "type": "object",
-                    "properties": {
-                        "id": {"type": "integer"},
-                        "displayName": {"type": ["string", "null"]},
-                        "name": {"type": ["string", "null"]},
-                        "position": {
-                            "type": "object",
-                            "properties": {
-                                "x": {"type": "number"},
-                                "y": {"type": "number"},
-                                "z": {"type": "number"},
-                            },
-                            "required": ["x", "y", "z"],
-                        },
-                        "velocity": {
-                            "type": "object",
-                            "properties": {
-                                "x": {"type": "number"},
-                                "y": {"type": "number"},
-                                "z": {"type": "number"},
-                            },
-                            "required": ["x", "y", "z"],
-                        },
-                        "yaw": {"type": "number"},
-                        "pitch": {"type": "number"},
-                        "height": {"type": "number"},
-                        "width": {"type": "number"},
-                        "onGround": {"type": "boolean"},
-                        "equipment": {
-                            "type": "array",
-                            "items": {
-                                "oneOf": [
-                                    {
-                                        "type": "object",
-                                        "properties": {
-                                            "count": {"type": "integer"},
-                                            "name": {"type": "string"},
-                                            "maxDurability": {"type": "number"},
-                                            "durabilityUsed": {
-                                                "type": ["number", "null"]
-                                            },
-                                            "enchants": {
-                                                "type": "array",
-                                                "items": {
-                                                    "type": "object",
-                                                    "properties": {
-                                                        "name": {"type": "string"},
-                                                        "lvl": {"type": "integer"},
-                                                    },
-                                                    "required": ["name", "lvl"],
-                                                },
-                                            },
-                                        },
-                                        "required": [
-                                            "count",
-                                            "name",
-                                            "durabilityUsed",
-                                            "enchants",
-                                        ],
-                                    },
-                                    {"type": "null"},
-                                ],
-                            },
-                        },
-                        "health": {"type": ["number", "null"]},
-                        "food": {"type": ["number", "null"]},
-                        "foodSaturation": {"type": ["number", "null"]},
-                        "effects": {
-                            "type": "array",
-                            "items": {
-                                "type": "object",
-                                "properties": {
-                                    "id": {"type": "integer"},
-                                    "amplifier": {"type": "number"},
-                                    "duration": {"type": "number"},
-                                },
-                                "required": ["id", "amplifier", "duration"],
-                            },
-                        },
-                    },
-                    "required": [
-                        "id",
-                        "position",
-                        "velocity",
-                        "yaw",
-                        "pitch",
-                        "height",
-                        "width",
-                        "onGround",
-                        "equipment",
-                        "effects",
-                    ],
-                },
-                "entities": {
-                    "type": "object",
-                    "patternProperties": {
-                        ".*": {
-                            "type": "object",
-                            "properties": {
-                                "id": {"type": "integer"},
-                                "displayName": {"type": ["string", "null"]},
-                                "name": {"type": ["string", "null"]},
-                                "position": {
-                                    "type": "object",
-                                    "properties": {
-                                        "x": {"type": "number"},
-                                        "y": {"type": "number"},
-                                        "z": {"type": "number"},
-                                    },
-                                    "required": ["x", "y", "z"],
-                                },
-                                "velocity": {
+                "x": {"type": "number"},
+                "y": {"type": "number"},
+                "z": {"type": "number"},
+            },
+            "required": ["x", "y", "z"],
+        },
+        "velocity": {
+            "type": "object",
+            "properties": {
+                "x": {"type": "number"},
+                "y": {"type": "number"},
+                "z": {"type": "number"},
+            },
+            "required": ["x", "y", "z"],
+        },
+        "yaw": {"type": "number"},
+        "pitch": {"type": "number"},
+        "height": {"type": "number"},
+        "width": {"type": "number"},
+        "onGround": {"type": "boolean"},
+        "equipment": {
+            "type": "array",
+            "items": {
+                "oneOf": [
+                    {
+                        "type": "object",
+                        "properties": {
+                            "count": {"type": "integer"},
+                            "name": {"type": "string"},
+                            "maxDurability": {"type": "number"},
+                            "durabilityUsed": {"type": ["number", "null"]},
+                            "enchants": {
+                                "type": "array",
+                                "items": {
                                     "type": "object",
                                     "properties": {
-                                        "x": {"type": "number"},
-                                        "y": {"type": "number"},
-                                        "z": {"type": "number"},
-                                    },
-                                    "required": ["x", "y", "z"],
-                                },
-                                "yaw": {"type": "number"},
-                                "pitch": {"type": "number"},
-                                "height": {"type": "number"},
-                                "width": {"type": "number"},
-                                "onGround": {"type": "boolean"},
-                                "equipment": {
-                                    "type": "array",
-                                    "items": {
-                                        "oneOf": [
-                                            {
-                                                "type": "object",
-                                                "properties": {
-                                                    "count": {"type": "integer"},
-                                                    "name": {"type": "string"},
-                                                    "maxDurability": {"type": "number"},
-                                                    "durabilityUsed": {
-                                                        "type": ["number", "null"]
-                                                    },
-                                                    "enchants": {
-                                                        "type": "array",
-                                                        "items": {
-                                                            "type": "object",
-                                                            "properties": {
-                                                                "name": {
-                                                                    "type": "string"
-                                                                },
-                                                                "lvl": {
-                                                                    "type": "integer"
-                                                                },
-                                                            },
-                                                            "required": ["name", "lvl"],
-                                                        },
-                                                    },
-                                                },
-                                                "required": [
-                                                    "count",
-                                                    "name",
-                                                    "durabilityUsed",
-                                                    "enchants",
-                                                ],
-                                            },
-                                            {"type": "null"},
-                                        ],
-                                    },
-                                },
-                                "health": {"type": ["number", "null"]},
-                                "food": {"type": ["number", "null"]},
-                                "foodSaturation": {"type": ["number", "null"]},
-                                "effects": {
-                                    "type": "array",
-                                    "items": {
-                                        "type": "object",
-                                        "properties": {
-                                            "id": {"type": "integer"},
-                                            "amplifier": {"type": "number"},
-                                            "duration": {"type": "number"},
-                                        },
-                                        "required": ["id", "amplifier", "duration"],
+                                        "name": {"type": "string"},
+                                        "lvl": {"type": "integer"},
                                     },
+                                    "required": ["name", "lvl"],
                                 },
                             },
-                            "required": [
-                                "id",
-                                "position",
-                                "velocity",
-                                "yaw",
-                                "pitch",
-                                "height",
-                                "width",
-                                "onGround",
-                                "equipment",
-                                "effects",
-                            ],
                         },
+                        "required": ["count", "name", "durabilityUsed", "enchants"],
                     },
+                    {"type": "null"},
+                ]
+            },
+        },
+        "health": {"type": ["number", "null"]},
+        "food": {"type": ["number", "null"]},
+        "foodSaturation": {"type": ["number", "null"]},
+        "effects": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "integer"},
+                    "amplifier": {"type": "number"},
+                    "duration": {"type": "number"},
                 },
-                "game": {
-                    "type": "object",
-                    "properties": {"dimension": {"type": "string"}},
-                    "required": ["dimension"],
-                },
-                "player": {
-                    "type": "object",
-                    "properties": {"username": {"type": "string"}},
-                    "required": ["username"],
-                },
-                "players": {
-                    "type": "object",
-                    "patternProperties": {
-                        ".*": {
-                            "type": "object",
-                            "properties": {"username": {"type": "string"}},
-                            "required": ["username"],
-                        },
-                    },
-                },
-                "isRaining": {"type": "boolean"},
-                "experience": {
-                    "type": "object",
-                    "properties": {
-                        "level": {"type": "integer"},
-                        "points": {"type": "integer"},
-                        "progress": {"type": "number"},
-                    },
-                    "required": ["level", "points", "progress"],
-                },
-                "health": {"type": "number"},
-                "food": {"type": "number"},
-                "foodSaturation": {"type": "number"},
-                "time": {
-                    "type": "object",
-                    "properties": {
-                        "time": {"type": "integer"},
-                        "timeOfDay": {"type": "integer"},
-                        "day": {"type": "integer"},
-                        "isDay": {"type": "boolean"},
-                        "moonPhase": {"type": "number"},
-                        "age": {"type": "number"},
-                    },
-                    "required": [
-                        "time",
-                        "timeOfDay",
-                        "day",
-                        "isDay",
-                        "moonPhase",
-                        "age",
-                    ],
-                },
-                "quickBarSlot": {"type": "integer"},
-                "isSleeping": {"type": "boolean"},
-                "biome": {
-                    "type": ["object", "null"],
-                    "properties": {
-                        "name": {"type": "string"},
-                        "displayName": {"type": ["string", "null"]},
-                        "rainfall": {"type": "number"},
-                        "temperature": {"type": "number"},
-                    },
-                    "required": ["name", "rainfall", "temperature"],
-                },
-                "blocksNearby": {
-                    "type": "array",
-                    "items": {
-                        "type": "object",
-                        "properties": {
-                            "name": {"type": "string"},
-                            "displayName": {"type": ["string", "null"]},
-                        },
-                        "required": ["name", "displayName"],
-                    },
-                },
+                "required": ["id", "amplifier", "duration"],
             },
+        },
+    },
+    "required": [
+        "id",
+        "position",
+        "velocity",
+        "yaw",
+        "pitch",
+        "height",
+        "width",
+        "onGround",
+        "equipment",
+        "effects",
+    ],
+}
+
+_BLOCK_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "displayName": {"type": ["string", "null"]},
+        "count": {"type": "integer"},
+    },
+    "required": ["name", "displayName"],
+}
+
+_BOT_PROPERTIES = {
+    "username": {"type": "string"},
+    "version": {"type": "string"},
+    "entity": _ENTITY_SCHEMA,
+    "entities": {"type": "object", "patternProperties": {".*": _ENTITY_SCHEMA}},
+    "game": {
+        "type": "object",
+        "properties": {"dimension": {"type": "string"}},
+        "required": ["dimension"],
+    },
+    "player": {
+        "type": "object",
+        "properties": {"username": {"type": "string"}},
+        "required": ["username"],
+    },
+    "players": {
+        "type": "object",
+        "patternProperties": {
+            ".*": {
+                "type": "object",
+                "properties": {"username": {"type": "string"}},
+                "required": ["username"],
+            }
+        },
+    },
+    "isRaining": {"type": "boolean"},
+    "experience": {
+        "type": "object",
+        "properties": {
+            "level": {"type": "integer"},
+            "points": {"type": "integer"},
+            "progress": {"type": "number"},
+        },
+        "required": ["level", "points", "progress"],
+    },
+    "health": {"type": "number"},
+    "food": {"type": "number"},
+    "foodSaturation": {"type": "number"},
+    "time": {
+        "type": "object",
+        "properties": {
+            "time": {"type": "integer"},
+            "timeOfDay": {"type": "integer"},
+            "day": {"type": "integer"},
+            "isDay": {"type": "boolean"},
+            "moonPhase": {"type": "number"},
+            "age": {"type": "number"},
+        },
+        "required": ["time", "timeOfDay", "day", "isDay", "moonPhase", "age"],
+    },
+    "quickBarSlot": {"type": "integer"},
+    "isSleeping": {"type": "boolean"},
+    "biome": {
+        "type": ["object", "null"],
+        "properties": {
+            "name": {"type": "string"},
+            "displayName": {"type": ["string", "null"]},
+            "rainfall": {"type": "number"},
+            "temperature": {"type": "number"},
+        },
+        "required": ["name", "rainfall", "temperature"],
+    },
+    "blocksNearby": {"type": "array", "items": _BLOCK_SCHEMA},
+}
+
+_STRING_ARRAY_SCHEMA = {"type": "array", "items": {"type": "string"}}
+
+_JSON_SCHEMA = {
+    "$schema": "http://json-schema.org/draft-07/schema#",
+    "type": "object",
+    "properties": {
+        "revision": {"type": "string"},
+        "baseRevision": {"type": "string"},
+        "bot": {
+            "type": "object",
+            "properties": _BOT_PROPERTIES,
             "required": [
                 "username",
                 "version",
@@ -313,7 +248,33 @@ def data(self) -> ObservationData:
                 "biome",
                 "blocksNearby",
             ],
-        }
+        },
+        "delta": {
+            "type": "object",
+            "properties": {
+                "fields": {"type": "object", "properties": _BOT_PROPERTIES},
+                "removedFields": _STRING_ARRAY_SCHEMA,
+                "entities": {
+                    "type": "object",
+                    "patternProperties": {".*": _ENTITY_SCHEMA},
+                },
+                "removedEntities": _STRING_ARRAY_SCHEMA,
+                "blocksNearby": {"type": "array", "items": _BLOCK_SCHEMA},
+                "removedBlocksNearby": _STRING_ARRAY_SCHEMA,
+            },
+            "required": [
+                "fields",
+                "removedFields",
+                "entities",
+                "removedEntities",
+                "blocksNearby",
+                "removedBlocksNearby",
+            ],
+        },
     },
-    "required": ["bot"],
+    # Either a full observation or the changes since a revision.
+    "oneOf": [
+        {"required": ["bot"]},
+        {"required": ["revision", "baseRevision", "delta"]},
+    ],
 }
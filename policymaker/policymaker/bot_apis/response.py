@@ -3,6 +3,8 @@
 
 import jsonschema
 
+from . import validation
+
 
 class Response(ABC):
     """Abstract base class for all responses from the bot API."""
@@ -17,7 +19,7 @@ def __init__(self, data: Dict, json_schema: Dict):
 
         # Validate the response format.
         try:
-            jsonschema.validate(instance=data, schema=json_schema)
+            validation.validate(data, json_schema)
 
         except jsonschema.ValidationError as e:
             raise jsonschema.ValidationError(f"invalid response data: {e}")
@@ -0,0 +1,190 @@
+import copy
+import unittest
+from typing import Any, Dict, List
+
+from policymaker.bot_apis.observation_state import ObservationState
+from policymaker.bot_apis.post_observe_response import PostObserveResponse
+
+
+def make_entity(id: int, x: float = 0.0) -> Dict[str, Any]:
+    return {
+        "id": id,
+        "displayName": None,
+        "name": None,
+        "position": {"x": x, "y": 64.0, "z": 0.0},
+        "velocity": {"x": 0.0, "y": 0.0, "z": 0.0},
+        "yaw": 0.0,
+        "pitch": 0.0,
+        "height": 1.8,
+        "width": 0.6,
+        "onGround": True,
+        "equipment": [],
+        "effects": [],
+    }
+
+
+def make_block(name: str, count: int = 1) -> Dict[str, Any]:
+    return {"name": name, "displayName": name, "count": count}
+
+
+def make_bot(**fields: Any) -> Dict[str, Any]:
+    """Makes a full observation, with the given fields replaced."""
+
+    bot = {
+        "username": "bot",
+        "version": "1.20.1",
+        "entity": make_entity(0),
+        "entities": {"1": make_entity(1), "2": make_entity(2)},
+        "game": {"dimension": "overworld"},
+        "player": {"username": "bot"},
+        "players": {},
+        "isRaining": False,
+        "experience": {"level": 0, "points": 0, "progress": 0.0},
+        "health": 20.0,
+        "food": 20.0,
+        "foodSaturation": 5.0,
+        "time": {
+            "time": 0,
+            "timeOfDay": 0,
+            "day": 0,
+            "isDay": True,
+            "moonPhase": 0,
+            "age": 0,
+        },
+        "quickBarSlot": 0,
+        "isSleeping": False,
+        "biome": None,
+        "blocksNearby": [make_block("stone"), make_block("dirt"), make_block("sand")],
+    }
+    bot.update(fields)
+
+    return bot
+
+
+def make_delta(
+    revision: str, base_revision: str, **changes: Any
+) -> PostObserveResponse:
+    delta: Dict[str, Any] = {
+        "fields": {},
+        "removedFields": [],
+        "entities": {},
+        "removedEntities": [],
+        "blocksNearby": [],
+        "removedBlocksNearby": [],
+    }
+    delta.update(changes)
+
+    return PostObserveResponse(
+        {"revision": revision, "baseRevision": base_revision, "delta": delta}
+    )
+
+
+def make_full(revision: str, bot: Dict[str, Any]) -> PostObserveResponse:
+    return PostObserveResponse({"revision": revision, "bot": copy.deepcopy(bot)})
+
+
+def block_names(blocks: List[Dict[str, Any]]) -> List[str]:
+    return [block["name"] for block in blocks]
+
+
+class ObservationStateTest(unittest.TestCase):
+    def test_full_observation_replaces_state(self):
+        state = ObservationState()
+        data = state.update(make_full("1", make_bot()))
+
+        self.assertEqual(state.revision, "1")
+        self.assertEqual(data, make_bot())
+
+        # The observation is updated in place.
+        self.assertIs(state.update(make_full("2", make_bot(health=5.0))), data)
+        self.assertEqual(data, make_bot(health=5.0))
+        self.assertEqual(state.revision, "2")
+
+    def test_delta_updates_and_removes_fields(self):
+        state = ObservationState()
+        state.update(make_full("1", make_bot()))
+
+        data = state.update(
+            make_delta(
+                "2",
+                "1",
+                fields={"health": 12.0, "isRaining": True},
+                removedFields=["biome"],
+            )
+        )
+
+        expected = make_bot(health=12.0, isRaining=True)
+        del expected["biome"]
+        self.assertEqual(data, expected)
+        self.assertEqual(state.revision, "2")
+
+    def test_delta_updates_and_removes_entities(self):
+        state = ObservationState()
+        state.update(make_full("1", make_bot()))
+
+        data = state.update(
+            make_delta(
+                "2",
+                "1",
+                entities={"2": make_entity(2, x=5.0), "3": make_entity(3)},
+                removedEntities=["1"],
+            )
+        )
+
+        self.assertEqual(
+            data,
+            make_bot(entities={"2": make_entity(2, x=5.0), "3": make_entity(3)}),
+        )
+
+    def test_blocks_are_reindexed_after_removals(self):
+        state = ObservationState()
+        state.update(make_full("1", make_bot()))
+
+        state.update(
+            make_delta(
+                "2",
+                "1",
+                blocksNearby=[make_block("gravel")],
+                removedBlocksNearby=["stone"],
+            )
+        )
+        # Blocks after the removed one moved, and must be updated in place.
+        data = state.update(
+            make_delta(
+                "3",
+                "2",
+                blocksNearby=[make_block("sand", 4), make_block("gravel", 2)],
+            )
+        )
+
+        self.assertEqual(
+            data["blocksNearby"],
+            [make_block("dirt"), make_block("sand", 4), make_block("gravel", 2)],
+        )
+        self.assertEqual(
+            data, make_full("3", make_bot(blocksNearby=data["blocksNearby"])).data()
+        )
+
+    def test_delta_from_other_revision_is_rejected(self):
+        state = ObservationState()
+        with self.assertRaises(ValueError):
+            state.update(make_delta("2", "1"))
+
+        state.update(make_full("1", make_bot()))
+        with self.assertRaises(ValueError):
+            state.update(make_delta("3", "2", fields={"health": 1.0}))
+
+        # The state is left as it was.
+        self.assertEqual(state.revision, "1")
+        self.assertEqual(state.data, make_bot())
+
+    def test_reset_forgets_observation(self):
+        state = ObservationState()
+        state.update(make_full("1", make_bot()))
+
+        state.reset()
+
+        self.assertIsNone(state.data)
+        self.assertIsNone(state.revision)
+        with self.assertRaises(ValueError):
+            state.update(make_delta("2", "1"))
@@ -0,0 +1,167 @@
+import threading
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+import jsonschema
+import jsonschema.exceptions
+import jsonschema.protocols
+import jsonschema.validators
+
+
+class ValidationMode(Enum):
+    """How thoroughly responses from the bot API are validated.
+
+    Attributes:
+        STRICT: Every response is validated.
+        SAMPLED: Envelopes are always validated, payloads 1-in-N per schema.
+        OFF: Nothing is validated.
+    """
+
+    STRICT = "strict"
+    SAMPLED = "sampled"
+    OFF = "off"
+
+
+class ValidatorRegistry:
+    """A registry of compiled JSON schema validators.
+
+    Each schema is checked and compiled once, on first use, and the compiled
+    validator is reused for every later validation against the same schema.
+    Schemas are identified by object identity, so they should be module-level
+    constants.
+    """
+
+    _DEFAULT_SAMPLE_RATE: int = 10
+
+    def __init__(
+        self,
+        mode: ValidationMode = ValidationMode.STRICT,
+        sample_rate: int = _DEFAULT_SAMPLE_RATE,
+    ):
+        """Initialize a validator registry.
+
+        Args:
+            mode: The validation mode.
+            sample_rate: In sampled mode, validate one in this many payloads.
+        """
+
+        self._lock = threading.Lock()
+        self._mode: ValidationMode = ValidationMode.STRICT
+        self._sample_rate: int = ValidatorRegistry._DEFAULT_SAMPLE_RATE
+        # A map from schema ids to the schema (kept alive so that its id is not
+        # reused) and its compiled validator.
+        self._validators: Dict[
+            int, Tuple[Dict[str, Any], jsonschema.protocols.Validator]
+        ] = {}
+        # A map from schema ids to the number of payloads seen in sampled mode.
+        self._counters: Dict[int, int] = {}
+
+        self.set_mode(mode, sample_rate)
+
+    @property
+    def mode(self) -> ValidationMode:
+        """The validation mode."""
+
+        return self._mode
+
+    @property
+    def sample_rate(self) -> int:
+        """In sampled mode, one in this many payloads is validated."""
+
+        return self._sample_rate
+
+    def set_mode(self, mode: ValidationMode, sample_rate: Optional[int] = None):
+        """Sets the validation mode.
+
+        Args:
+            mode: The validation mode.
+            sample_rate: In sampled mode, validate one in this many payloads. Left
+                unchanged if None.
+        """
+
+        if sample_rate is not None:
+            if sample_rate < 1:
+                raise ValueError("sample rate must be at least 1")
+
+            self._sample_rate = sample_rate
+
+        self._mode = mode
+
+    def get(self, schema: Dict[str, Any]) -> jsonschema.protocols.Validator:
+        """Gets the compiled validator of a schema, compiling it if needed.
+
+        Args:
+            schema: The JSON schema.
+
+        Returns:
+            The compiled validator.
+        """
+
+        entry = self._validators.get(id(schema))
+        if entry is not None:
+            return entry[1]
+
+        with self._lock:
+            entry = self._validators.get(id(schema))
+            if entry is None:
+                cls = jsonschema.validators.validator_for(schema)
+                cls.check_schema(schema)
+                entry = (schema, cls(schema))
+                self._validators[id(schema)] = entry
+
+        return entry[1]
+
+    def validate(self, instance: Any, schema: Dict[str, Any], sampled: bool = True):
+        """Validates an instance against a schema according to the mode.
+
+        Args:
+            instance: The instance to validate.
+            schema: The JSON schema.
+            sampled: Whether the validation may be skipped in sampled mode.
+
+        Raises:
+            jsonschema.ValidationError: If the instance is invalid.
+        """
+
+        if self._mode == ValidationMode.OFF:
+            return
+
+        if self._mode == ValidationMode.SAMPLED and sampled:
+            count = self._counters.get(id(schema), 0)
+            self._counters[id(schema)] = count + 1
+            if count % self._sample_rate != 0:
+                return
+
+        error = jsonschema.exceptions.best_match(self.get(schema).iter_errors(instance))
+        if error is not None:
+            raise error
+
+
+default_registry: ValidatorRegistry = ValidatorRegistry()
+
+
+def set_validation_mode(mode: ValidationMode, sample_rate: Optional[int] = None):
+    """Sets the validation mode of the default registry.
+
+    Args:
+        mode: The validation mode.
+        sample_rate: In sampled mode, validate one in this many payloads. Left
+            unchanged if None.
+    """
+
+    default_registry.set_mode(mode, sample_rate)
+
+
+def validate(instance: Any, schema: Dict[str, Any], sampled: bool = True):
+    """Validates an instance against a schema using the default registry.
+
+    Args:
+        instance: The instance to validate.
+        schema: The JSON schema.
+        sampled: Whether the validation may be skipped in sampled mode.
+
+    Raises:
+        jsonschema.ValidationError: If the instance is invalid.
+    """
+
+    default_registry.validate(instance, schema, sampled)
@@ -1,10 +1,12 @@
-import queue
+from collections import deque
 
 
 class TaskTree:
     def __init__(self):
         self.prev_item: str = ""
         self.prev_num: int = 0
+        # Number of prev_item made by one craft.
+        self.count: int = 1
         self.required_item: dict[str, int] = {}
         self.condition: str = ""
         self.type: str = ""
@@ -16,168 +18,382 @@ def __str__(self) -> str:
     def get_current_action(
         self, kb, current_status: dict, max_num: int = 5
     ) -> list[tuple[str, str]]:
-        task_queue = queue.Queue()
-        option_queue = queue.Queue()
-        task_queue.put(self)
-        while not task_queue.empty():
-            current_task = task_queue.get()
-            index = 0
-            flag = False
-            if current_task.type == "crafting_table":
-                if "crafting_table" not in current_status:
-                    this_task, success = kb.get_task_tree({"crafting_table": 1})
-                    task_queue.put(this_task)
-                    flag = True
-                else:
-                    for key, value in current_task.required_item.items():
-                        if key not in current_status or current_status[key] < value:
-                            for new_task in current_task.next_layer[index]:
-                                task_queue.put(new_task)
-                            flag = True
-                        index += 1
-                if not flag:
-                    option_queue.put(current_task)
-            elif current_task.type == "furnace":
-                if "furnace" not in current_status:
-                    if "furnace" not in current_status:
-                        this_task, success = kb.get_task_tree({"furnace": 1})
-                        task_queue.put(this_task)
-                    flag = True
-                else:
-                    for key, value in current_task.required_item.items():
-                        if key not in current_status or current_status[key] < value:
-                            for new_task in current_task.next_layer[index]:
-                                task_queue.put(new_task)
-                            flag = True
-                        index += 1
-                if not flag:
-                    option_queue.put(current_task)
-            elif current_task.type == "player" or current_task.type == "":
-                for key, value in current_task.required_item.items():
-                    if key not in current_status or current_status[key] < value:
-                        for new_task in current_task.next_layer[index]:
-                            task_queue.put(new_task)
-                        flag = True
-                    index += 1
-                if not flag:
-                    option_queue.put(current_task)
+        """
+        :param kb: KnowledgeBase, the knowledge base the tree was built from
+        :param current_status: dict, the inventory
+        :param max_num: int, stop after finding more than this many actions
+        :return: list[tuple[str, str]], the actions and their tips
+        Get the actions that can be done now. To call this on every step,
+        keep a TaskTreeState instead, which only re-evaluates the nodes
+        affected by the inventory changes.
+        """
+        return TaskTreeState(self, kb, max_num).update(current_status)
+
+    def _get_tip(self):
+        """
+        :return: tuple[str, str], the action and its tip, or None if the node
+            cannot be turned into an action
+        """
+        if self.type == "crafting_table":
+            this_tip = f"to craft {self.prev_item}, you need: "
+            for key, value in self.required_item.items():
+                this_tip += f"{key} * {value}, "
+            return (
+                f"craft {self.prev_num} {self.prev_item} with crafting table",
+                this_tip,
+            )
+        elif self.type == "furnace":
+            this_tip = f"to smelt {list(self.required_item.keys())[0]}, you need: "
+            for key, value in self.required_item.items():
+                this_tip += f"{key}*{value}, "
+            return (
+                f"smelt {list(self.required_item.values())[0]} {list(self.required_item.keys())[0]} with furnace",
+                this_tip,
+            )
+        elif self.type == "player":
+            this_tip = f"to craft {self.prev_item}, you need: "
+            for key, value in self.required_item.items():
+                this_tip += f"{key}*{value}, "
+            return (
+                f"craft {self.prev_num} {self.prev_item} with player crafting",
+                this_tip,
+            )
+        elif self.type == "mine":
+            if "silk_touch" in self.condition:
+                return None
+            if self.condition == "":
+                this_tip = ""
             else:
-                if self._fit_condition(current_task.condition, current_status):
-                    option_queue.put(current_task)
-                else:
-                    this_task, success = kb.get_task_tree(
-                        {self._get_condition(current_task.condition): 1}
-                    )
-                    task_queue.put(this_task)
-            if len(option_queue.queue) > max_num:
-                break
-        tips_list = []
-        for _ in range(len(option_queue.queue)):
-            this_option = option_queue.get()
-            if this_option.type == "crafting_table":
-                this_tip = f"to craft {this_option.prev_item}, you need: "
-                for key, value in this_option.required_item.items():
-                    this_tip += f"{key} * {value}, "
-                tips_list.append(
-                    (f"craft {this_option.prev_item} with crafting table", this_tip)
+                this_tip = f"to mine {list(self.required_item.keys())[0]}, you need: {self.condition}"
+            if self.prev_item.endswith("log") or self.prev_item.endswith("wood"):
+                return (
+                    f"mine {self.prev_num} wood or log for  to get wood or log",
+                    "there are oak_log, birch_log, spruce_log, jungle_log, acacia_log, dark_oak_log, mangrove_log and oak_wood, birch_wood, spruce_wood, jungle_wood, acacia_wood, dark_oak_wood, mangrove_wood in Minecraft",
                 )
-            elif this_option.type == "furnace":
-                this_tip = (
-                    f"to smelt {list(this_option.required_item.keys())[0]}, you need: "
-                )
-                for key, value in this_option.required_item.items():
-                    this_tip += f"{key}*{value}, "
-                tips_list.append(
-                    (
-                        f"smelt {list(this_option.required_item.keys())[0]} with furnace",
-                        this_tip,
-                    )
+            else:
+                return (
+                    f"mine {self.prev_num} {list(self.required_item.keys())[0]} to get {self.prev_item}",
+                    this_tip,
                 )
-            elif this_option.type == "player":
-                this_tip = f"to craft {this_option.prev_item}, you need: "
-                for key, value in this_option.required_item.items():
-                    this_tip += f"{key}*{value}, "
-                tips_list.append(
-                    (f"craft {this_option.prev_item} with player crafting", this_tip)
+        elif self.type == "combat":
+            this_tip = ""
+            return (
+                f"kill {list(self.required_item.keys())[0]} to get {self.prev_item}",
+                this_tip,
+            )
+        return None
+
+
+class TaskTreeState:
+    """
+    The incremental planning state of a task tree.
+
+    The state remembers, for every node it has evaluated, whether the node is
+    an action that can be done now or which nodes to look at instead, and
+    which inventory items that outcome was read from. Inventory changes only
+    mark the nodes reading the changed items dirty, and the actions are only
+    searched for again when a dirty node was part of the last search.
+
+    Only the evaluation of the nodes is incremental: when the actions are
+    searched for again, the search restarts from the root and the merge walks
+    every evaluated node, so a replan still costs time linear in the part of
+    the tree reached, with only the dirty nodes evaluated again. Inventory
+    changes which no node of the last search read cost nothing.
+    """
+
+    def __init__(self, task_tree: TaskTree, kb, max_num: int = 5):
+        """
+        :param task_tree: TaskTree, the task tree to plan
+        :param kb: KnowledgeBase, the knowledge base the tree was built from
+        :param max_num: int, stop after finding more than this many actions
+        """
+        self.__task_tree = task_tree
+        self.__kb = kb
+        self.__max_num = max_num
+        self.__status: dict = {}
+        self.__tool_table = kb.tool_table
+        self.__tools = set(self.__tool_table.get_tools())
+        # The mask of the tools in the inventory, see ToolTable.
+        self.__tool_mask = 0
+        # A map from nodes to whether they are actions and the groups of
+        # nodes to look at instead if not.
+        self.__outcomes: dict[TaskTree, tuple[bool, list[list[TaskTree]]]] = {}
+        # A map from item names to the evaluated nodes reading them.
+        self.__readers: dict[str, set[TaskTree]] = {}
+        # Trees of the stations and tools missing for some nodes.
+        self.__prerequisites: dict[str, TaskTree] = {}
+        self.__visited: set[TaskTree] = set()
+        self.__tips: list[tuple[str, str]] = None
+
+    def update(self, current_status: dict) -> list[tuple[str, str]]:
+        """
+        :param current_status: dict, the inventory
+        :return: list[tuple[str, str]], the actions and their tips
+        Replace the inventory and get the actions that can be done now
+        """
+        # Items that ran out count as missing.
+        current_status = {
+            key: value for key, value in current_status.items() if value > 0
+        }
+        changed = [
+            key
+            for key in self.__status.keys() | current_status.keys()
+            if self.__status.get(key) != current_status.get(key)
+        ]
+        self.__status = dict(current_status)
+        self._invalidate(changed)
+        return self.get_current_action()
+
+    def apply_delta(self, delta: dict[str, int]) -> list[tuple[str, str]]:
+        """
+        :param delta: dict[str, int], changes of the numbers of items
+        :return: list[tuple[str, str]], the actions and their tips
+        Apply inventory changes and get the actions that can be done now
+        """
+        for key, value in delta.items():
+            value += self.__status.get(key, 0)
+            if value > 0:
+                self.__status[key] = value
+            else:
+                # Items that ran out count as missing.
+                self.__status.pop(key, None)
+        self._invalidate(delta.keys())
+        return self.get_current_action()
+
+    def get_current_action(self) -> list[tuple[str, str]]:
+        """
+        :return: list[tuple[str, str]], the actions and their tips
+        """
+        if self.__tips is None:
+            self.__tips = self._search()
+        return list(self.__tips)
+
+    def _invalidate(self, changed):
+        """
+        :param changed: iterable of str, names of the changed items
+        Mark the nodes reading the changed items dirty
+        """
+        if not self.__tools.isdisjoint(changed):
+            self.__tool_mask = self.__tool_table.get_inventory_mask(self.__status)
+        for key in changed:
+            for node in self.__readers.pop(key, ()):
+                if self.__outcomes.pop(node, None) is None:
+                    continue
+                if node in self.__visited:
+                    self.__tips = None
+
+    def _search(self) -> list[tuple[str, str]]:
+        """
+        :return: list[tuple[str, str]], the actions and their tips
+        Search the tree breadth first for the actions, from the root so that
+        the actions kept within max_num are the same as from scratch, reusing
+        the outcomes of the nodes which are not dirty
+        """
+        task_queue = deque([self.__task_tree])
+        options = []
+        self.__visited = set()
+        while task_queue:
+            current_task = task_queue.popleft()
+            self.__visited.add(current_task)
+            outcome = self.__outcomes.get(current_task)
+            if outcome is None:
+                outcome = self._evaluate(current_task)
+            is_option, next_groups = outcome
+            if is_option:
+                options.append(current_task)
+            for group in next_groups:
+                task_queue.extend(group)
+            if len(options) > self.__max_num:
+                break
+
+        tips_list = []
+        for option in self._merge_options(options):
+            tip = option._get_tip()
+            if tip is not None:
+                tips_list.append(tip)
+        return tips_list
+
+    def _merge_options(self, options: list[TaskTree]) -> list[TaskTree]:
+        """
+        :param options: list[TaskTree], the actions found, in order
+        :return: list[TaskTree], the actions with identical ones reached
+            through several branches merged into one batched action
+        The numbers of items to make are added up across the branches which
+        are all needed, picking one of the alternatives of each item, and the
+        tree of a missing station or tool is counted once. The materials are
+        then computed for the total, rounding the number of crafts up once.
+        Actions only found under alternatives which were not picked keep the
+        number of their first branch. The demands are computed again for every
+        evaluated node on each search.
+        """
+        found = set(options)
+        prerequisites = set(self.__prerequisites.values())
+        demands = {}
+        total: dict[tuple, int] = {}
+        pending = [self.__task_tree]
+        counted = set(pending)
+        while pending:
+            demand, missing, _ = self._get_demand(
+                pending.pop(), found, prerequisites, demands
+            )
+            for key, num in demand.items():
+                total[key] = total.get(key, 0) + num
+            for prerequisite in missing - counted:
+                counted.add(prerequisite)
+                pending.append(prerequisite)
+
+        merged: dict[tuple, TaskTree] = {}
+        for option in options:
+            key = self._get_option_key(option)
+            if key not in merged:
+                merged[key] = self._batch_option(
+                    option, total.get(key, option.prev_num)
                 )
-            elif this_option.type == "mine":
-                if "silk_touch" in this_option.condition:
+        return list(merged.values())
+
+    def _get_demand(
+        self,
+        current_task: TaskTree,
+        found: set[TaskTree],
+        prerequisites: set[TaskTree],
+        demands: dict,
+    ) -> tuple[dict[tuple, int], set[TaskTree], int]:
+        """
+        :param current_task: TaskTree, the node to look at
+        :param found: set[TaskTree], the actions found by the search
+        :param prerequisites: set[TaskTree], the trees of the missing stations
+            and tools
+        :param demands: dict, the results computed so far, by node
+        :return: dict[tuple, int], the numbers of items to make by the actions
+            under the node, by action key, set[TaskTree], the trees of the
+            missing stations and tools under the node, int, the number of
+            steps to make the node
+        """
+        if current_task in demands:
+            return demands[current_task]
+        demand = {}
+        missing = set()
+        steps = 0
+        outcome = self.__outcomes.get(current_task)
+        if outcome is None:
+            # Not reached by the search.
+            pass
+        elif outcome[0]:
+            if current_task in found:
+                demand[self._get_option_key(current_task)] = current_task.prev_num
+                steps = 1
+        else:
+            steps = 1
+            for group in outcome[1]:
+                if len(group) == 1 and group[0] in prerequisites:
+                    missing.add(group[0])
                     continue
-                if this_option.condition == "":
-                    this_tip = ""
-                else:
-                    this_tip = f"to mine {list(this_option.required_item.keys())[0]}, you need: {this_option.condition}"
-                if this_option.prev_item.endswith(
-                    "log"
-                ) or this_option.prev_item.endswith("wood"):
-                    tips_list.append(
-                        (
-                            f"mine {this_option.prev_num} wood or log for  to get wood or log",
-                            "there are oak_log, birch_log, spruce_log, jungle_log, acacia_log, dark_oak_log, mangrove_log and oak_wood, birch_wood, spruce_wood, jungle_wood, acacia_wood, dark_oak_wood, mangrove_wood in Minecraft",
-                        )
-                    )
-                else:
-                    tips_list.append(
-                        (
-                            f"mine {this_option.prev_num} {list(this_option.required_item.keys())[0]} to get {this_option.prev_item}",
-                            this_tip,
-                        )
-                    )
-            elif this_option.type == "combat":
-                this_tip = ""
-                tips_list.append(
-                    (
-                        f"kill {list(this_option.required_item.keys())[0]} to get {this_option.prev_item}",
-                        this_tip,
+                # Pick the alternative missing the fewest stations and tools,
+                # then taking the fewest steps, among those leading to actions.
+                best = None
+                for alternative in group:
+                    result = self._get_demand(
+                        alternative, found, prerequisites, demands
                     )
-                )
-        return tips_list
+                    if len(result[0]) == 0 and len(result[1]) == 0:
+                        continue
+                    cost = (len(result[1]), result[2])
+                    if best is None or cost < best[0]:
+                        best = (cost, result)
+                if best is None:
+                    continue
+                alternative_demand, alternative_missing, alternative_steps = best[1]
+                for key, num in alternative_demand.items():
+                    demand[key] = demand.get(key, 0) + num
+                missing |= alternative_missing
+                steps += alternative_steps
+        demands[current_task] = (demand, missing, steps)
+        return demand, missing, steps
 
-    def _fit_condition(self, condition: str, current_status: dict) -> bool:
-        if condition == "":
-            return True
+    @staticmethod
+    def _get_option_key(option: TaskTree) -> tuple:
+        return (
+            option.type,
+            option.prev_item,
+            tuple(option.required_item),
+            option.condition,
+        )
+
+    @staticmethod
+    def _batch_option(option: TaskTree, num: int) -> TaskTree:
+        """
+        :param option: TaskTree, an action
+        :param num: int, the total number of items to make
+        :return: TaskTree, the action making num items, a copy so that the
+            shared node stays intact
+        """
+        if num == option.prev_num:
+            return option
+        batch = TaskTree()
+        batch.prev_item = option.prev_item
+        batch.prev_num = num
+        batch.count = option.count
+        batch.condition = option.condition
+        batch.type = option.type
+        if option.type in ("mine", "combat"):
+            batch.required_item = option.required_item
         else:
+            batches = -(-option.prev_num // option.count)
+            total_batches = -(-num // option.count)
+            batch.required_item = {
+                item: value // batches * total_batches
+                for item, value in option.required_item.items()
+            }
+        return batch
+
+    def _evaluate(self, current_task: TaskTree) -> tuple[bool, list[list[TaskTree]]]:
+        """
+        :param current_task: TaskTree, the node to evaluate
+        :return: bool, whether the node is an action that can be done now,
+            list[list[TaskTree]], the nodes to look at otherwise, in groups
+            which are all needed, of alternative nodes
+        """
+        current_status = self.__status
+        reads = list(current_task.required_item)
+        next_groups = []
+        flag = False
+        if current_task.type in ("crafting_table", "furnace", "player", ""):
+            if current_task.type in ("crafting_table", "furnace"):
+                reads.append(current_task.type)
             if (
-                "wooden_pickaxe" in condition
-                and "wooden_pickaxe" not in current_status
-                and "stone_pickaxe" not in current_status
-                and "iron_pickaxe" not in current_status
-                and "diamond_pickaxe" not in current_status
-                and "golden_pickaxe" not in current_status
-                and "netherite_pickaxe" not in current_status
-            ):
-                return False
-            if (
-                "stone_pickaxe" in condition
-                and "stone_pickaxe" not in current_status
-                and "iron_pickaxe" not in current_status
-                and "diamond_pickaxe" not in current_status
-                and "netherite_pickaxe" not in current_status
-            ):
-                return False
-            if (
-                "iron_pickaxe" in condition
-                and "iron_pickaxe" not in current_status
-                and "diamond_pickaxe" not in current_status
-                and "netherite_pickaxe" not in current_status
-            ):
-                return False
-            if (
-                "diamond_pickaxe" in condition
-                and "diamond_pickaxe" not in current_status
-                and "netherite_pickaxe" not in current_status
-            ):
-                return False
-            if (
-                "netherite_pickaxe" in condition
-                and "netherite_pickaxe" not in current_status
+                current_task.type in ("crafting_table", "furnace")
+                and current_task.type not in current_status
             ):
-                return False
+                next_groups.append([self._get_prerequisite(current_task.type)])
+                flag = True
+            else:
+                for index, (key, value) in enumerate(
+                    current_task.required_item.items()
+                ):
+                    if key not in current_status or current_status[key] < value:
+                        next_groups.append(current_task.next_layer[index])
+                        flag = True
+        else:
+            # Whether the block can be mined only depends on the tools.
+            reads = self.__tools
+            block = next(iter(current_task.required_item), "")
+            if not self.__tool_table.can_harvest(block, self.__tool_mask):
+                next_groups.append(
+                    [self._get_prerequisite(self.__tool_table.get_minimum_tool(block))]
+                )
+                flag = True
 
-        return True
+        outcome = (not flag, next_groups)
+        self.__outcomes[current_task] = outcome
+        for key in reads:
+            self.__readers.setdefault(key, set()).add(current_task)
+        return outcome
 
-    def _get_condition(self, condition: str) -> str:
-        conds = condition.split(" ")
-        for cond in conds:
-            if "pickaxe" in cond:
-                return cond
+    def _get_prerequisite(self, item: str) -> TaskTree:
+        """
+        :param item: str, name of a missing station or tool
+        :return: TaskTree, the task tree of the item
+        """
+        if item not in self.__prerequisites:
+            self.__prerequisites[item] = self.__kb.get_task_tree({item: 1})[0]
+        return self.__prerequisites[item]
@@ -0,0 +1,174 @@
+import atexit
+import os
+import pickle
+import struct
+import sys
+import weakref
+from array import array
+from multiprocessing import resource_tracker, shared_memory
+
+import recipe_graph
+
+# Bump whenever the layout of the arena changes.
+ARENA_VERSION = 2
+
+_MAGIC = b"KBAR"
+# Magic, version, length of the pickled layout following the header, and the
+# device and inode of the resource tracker pipe of the publisher.
+_HEADER = struct.Struct("<4sIIQQ")
+
+# The arrays of a recipe graph, stored in the arena in this order.
+_GRAPH_ARRAYS = (
+    "_recipe_offsets",
+    "_recipe_types",
+    "_recipe_conditions",
+    "_recipe_counts",
+    "_ingredient_offsets",
+    "_ingredient_ids",
+    "_ingredient_counts",
+    "_use_offsets",
+    "_use_ids",
+    "_use_types",
+    "_use_conditions",
+)
+
+# Graphs attached in this process, detached at exit at the latest.
+_attached = weakref.WeakSet()
+
+
+def _get_tracker_id() -> tuple[int, int]:
+    """
+    :return: tuple[int, int], device and inode of the pipe to the resource
+        tracker of this process, shared with the processes it started, or
+        (0, 0) if there is none
+    """
+    fd = getattr(resource_tracker._resource_tracker, "_fd", None)
+    if fd is None:
+        return 0, 0
+    try:
+        stat = os.fstat(fd)
+    except OSError:
+        return 0, 0
+    return stat.st_dev, stat.st_ino
+
+
+def publish(graph: recipe_graph.RecipeGraph, extra=None, name: str = None):
+    """
+    :param graph: RecipeGraph, the graph to publish
+    :param extra: picklable object stored along, e.g. the tool table
+    :param name: str, name of the shared memory, or None for a random one
+    :return: SharedMemory, the arena, to be unlinked by the publisher once no
+        process needs it anymore
+    Copy a recipe graph into a read-only shared memory arena. The arrays are
+    stored as they are, item names and conditions as NUL-separated string
+    tables, and their positions in a small pickled layout after the header.
+    """
+    blobs = [getattr(graph, attr).tobytes() for attr in _GRAPH_ARRAYS]
+    blobs.append("\0".join(graph._names).encode("utf-8"))
+    blobs.append("\0".join(graph._conditions).encode("utf-8"))
+    blobs.append(pickle.dumps(extra, protocol=pickle.HIGHEST_PROTOCOL))
+
+    # Every blob starts at a multiple of 8 bytes, so that casts are aligned.
+    ranges = []
+    position = 0
+    for blob in blobs:
+        ranges.append((position, len(blob)))
+        position += -(-len(blob) // 8) * 8
+    layout = pickle.dumps(
+        {
+            "arrays": [
+                (attr, getattr(graph, attr).typecode, start, size)
+                for attr, (start, size) in zip(_GRAPH_ARRAYS, ranges)
+            ],
+            "names": ranges[-3],
+            "conditions": ranges[-2],
+            "extra": ranges[-1],
+        },
+        protocol=pickle.HIGHEST_PROTOCOL,
+    )
+    data_start = -(-(_HEADER.size + len(layout)) // 8) * 8
+
+    arena = shared_memory.SharedMemory(
+        name=name, create=True, size=max(data_start + position, 1)
+    )
+    _HEADER.pack_into(
+        arena.buf, 0, _MAGIC, ARENA_VERSION, len(layout), *_get_tracker_id()
+    )
+    arena.buf[_HEADER.size : _HEADER.size + len(layout)] = layout
+    for blob, (start, size) in zip(blobs, ranges):
+        arena.buf[data_start + start : data_start + start + size] = blob
+    return arena
+
+
+def attach(name: str):
+    """
+    :param name: str, name of an arena created by publish
+    :return: SharedMemory, the arena, which must stay open as long as the
+        graph is used, RecipeGraph, the graph, object, the extra object
+    The arrays of the graph are read-only views of the arena, so attaching
+    copies nothing but the string tables, decoded into the name index.
+    Release them with detach once the graph is not used anymore.
+    """
+    if sys.version_info >= (3, 13):
+        arena = shared_memory.SharedMemory(name=name, track=False)
+        magic, version, layout_size, *_ = _HEADER.unpack_from(arena.buf, 0)
+    else:
+        arena = shared_memory.SharedMemory(name=name)
+        magic, version, layout_size, *tracker_id = _HEADER.unpack_from(arena.buf, 0)
+        # The resource tracker would unlink the arena when this process exits,
+        # although it is owned by the publisher. Processes started by the
+        # publisher share its tracker, where the registration of the
+        # publisher must stay.
+        if tuple(tracker_id) == (0, 0) or tuple(tracker_id) != _get_tracker_id():
+            resource_tracker.unregister(arena._name, "shared_memory")
+
+    if magic != _MAGIC or version != ARENA_VERSION:
+        arena.close()
+        raise ValueError(
+            f"{name} is not a knowledge base arena of version {ARENA_VERSION}"
+        )
+    layout = pickle.loads(arena.buf[_HEADER.size : _HEADER.size + layout_size])
+    data_start = -(-(_HEADER.size + layout_size) // 8) * 8
+
+    buf = arena.buf.toreadonly()
+
+    def get_blob(blob_range):
+        start, size = blob_range
+        return buf[data_start + start : data_start + start + size]
+
+    graph = recipe_graph.RecipeGraph()
+    for attr, typecode, start, size in layout["arrays"]:
+        if size == 0:
+            setattr(graph, attr, array(typecode))
+        else:
+            setattr(graph, attr, get_blob((start, size)).cast(typecode))
+    graph._names = str(get_blob(layout["names"]), "utf-8").split("\0")
+    if graph._names == [""]:
+        graph._names = []
+    graph._ids = {item: item_id for item_id, item in enumerate(graph._names)}
+    graph._conditions = str(get_blob(layout["conditions"]), "utf-8").split("\0")
+    # Keep the arena mapped as long as the graph is.
+    graph._arena = arena
+    _attached.add(graph)
+
+    return arena, graph, pickle.loads(get_blob(layout["extra"]))
+
+
+def detach(graph: recipe_graph.RecipeGraph):
+    """
+    :param graph: RecipeGraph, a graph returned by attach
+    Release the views of the arena held by the graph and unmap the arena, which
+    cannot be closed while they exist. The graph cannot be used afterwards.
+    """
+    for attr in _GRAPH_ARRAYS:
+        view = getattr(graph, attr)
+        if isinstance(view, memoryview):
+            view.release()
+    graph._arena.close()
+    _attached.discard(graph)
+
+
+@atexit.register
+def _detach_all():
+    for graph in list(_attached):
+        detach(graph)
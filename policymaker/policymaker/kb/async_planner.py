@@ -0,0 +1,144 @@
+import asyncio
+import concurrent.futures
+import json
+import os
+
+import knowledge_base
+import planner as kb_planner
+
+# The knowledge base of a worker process, loaded once by _init_worker.
+_kb: knowledge_base.KnowledgeBase = None
+
+
+def _init_worker(kb_options: dict):
+    """
+    :param kb_options: dict, keyword arguments of KnowledgeBase
+    Load the knowledge base of a worker process
+    """
+    global _kb
+    _kb = knowledge_base.KnowledgeBase(**kb_options)
+
+
+def _ping() -> bool:
+    return _kb is not None
+
+
+def _get_plan(goal: dict[str, int], inventory: dict[str, int]):
+    return _kb.get_plan(goal, inventory)
+
+
+def _get_actions(goal: dict[str, int], current_status: dict, max_num: int):
+    task_tree, _ = _kb.get_task_tree(goal, max_num=max_num)
+    return task_tree.get_current_action(
+        kb=_kb, current_status=current_status, max_num=max_num
+    )
+
+
+class AsyncPlanner:
+    """
+    An asyncio facade running the planning of a knowledge base in a pool of
+    worker processes, so that the pure-Python searches never block the event
+    loop.
+
+    Every worker loads its own knowledge base once, when it starts, from the
+    snapshot or, with shared_memory, by attaching to an arena published by
+    another process. Identical requests in flight are coalesced into one
+    call, and callers stop waiting after the timeout. A timed-out call keeps
+    its worker busy until it finishes, as running calls cannot be
+    interrupted.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = None,
+        timeout: float = 10.0,
+        shared_memory: str = None,
+        **kb_options,
+    ):
+        """
+        :param max_workers: int, number of worker processes, the number of
+            CPUs if None
+        :param timeout: float, seconds to wait for a call, or None to wait
+            forever
+        :param shared_memory: str, name of an arena the workers attach to,
+            see KnowledgeBase.publish
+        :param kb_options: keyword arguments of KnowledgeBase in the workers
+        """
+        if shared_memory is not None:
+            kb_options["shared_memory"] = shared_memory
+        self.__executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_worker,
+            initargs=(kb_options,),
+        )
+        self.__max_workers = max_workers or os.cpu_count() or 1
+        self.__timeout = timeout
+        # Calls in flight by request key.
+        self.__pending: dict[str, asyncio.Future] = {}
+
+    @property
+    def pending_calls(self) -> int:
+        """
+        :return: int, number of distinct calls in flight
+        """
+        return len(self.__pending)
+
+    async def start(self):
+        """
+        Start all the workers and wait until they loaded the knowledge base,
+        so that the first requests do not pay for it
+        """
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(
+            *(
+                loop.run_in_executor(self.__executor, _ping)
+                for _ in range(self.__max_workers)
+            )
+        )
+
+    def close(self):
+        """
+        Shut the workers down, without waiting for running calls
+        """
+        self.__executor.shutdown(wait=False, cancel_futures=True)
+
+    async def get_plan(
+        self, goal: dict[str, int], inventory: dict[str, int] = None
+    ) -> (list[kb_planner.PlanStep], float):
+        """
+        :param goal: dict[str, int], names and numbers of the required items
+        :param inventory: dict[str, int], names and numbers of the owned items
+        :return: list[PlanStep], float, see KnowledgeBase.get_plan
+        """
+        return await self._call(_get_plan, goal, inventory or {})
+
+    async def get_actions(
+        self, goal: dict[str, int], current_status: dict, max_num: int = 10
+    ) -> list[tuple[str, str]]:
+        """
+        :param goal: dict[str, int], names and numbers of the required items
+        :param current_status: dict, the inventory
+        :param max_num: int, maximum number of actions
+        :return: list[tuple[str, str]], the actions that can be done now and
+            their tips, see TaskTree.get_current_action
+        """
+        return await self._call(_get_actions, goal, current_status, max_num)
+
+    async def _call(self, function, *args):
+        """
+        :param function: a function of this module run in a worker
+        :param args: its arguments, JSON-serializable
+        :return: the result of the function
+        Run a function in a worker, or join the identical call in flight
+        """
+        key = json.dumps([function.__name__, args], sort_keys=True)
+        future = self.__pending.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.__executor, function, *args)
+            self.__pending[key] = future
+            future.add_done_callback(lambda _: self.__pending.pop(key, None))
+
+        # A caller timing out or cancelled must not cancel the call for the
+        # others.
+        return await asyncio.wait_for(asyncio.shield(future), self.__timeout)
@@ -3,6 +3,13 @@
 import os
 import tarfile
 import TaskTree
+import arena as kb_arena
+import planner as kb_planner
+import qa_store
+import recipe_graph
+import retriever as kb_retriever
+import snapshot as kb_snapshot
+import tool_table as kb_tool_table
 
 
 class KnowledgeBase:
@@ -13,42 +20,232 @@ def __init__(
         loot: bool = True,
         drop: bool = True,
         resume: bool = False,
+        snapshot: bool = True,
+        shared_memory: str = None,
     ):
         """
         :param base_path: str, path to the knowledge base
         :param recipe: load recipe or not
         :param loot: load loot or not
+        :param snapshot: load from and save to a precompiled snapshot or not
+        :param shared_memory: str, name of an arena published by another
+            process to attach to instead of loading, see publish
         """
 
         if os.path.exists(f"{os.path.dirname(__file__)}/{base_path}"):
             self.__base_path = f"{os.path.dirname(__file__)}/{base_path}"
             self.__tar = tarfile.open(f"{self.__base_path}/data.tar", "r")
-        self.load(recipe, loot, drop, resume)
+        self.__member_names = None
+        self.__member_name_set = set()
+        self.__tag_cache = {}
+        self.__arena = None
+        self.load(recipe, loot, drop, resume, snapshot, shared_memory)
 
     def __del__(self):
         self.__tar.close()
 
-    def load(self, recipe, loot, drop, resume):
+    def load(self, recipe, loot, drop, resume, snapshot=True, shared_memory=None):
         """
         :param recipe: load recipe or not
         :param loot: load loot or not
+        :param snapshot: load from and save to a precompiled snapshot or not
+        :param shared_memory: str, name of an arena to attach to, or None
+        The snapshot is used when it was built from the current data.tar with
+        the same options, and is rebuilt otherwise.
         """
+        if self.__arena is not None and not self.__is_arena_owner:
+            self.detach()
         self.__recipe = recipe
         self.__loot = loot
         self.__drop = drop
         self.__resume = resume
-        self.__material_to_crafted = {}
-        self.__crafted_to_material = {}
-        self.__qa = {}
-        if self.__recipe:
-            self._load_recipe()
-        if self.__loot:
-            self._load_loot()
-        if self.__drop:
-            self._load_drop()
-        if self.__resume:
-            with open(f"{self.__base_path}/qa.json", "r") as qa:
-                self.__qa = json.load(qa)
+        self.__graph = recipe_graph.RecipeGraph()
+        self.__tool_table = kb_tool_table.ToolTable()
+        self.__planner = None
+        self.__retriever = None
+        self.invalidate_task_tree_cache()
+        if shared_memory is not None:
+            self._attach(shared_memory)
+        elif not snapshot or not self._load_snapshot():
+            self.__builder = recipe_graph.RecipeGraphBuilder()
+            self._load_tool_table()
+            if self.__recipe:
+                self._load_recipe()
+            if self.__loot:
+                self._load_loot()
+            if self.__drop:
+                self._load_drop()
+            self.__graph = self.__builder.build()
+            self.__builder = None
+            if snapshot:
+                try:
+                    self.save_snapshot()
+                except OSError:
+                    # The data directory may be read-only.
+                    pass
+        self.__qa = qa_store.QAStore(self.__base_path, self.__resume)
+
+    def _get_snapshot_path(self) -> str:
+        return kb_snapshot.get_snapshot_path(
+            self.__base_path, self.__recipe, self.__loot, self.__drop
+        )
+
+    def _load_snapshot(self) -> bool:
+        """
+        :return: bool, whether a fresh snapshot was loaded
+        """
+        content = kb_snapshot.load_snapshot(
+            self._get_snapshot_path(), f"{self.__base_path}/data.tar"
+        )
+        if content is None:
+            return False
+        self.__graph = content["graph"]
+        self.__tool_table = content["tool_table"]
+        return True
+
+    def save_snapshot(self) -> str:
+        """
+        :return: str, path to the saved snapshot
+        Save the loaded recipes, loot and drops as a snapshot of data.tar
+        """
+        snapshot_path = self._get_snapshot_path()
+        kb_snapshot.save_snapshot(
+            snapshot_path,
+            f"{self.__base_path}/data.tar",
+            {"graph": self.__graph, "tool_table": self.__tool_table},
+        )
+        return snapshot_path
+
+    def publish(self, name: str = None) -> str:
+        """
+        :param name: str, name of the shared memory, or None for a random one
+        :return: str, name of the arena, to pass as shared_memory to the
+            KnowledgeBase of other processes
+        Publish the loaded recipes, loot and drops in a read-only shared memory
+        arena, see arena.publish. The arena lives until unpublish is called.
+        """
+        if self.__arena is not None:
+            raise RuntimeError("the knowledge base is already in shared memory")
+        self.__arena = kb_arena.publish(self.__graph, self.__tool_table, name)
+        self.__is_arena_owner = True
+        return self.__arena.name
+
+    def unpublish(self):
+        """
+        Remove the arena created by publish. Processes attached to it keep
+        their mapping until they exit.
+        """
+        if self.__arena is None or not self.__is_arena_owner:
+            raise RuntimeError("the knowledge base did not publish an arena")
+        self.__arena.unlink()
+        self.__arena.close()
+        self.__arena = None
+
+    def detach(self):
+        """
+        Release the arena attached with shared_memory. The knowledge base is
+        empty afterwards, until it is loaded again.
+        """
+        if self.__arena is None or self.__is_arena_owner:
+            raise RuntimeError("the knowledge base is not attached to an arena")
+        kb_arena.detach(self.__graph)
+        self.__arena = None
+        self.__graph = recipe_graph.RecipeGraph()
+        self.__tool_table = kb_tool_table.ToolTable()
+        self.__planner = None
+        self.__retriever = None
+        self.invalidate_task_tree_cache()
+
+    def _attach(self, name: str):
+        """
+        :param name: str, name of an arena
+        Use the recipes, loot and drops of an arena without copying them
+        """
+        self.__arena, self.__graph, self.__tool_table = kb_arena.attach(name)
+        self.__is_arena_owner = False
+
+    def _get_member_names(self) -> list[str]:
+        """
+        :return: list[str], names of all members of data.tar
+        The names are indexed once, on first use, so that loading from a
+        snapshot never has to scan the tar.
+        """
+        if self.__member_names is None:
+            self.__member_names = self.__tar.getnames()
+            self.__member_name_set = set(self.__member_names)
+        return self.__member_names
+
+    def _has_member(self, name: str) -> bool:
+        """
+        :param name: str, name of a member of data.tar
+        :return: bool, whether data.tar contains the member
+        """
+        self._get_member_names()
+        return name in self.__member_name_set
+
+    def _resolve_tag(self, tag: str):
+        """
+        :param tag: str, name of an item tag, with or without namespace
+        :return: list[str], ids of the items in the tag with nested tags
+            expanded recursively, or None if the tag does not exist
+        Resolved tags are memoized, so each tag file is parsed at most once
+        unless it is part of a cycle of nested tags.
+        """
+        return self._expand_tag(self._get_tag_name(tag), set())[0]
+
+    def _expand_tag(self, tag: str, resolving: set[str]):
+        """
+        :param tag: str, name of an item tag without namespace
+        :param resolving: set[str], tags being expanded up the stack
+        :return: list[str], ids of the items in the tag, or None if the tag
+            does not exist, set[str], the tags up the stack reached again
+            through a cycle, whose items were left out
+        A tag is only memoized when no tag up the stack was left out, as its
+        items are complete then.
+        """
+        if tag in self.__tag_cache:
+            return self.__tag_cache[tag], set()
+        if not self._has_member(f"tags/items/{tag}.json"):
+            return None, set()
+
+        resolving.add(tag)
+
+        items = []
+        cut = set()
+        f = self.__tar.extractfile(f"tags/items/{tag}.json")
+        for value in json.load(f)["values"]:
+            # Optional entries are objects like {"id": ..., "required": false}.
+            if isinstance(value, dict):
+                value = value["id"]
+            if value.startswith("#"):
+                nested_tag = self._get_tag_name(value)
+                if nested_tag in resolving:
+                    cut.add(nested_tag)
+                    continue
+                nested_items, nested_cut = self._expand_tag(nested_tag, resolving)
+                items.extend(nested_items or [])
+                cut |= nested_cut
+            else:
+                items.append(value)
+
+        resolving.discard(tag)
+        # The items of the tag itself are all here.
+        cut.discard(tag)
+
+        # Drop duplicates reached through several nested tags.
+        items = list(dict.fromkeys(items))
+        if len(cut) == 0:
+            self.__tag_cache[tag] = items
+        return items, cut
+
+    @staticmethod
+    def _get_tag_name(tag: str) -> str:
+        """
+        :param tag: str, a tag reference like "#minecraft:logs", "#logs" or
+            "minecraft:logs"
+        :return: str, name of the tag without "#" and namespace
+        """
+        return tag.removeprefix("#").split(":")[-1]
 
     def _load_recipe_shapeless(self, recipe):
         """
@@ -62,31 +259,18 @@ def _load_recipe_shapeless(self, recipe):
             recipe_type = "player"
 
         crafted = recipe["result"]["item"].split(":")[1]
-        if crafted not in self.__crafted_to_material:
-            self.__crafted_to_material[crafted] = []
+        count = recipe["result"].get("count", 1)
 
         this_recipe = [{"recipe": {}, "type": recipe_type}]
 
         for ingredient in recipe["ingredients"]:
             if "item" in ingredient:
-                if ingredient["item"].split(":")[1] not in self.__material_to_crafted:
-                    self.__material_to_crafted[ingredient["item"].split(":")[1]] = [
-                        {"item": crafted, "type": recipe_type}
-                    ]
-                else:
-                    for item in self.__material_to_crafted[
-                        ingredient["item"].split(":")[1]
-                    ]:
-                        if item["item"] == crafted:
-                            break
-                    else:
-                        self.__material_to_crafted[
-                            ingredient["item"].split(":")[1]
-                        ].append({"item": crafted, "type": recipe_type})
-                if ingredient["item"].split(":")[1] not in this_recipe[0]["recipe"]:
-                    this_recipe[0]["recipe"][ingredient["item"].split(":")[1]] = 1
+                material = ingredient["item"].split(":")[1]
+                self.__builder.add_use(material, crafted, recipe_type)
+                if material not in this_recipe[0]["recipe"]:
+                    this_recipe[0]["recipe"][material] = 1
                 else:
-                    this_recipe[0]["recipe"][ingredient["item"].split(":")[1]] += 1
+                    this_recipe[0]["recipe"][material] += 1
 
         for ingredient in recipe["ingredients"]:
             if isinstance(ingredient, list):
@@ -94,64 +278,29 @@ def _load_recipe_shapeless(self, recipe):
                     for _ in range(len(ingredient) - 1):
                         this_recipe.append(copy.deepcopy(this_recipe[0]))
                 for ind, item_ in enumerate(ingredient):
-                    if item_["item"].split(":")[1] not in self.__material_to_crafted:
-                        self.__material_to_crafted[item_["item"].split(":")[1]] = [
-                            {"item": crafted, "type": recipe_type}
-                        ]
-                    else:
-                        for item in self.__material_to_crafted[
-                            item_["item"].split(":")[1]
-                        ]:
-                            if item["item"] == crafted:
-                                break
-                        else:
-                            self.__material_to_crafted[
-                                item_["item"].split(":")[1]
-                            ].append({"item": crafted, "type": recipe_type})
-                    if item_["item"].split(":")[1] not in this_recipe[ind]["recipe"]:
-                        this_recipe[ind]["recipe"][item_["item"].split(":")[1]] = 1
+                    material = item_["item"].split(":")[1]
+                    self.__builder.add_use(material, crafted, recipe_type)
+                    if material not in this_recipe[ind]["recipe"]:
+                        this_recipe[ind]["recipe"][material] = 1
                     else:
-                        this_recipe[ind]["recipe"][item_["item"].split(":")[1]] += 1
+                        this_recipe[ind]["recipe"][material] += 1
         for ingredient in recipe["ingredients"]:
             if "tag" in ingredient:
-                tag = ingredient["tag"].split(":")[1]
-                if f"tags/items/{tag}.json" in self.__tar.getnames():
-                    f = self.__tar.extractfile(f"tags/items/{tag}.json")
-                    tag = json.load(f)
-                    recipe_list = tag["values"]
-                    for item in recipe_list:
-                        if item.startswith("#minecraft:"):
-                            recipe_list.remove(item)
-                            if (
-                                f"tags/items/{item.split(':')[1]}.json"
-                                in self.__tar.getnames()
-                            ):
-                                f = self.__tar.extractfile(
-                                    f"tags/items/{item.split(':')[1]}.json"
-                                )
-                                tag = json.load(f)
-                                recipe_list.extend(tag["values"])
+                tag = self._get_tag_name(ingredient["tag"])
+                recipe_list = self._resolve_tag(tag)
+                if recipe_list is not None:
                     if len(this_recipe) == 1:
                         for _ in range(len(recipe_list) - 1):
                             this_recipe.append(copy.deepcopy(this_recipe[0]))
                     for ind, item_ in enumerate(recipe_list):
-                        if item_.split(":")[1] not in self.__material_to_crafted:
-                            self.__material_to_crafted[item_.split(":")[1]] = [
-                                {"item": crafted, "type": recipe_type}
-                            ]
-                        else:
-                            for item in self.__material_to_crafted[item_.split(":")[1]]:
-                                if item["item"] == crafted:
-                                    break
-                            else:
-                                self.__material_to_crafted[item_.split(":")[1]].append(
-                                    {"item": crafted, "type": recipe_type}
-                                )
-                        if item_.split(":")[1] not in this_recipe[ind]["recipe"]:
-                            this_recipe[ind]["recipe"][item_.split(":")[1]] = 1
+                        material = item_.split(":")[1]
+                        self.__builder.add_use(material, crafted, recipe_type)
+                        if material not in this_recipe[ind]["recipe"]:
+                            this_recipe[ind]["recipe"][material] = 1
                         else:
-                            this_recipe[ind]["recipe"][item_.split(":")[1]] += 1
-        self.__crafted_to_material[crafted].extend(this_recipe)
+                            this_recipe[ind]["recipe"][material] += 1
+        for item in this_recipe:
+            self.__builder.add_recipe(crafted, item["recipe"], item["type"], count)
 
     def _load_recipe_shaped(self, recipe):
         """
@@ -169,10 +318,9 @@ def _load_recipe_shaped(self, recipe):
                 recipe_type = "player"
 
         crafted = recipe["result"]["item"].split(":")[1]
+        count = recipe["result"].get("count", 1)
         if crafted in ["barrel", "campfire", "soul_campfire"]:
             return
-        if crafted not in self.__crafted_to_material:
-            self.__crafted_to_material[crafted] = []
 
         this_recipe = [{"recipe": {}, "type": recipe_type}]
 
@@ -188,47 +336,16 @@ def _load_recipe_shaped(self, recipe):
 
         for key in recipe["key"]:
             if "item" in recipe["key"][key]:
-                if (
-                    recipe["key"][key]["item"].split(":")[1]
-                    not in self.__material_to_crafted
-                ):
-                    self.__material_to_crafted[
-                        recipe["key"][key]["item"].split(":")[1]
-                    ] = [{"item": crafted, "type": recipe_type}]
-                else:
-                    for item in self.__material_to_crafted[
-                        recipe["key"][key]["item"].split(":")[1]
-                    ]:
-                        if item["item"] == crafted:
-                            break
-                    else:
-                        self.__material_to_crafted[
-                            recipe["key"][key]["item"].split(":")[1]
-                        ].append({"item": crafted, "type": recipe_type})
-                this_recipe[0]["recipe"][
-                    recipe["key"][key]["item"].split(":")[1]
-                ] = keyToNum[key]
+                material = recipe["key"][key]["item"].split(":")[1]
+                self.__builder.add_use(material, crafted, recipe_type)
+                this_recipe[0]["recipe"][material] = keyToNum[key]
 
         reqNum = 1
         for key in recipe["key"]:
             if "tag" in recipe["key"][key]:
-                tag = recipe["key"][key]["tag"].split(":")[1]
-                if f"tags/items/{tag}.json" in self.__tar.getnames():
-                    f = self.__tar.extractfile(f"tags/items/{tag}.json")
-                    tag = json.load(f)
-                    recipe_list = tag["values"]
-                    for item in recipe_list:
-                        if item.startswith("#minecraft:"):
-                            recipe_list.remove(item)
-                            if (
-                                f"tags/items/{item.split(':')[1]}.json"
-                                in self.__tar.getnames()
-                            ):
-                                f = self.__tar.extractfile(
-                                    f"tags/items/{item.split(':')[1]}.json"
-                                )
-                                tag = json.load(f)
-                                recipe_list.extend(tag["values"])
+                tag = self._get_tag_name(recipe["key"][key]["tag"])
+                recipe_list = self._resolve_tag(tag)
+                if recipe_list is not None:
                     reqNum = len(recipe_list) * reqNum
             if isinstance(recipe["key"][key], list):
                 reqNum = len(recipe["key"][key]) * reqNum
@@ -242,75 +359,29 @@ def _load_recipe_shaped(self, recipe):
                     flag = True
                     stride = reqNum // len(recipe["key"][key])
                     for ind, item_ in enumerate(recipe["key"][key]):
-                        if (
-                            item_["item"].split(":")[1]
-                            not in self.__material_to_crafted
-                        ):
-                            self.__material_to_crafted[item_["item"].split(":")[1]] = [
-                                {"item": crafted, "type": recipe_type}
-                            ]
-                        else:
-                            for item in self.__material_to_crafted[
-                                item_["item"].split(":")[1]
-                            ]:
-                                if item["item"] == crafted:
-                                    break
-                            else:
-                                self.__material_to_crafted[
-                                    item_["item"].split(":")[1]
-                                ].append({"item": crafted, "type": recipe_type})
+                        material = item_["item"].split(":")[1]
+                        self.__builder.add_use(material, crafted, recipe_type)
                         for i in range(ind * stride, (ind + 1) * stride):
-                            this_recipe[i]["recipe"][
-                                item_["item"].split(":")[1]
-                            ] = keyToNum[key]
+                            this_recipe[i]["recipe"][material] = keyToNum[key]
 
             for key in recipe["key"]:
                 if "tag" in recipe["key"][key]:
-                    tag = recipe["key"][key]["tag"].split(":")[1]
-                    if f"tags/items/{tag}.json" in self.__tar.getnames():
-                        f = self.__tar.extractfile(f"tags/items/{tag}.json")
-                        tag = json.load(f)
-                        recipe_list = tag["values"]
-                        for item in recipe_list:
-                            if item.startswith("#minecraft:"):
-                                recipe_list.remove(item)
-                                if (
-                                    f"tags/items/{item.split(':')[1]}.json"
-                                    in self.__tar.getnames()
-                                ):
-                                    f = self.__tar.extractfile(
-                                        f"tags/items/{item.split(':')[1]}.json"
-                                    )
-                                    tag = json.load(f)
-                                    recipe_list.extend(tag["values"])
+                    tag = self._get_tag_name(recipe["key"][key]["tag"])
+                    recipe_list = self._resolve_tag(tag)
+                    if recipe_list is not None:
                         stride = reqNum // len(recipe_list)
                         for ind, item_ in enumerate(recipe_list):
-                            if item_.split(":")[1] not in self.__material_to_crafted:
-                                self.__material_to_crafted[item_.split(":")[1]] = [
-                                    {"item": crafted, "type": recipe_type}
-                                ]
-                            else:
-                                for item in self.__material_to_crafted[
-                                    item_.split(":")[1]
-                                ]:
-                                    if item["item"] == crafted:
-                                        break
-                                else:
-                                    self.__material_to_crafted[
-                                        item_.split(":")[1]
-                                    ].append({"item": crafted, "type": recipe_type})
+                            material = item_.split(":")[1]
+                            self.__builder.add_use(material, crafted, recipe_type)
                             if not flag:
                                 for i in range(ind * stride, (ind + 1) * stride):
-                                    this_recipe[i]["recipe"][
-                                        item_.split(":")[1]
-                                    ] = keyToNum[key]
+                                    this_recipe[i]["recipe"][material] = keyToNum[key]
                             else:
                                 for i in range(ind, reqNum, stride):
-                                    this_recipe[i]["recipe"][
-                                        item_.split(":")[1]
-                                    ] = keyToNum[key]
+                                    this_recipe[i]["recipe"][material] = keyToNum[key]
 
-        self.__crafted_to_material[crafted].extend(this_recipe)
+        for item in this_recipe:
+            self.__builder.add_recipe(crafted, item["recipe"], item["type"], count)
 
     def _load_recipe_furnace(self, recipe):
         """
@@ -318,93 +389,43 @@ def _load_recipe_furnace(self, recipe):
         Load a furnace recipe
         """
         crafted = recipe["result"].split(":")[1]
+        count = 1
 
         recipe_type = "furnace"
 
-        if crafted not in self.__crafted_to_material:
-            self.__crafted_to_material[crafted] = []
-
         this_recipe = [{"recipe": {}, "type": recipe_type}]
 
         if "item" in recipe["ingredient"]:
-            if (
-                recipe["ingredient"]["item"].split(":")[1]
-                not in self.__material_to_crafted
-            ):
-                self.__material_to_crafted[
-                    recipe["ingredient"]["item"].split(":")[1]
-                ] = [{"item": crafted, "type": recipe_type}]
-            else:
-                for item in self.__material_to_crafted[
-                    recipe["ingredient"]["item"].split(":")[1]
-                ]:
-                    if item["item"] == crafted:
-                        break
-                else:
-                    self.__material_to_crafted[
-                        recipe["ingredient"]["item"].split(":")[1]
-                    ].append({"item": crafted, "type": recipe_type})
-            this_recipe[0]["recipe"][recipe["ingredient"]["item"].split(":")[1]] = 1
+            material = recipe["ingredient"]["item"].split(":")[1]
+            self.__builder.add_use(material, crafted, recipe_type)
+            this_recipe[0]["recipe"][material] = 1
 
         if isinstance(recipe["ingredient"], list):
             for _ in range(len(recipe["ingredient"]) - 1):
                 this_recipe.append(copy.deepcopy(this_recipe[0]))
             for ind, item in enumerate(recipe["ingredient"]):
-                if item["item"].split(":")[1] not in self.__material_to_crafted:
-                    self.__material_to_crafted[item["item"].split(":")[1]] = [
-                        {"item": crafted, "type": recipe_type}
-                    ]
-                else:
-                    for item in self.__material_to_crafted[item["item"].split(":")[1]]:
-                        if item["item"] == crafted:
-                            break
-                    else:
-                        self.__material_to_crafted[item["item"].split(":")[1]].append(
-                            {"item": crafted, "type": recipe_type}
-                        )
-                this_recipe[ind]["recipe"][item["item"].split(":")[1]] = 1
+                material = item["item"].split(":")[1]
+                self.__builder.add_use(material, crafted, recipe_type)
+                this_recipe[ind]["recipe"][material] = 1
 
         if "tag" in recipe["ingredient"]:
-            tag = recipe["ingredient"]["tag"].split(":")[1]
-            if f"tags/items/{tag}.json" in self.__tar.getnames():
-                f = self.__tar.extractfile(f"tags/items/{tag}.json")
-                tag = json.load(f)
-                recipe_list = tag["values"]
-                for item in recipe_list:
-                    if item.startswith("#minecraft:"):
-                        recipe_list.remove(item)
-                        if (
-                            f"tags/items/{item.split(':')[1]}.json"
-                            in self.__tar.getnames()
-                        ):
-                            f = self.__tar.extractfile(
-                                f"tags/items/{item.split(':')[1]}.json"
-                            )
-                            tag = json.load(f)
-                            recipe_list.extend(tag["values"])
+            tag = self._get_tag_name(recipe["ingredient"]["tag"])
+            recipe_list = self._resolve_tag(tag)
+            if recipe_list is not None:
                 for _ in range(len(recipe_list) - 1):
                     this_recipe.append(copy.deepcopy(this_recipe[0]))
                 for ind, item_ in enumerate(recipe_list):
-                    if item_.split(":")[1] not in self.__material_to_crafted:
-                        self.__material_to_crafted[item_.split(":")[1]] = [
-                            {"item": crafted, "type": recipe_type}
-                        ]
-                    else:
-                        for item in self.__material_to_crafted[item_.split(":")[1]]:
-                            if item["item"] == crafted:
-                                break
-                        else:
-                            self.__material_to_crafted[item_.split(":")[1]].append(
-                                {"item": crafted, "type": recipe_type}
-                            )
-                    this_recipe[ind]["recipe"][item_.split(":")[1]] = 1
-        self.__crafted_to_material[crafted].extend(this_recipe)
+                    material = item_.split(":")[1]
+                    self.__builder.add_use(material, crafted, recipe_type)
+                    this_recipe[ind]["recipe"][material] = 1
+        for item in this_recipe:
+            self.__builder.add_recipe(crafted, item["recipe"], item["type"], count)
 
     def _load_recipe(self):
         """
         Load recipe from knowledge base
         """
-        for fileName in self.__tar.getnames():
+        for fileName in self._get_member_names():
             if fileName.startswith("recipes") and fileName.endswith(".json"):
                 f = self.__tar.extractfile(fileName)
                 recipe = json.load(f)
@@ -433,37 +454,14 @@ def _load_loot_table(self, loot, name):
                 if "name" not in item:
                     continue
                 item_name = item["name"].split(":")[1]
-                if item_name not in self.__crafted_to_material:
-                    self.__crafted_to_material[item_name] = [
-                        {"recipe": {name: 1}, "type": recipe_type}
-                    ]
-                else:
-                    for item_ in self.__crafted_to_material[item_name]:
-                        if item_ == {"recipe": {name: 1}, "type": recipe_type}:
-                            break
-                    else:
-                        self.__crafted_to_material[item_name].append(
-                            {"recipe": {name: 1}, "type": recipe_type}
-                        )
-                if name not in self.__material_to_crafted:
-                    self.__material_to_crafted[name] = [
-                        {"item": item_name, "type": recipe_type}
-                    ]
-                else:
-                    for item_ in self.__material_to_crafted[name]:
-                        if item_ == {"item": item_name, "type": recipe_type}:
-                            break
-                    else:
-                        self.__material_to_crafted[name].append(
-                            {"item": item_name, "type": recipe_type}
-                        )
+                self.__builder.add_drop(name, item_name, recipe_type)
 
     def _load_loot(self):
         """
         Load loot from knowledge base
         """
 
-        for fileName in self.__tar.getnames():
+        for fileName in self._get_member_names():
             if fileName.startswith("loot_tables/entities") and fileName.endswith(
                 ".json"
             ):
@@ -490,57 +488,11 @@ def _load_drop_table(self, drop, name):
                         if "name" not in child:
                             continue
                         item_name = child["name"].split(":")[1]
-                        if item_name not in self.__crafted_to_material:
-                            self.__crafted_to_material[item_name] = [
-                                {"recipe": {name: 1}, "type": recipe_type}
-                            ]
-                        else:
-                            for item_ in self.__crafted_to_material[item_name]:
-                                if item_ == {"recipe": {name: 1}, "type": recipe_type}:
-                                    break
-                            else:
-                                self.__crafted_to_material[item_name].append(
-                                    {"recipe": {name: 1}, "type": recipe_type}
-                                )
-                        if name not in self.__material_to_crafted:
-                            self.__material_to_crafted[name] = [
-                                {"item": item_name, "type": recipe_type}
-                            ]
-                        else:
-                            for item_ in self.__material_to_crafted[name]:
-                                if item_ == {"item": item_name, "type": recipe_type}:
-                                    break
-                            else:
-                                self.__material_to_crafted[name].append(
-                                    {"item": item_name, "type": recipe_type}
-                                )
+                        self.__builder.add_drop(name, item_name, recipe_type)
                 if "name" not in item:
                     continue
                 item_name = item["name"].split(":")[1]
-                if item_name not in self.__crafted_to_material:
-                    self.__crafted_to_material[item_name] = [
-                        {"recipe": {name: 1}, "type": recipe_type}
-                    ]
-                else:
-                    for item_ in self.__crafted_to_material[item_name]:
-                        if item_ == {"recipe": {name: 1}, "type": recipe_type}:
-                            break
-                    else:
-                        self.__crafted_to_material[item_name].append(
-                            {"recipe": {name: 1}, "type": recipe_type}
-                        )
-                if name not in self.__material_to_crafted:
-                    self.__material_to_crafted[name] = [
-                        {"item": item_name, "type": recipe_type}
-                    ]
-                else:
-                    for item_ in self.__material_to_crafted[name]:
-                        if item_ == {"item": item_name, "type": recipe_type}:
-                            break
-                    else:
-                        self.__material_to_crafted[name].append(
-                            {"item": item_name, "type": recipe_type}
-                        )
+                self.__builder.add_drop(name, item_name, recipe_type)
 
     def _add_condition(self, drop, name):
         if "pools" not in drop:
@@ -558,44 +510,16 @@ def _add_condition(self, drop, name):
                                 if "name" not in child:
                                     continue
                                 item_name = child["name"].split(":")[1]
-                                for item_ in self.__crafted_to_material[item_name]:
-                                    if (
-                                        item_["recipe"] == {name: 1}
-                                        and item_["type"] == "mine"
-                                    ):
-                                        if "condition" not in item_:
-                                            item_["condition"] = condition_str
-                                        else:
-                                            item_["condition"] += "," + condition_str
-                                        break
-                                for item_ in self.__material_to_crafted[name]:
-                                    if (
-                                        item_["item"] == item_name
-                                        and item_["type"] == "mine"
-                                    ):
-                                        if "condition" not in item_:
-                                            item_["condition"] = condition_str
-                                        else:
-                                            item_["condition"] += "," + condition_str
-                                        break
+                                self.__builder.add_mine_condition(
+                                    name, item_name, condition_str
+                                )
 
                         if "name" not in item:
                             continue
                         item_name = item["name"].split(":")[1]
-                        for item_ in self.__crafted_to_material[item_name]:
-                            if item_["recipe"] == {name: 1} and item_["type"] == "mine":
-                                if "condition" not in item_:
-                                    item_["condition"] = condition_str
-                                else:
-                                    item_["condition"] += "," + condition_str
-                                break
-                        for item_ in self.__material_to_crafted[name]:
-                            if item_["item"] == item_name and item_["type"] == "mine":
-                                if "condition" not in item_:
-                                    item_["condition"] = condition_str
-                                else:
-                                    item_["condition"] += "," + condition_str
-                                break
+                        self.__builder.add_mine_condition(
+                            name, item_name, condition_str
+                        )
             for item in pool["entries"]:
                 if "children" in item:
                     for child in item["children"]:
@@ -608,26 +532,9 @@ def _add_condition(self, drop, name):
                             condition_str = self._get_condition(condition)
                             if condition_str == "":
                                 continue
-                            for item_ in self.__crafted_to_material[item_name]:
-                                if (
-                                    item_["recipe"] == {name: 1}
-                                    and item_["type"] == "mine"
-                                ):
-                                    if "condition" not in item_:
-                                        item_["condition"] = condition_str
-                                    else:
-                                        item_["condition"] += "," + condition_str
-                                    break
-                            for item_ in self.__material_to_crafted[name]:
-                                if (
-                                    item_["item"] == item_name
-                                    and item_["type"] == "mine"
-                                ):
-                                    if "condition" not in item_:
-                                        item_["condition"] = condition_str
-                                    else:
-                                        item_["condition"] += "," + condition_str
-                                    break
+                            self.__builder.add_mine_condition(
+                                name, item_name, condition_str
+                            )
 
                 if "name" not in item:
                     continue
@@ -638,20 +545,7 @@ def _add_condition(self, drop, name):
                     condition_str = self._get_condition(condition)
                     if condition_str == "":
                         continue
-                    for item_ in self.__crafted_to_material[item_name]:
-                        if item_["recipe"] == {name: 1} and item_["type"] == "mine":
-                            if "condition" not in item_:
-                                item_["condition"] = condition_str
-                            else:
-                                item_["condition"] += "," + condition_str
-                            break
-                    for item_ in self.__material_to_crafted[name]:
-                        if item_["item"] == item_name and item_["type"] == "mine":
-                            if "condition" not in item_:
-                                item_["condition"] = condition_str
-                            else:
-                                item_["condition"] += "," + condition_str
-                            break
+                    self.__builder.add_mine_condition(name, item_name, condition_str)
 
     def _get_condition(self, condition):
         """
@@ -685,67 +579,44 @@ def _get_condition(self, condition):
         else:
             return ""
 
+    def _load_tool_table(self):
+        """
+        Load the tools harvesting each block from blocks.json and items.json
+        """
+        if not self._has_member("blocks.json") or not self._has_member("items.json"):
+            return
+        blocks = json.load(self.__tar.extractfile("blocks.json"))
+        items = json.load(self.__tar.extractfile("items.json"))
+        # Only pickaxes are planned for, other tools are left to conditions.
+        self.__tool_table = kb_tool_table.ToolTable(
+            blocks, items, material="mineable/pickaxe"
+        )
+
     def _add_mine_condition(self):
-        if "blocks.json" in self.__tar.getnames():
-            f = self.__tar.extractfile("blocks.json")
-            blocks = json.load(f)
-            for block in blocks:
-                if self._is_normal_block(block["name"]):
-                    if block["material"] == "mineable/pickaxe":
-                        if "harvestTools" not in block:
-                            continue
-                        condition_str = "tool: "
-                        if "737" in block["harvestTools"]:
-                            condition_str += "wooden_pickaxe"
-                        elif "742" in block["harvestTools"]:
-                            condition_str += "stone_pickaxe"
-                        elif "752" in block["harvestTools"]:
-                            condition_str += "iron_pickaxe"
-                        elif "757" in block["harvestTools"]:
-                            condition_str += "diamond_pickaxe"
-                        elif "762" in block["harvestTools"]:
-                            condition_str += "netherite_pickaxe"
-                        else:
-                            continue
-                        if block["name"] in self.__material_to_crafted:
-                            for item in self.__material_to_crafted[block["name"]]:
-                                if item["type"] == "mine":
-                                    if "condition" not in item:
-                                        item["condition"] = condition_str
-                                    else:
-                                        item["condition"] += "," + condition_str
-                                    for item_ in self.__crafted_to_material[
-                                        item["item"]
-                                    ]:
-                                        if (
-                                            item_["recipe"] == {block["name"]: 1}
-                                            and item_["type"] == "mine"
-                                        ):
-                                            if "condition" not in item_:
-                                                item_["condition"] = condition_str
-                                            else:
-                                                item_["condition"] += (
-                                                    "," + condition_str
-                                                )
-                                            break
+        for block in self.__tool_table.get_blocks():
+            if self._is_normal_block(block):
+                condition_str = f"tool: {self.__tool_table.get_minimum_tool(block)}"
+                for item_name in self.__builder.get_mine_drops(block):
+                    self.__builder.add_mine_condition(block, item_name, condition_str)
 
     def _load_drop(self):
         """
         Load drop from knowledge base
         """
-        for fileName in self.__tar.getnames():
+        # Parse each drop table once and reuse it for the conditions pass.
+        drops = []
+        for fileName in self._get_member_names():
             if fileName.endswith(".json") and fileName.startswith("loot_tables/blocks"):
-                f = self.__tar.extractfile(fileName)
-                drop = json.load(f)
-                if self._is_normal_block(fileName.split(".")[0].split("/")[-1]):
-                    self._load_drop_table(drop, fileName.split(".")[0].split("/")[-1])
+                name = fileName.split(".")[0].split("/")[-1]
+                if self._is_normal_block(name):
+                    f = self.__tar.extractfile(fileName)
+                    drops.append((json.load(f), name))
 
-        for fileName in self.__tar.getnames():
-            if fileName.endswith(".json") and fileName.startswith("loot_tables/blocks"):
-                f = self.__tar.extractfile(fileName)
-                drop = json.load(f)
-                if self._is_normal_block(fileName.split(".")[0].split("/")[-1]):
-                    self._add_condition(drop, fileName.split(".")[0].split("/")[-1])
+        for drop, name in drops:
+            self._load_drop_table(drop, name)
+
+        for drop, name in drops:
+            self._add_condition(drop, name)
 
         self._add_mine_condition()
 
@@ -755,26 +626,68 @@ def add_qa(self, question: str = "", answer: str = ""):
         :param answer: str, answer
         Add a question-answer pair to the knowledge base
         """
-        self.__qa[question] = answer
         if question == "":
             question = input("Question: ")
         if answer == "":
             answer = input("Answer: ")
-        with open(f"{self.__base_path}/qa.json", "w") as f:
-            qa = json.dumps(self.__qa, indent=4)
-            f.write(qa)
+        self.__qa.add(question, answer)
+        self.__retriever = None
 
-    def get_qa(self, key_word: str) -> dict[str, str]:
+    def get_qa(self, query: str, top_k: int = None) -> dict[str, str]:
         """
-        :param question: str, question
-        :return: str, answer
-        Get the answer of a question
+        :param query: str, keywords
+        :param top_k: int, maximum number of answers, all matches if None
+        :return: dict[str, str], the questions sharing a word with the query
+            and their answers, best match first
+        Get the answers of the questions matching a query, ranked by BM25
+        """
+        return self.__qa.get(query, top_k)
+
+    def retrieve(self, query: str, k: int = 5) -> list[str]:
+        """
+        :param query: str, the query, e.g. an observation or a goal
+        :param k: int, maximum number of facts
+        :return: list[str], the recipes, drops and question-answer pairs most
+            relevant to the query, most relevant first
+        Retrieve facts by TF-IDF cosine similarity, see retriever.Retriever.
+        The index is built on first use and rebuilt after the knowledge base
+        changes.
+        """
+        if self.__retriever is None:
+            self.__retriever = kb_retriever.Retriever(self._get_facts())
+        return [fact for fact, _ in self.__retriever.search(query, k)]
+
+    def _get_facts(self) -> list[str]:
+        """
+        :return: list[str], the recipes, drops and question-answer pairs as
+            sentences
         """
-        qa_dict = {}
-        for question in self.__qa:
-            if key_word in question:
-                qa_dict[question] = self.__qa[question]
-        return qa_dict
+        facts = []
+        crafted_to_material = self.__graph.crafted_to_material
+        for item in crafted_to_material:
+            for recipe in crafted_to_material[item]:
+                materials = ", ".join(
+                    f"{key} * {value}" for key, value in recipe["recipe"].items()
+                )
+                source = next(iter(recipe["recipe"]))
+                if recipe["type"] == "mine":
+                    fact = f"mine {source} to get {item}"
+                elif recipe["type"] == "combat":
+                    fact = f"kill {source} to get {item}"
+                elif recipe["type"] == "furnace":
+                    fact = f"smelt {materials} with furnace to get {item}"
+                elif recipe["type"] == "crafting_table":
+                    fact = f"craft {item} with crafting table from {materials}"
+                else:
+                    fact = f"craft {item} with player crafting from {materials}"
+                if "count" in recipe:
+                    fact += f", making {recipe['count']}"
+                if "condition" in recipe:
+                    fact += f", needs {recipe['condition']}"
+                facts.append(fact)
+        for question, answer in self.__qa.items():
+            facts.append(f"{question} {answer}")
+        return facts
 
     def _is_normal_block(self, block: str) -> bool:
         """
@@ -820,6 +733,7 @@ def get_task_tree(
         prev_item: str = "",
         prev_num: int = 1,
         type: str = "",
+        count: int = 1,
         max_num: int = 10,
         max_depth: int = 10,
     ) -> (TaskTree, bool):
@@ -827,30 +741,63 @@ def get_task_tree(
         :param required_item: str, name of the required item
         :return: TaskTree, the task tree, bool, find an optimal solution
         Get the task tree of a required item
+        Subtrees are memoized by (required items, remaining depth, excluded
+        parent item, type), so repeated sub-items and repeated goals share
+        their next_layer lists instead of being expanded again. The returned
+        tree is therefore a DAG whose next_layer lists must not be mutated.
         """
         task_tree = TaskTree.TaskTree()
         task_tree.prev_item = prev_item
         task_tree.prev_num = prev_num
+        task_tree.count = count
         task_tree.required_item = required_item
         task_tree.type = type
         task_tree.condition = condition
 
-        task_tree.next_layer = []
+        key = (
+            tuple(required_item.items()),
+            max_depth - current_depth,
+            prev_item,
+            type,
+            max_num,
+        )
+        if key not in self.__task_tree_cache:
+            self.__task_tree_cache[key] = self._expand_task_tree(
+                required_item, current_depth, prev_item, type, max_num, max_depth
+            )
+        task_tree.next_layer, flag = self.__task_tree_cache[key]
+
+        return task_tree, flag
+
+    def _expand_task_tree(
+        self,
+        required_item: dict[str, int],
+        current_depth: int,
+        prev_item: str,
+        type: str,
+        max_num: int,
+        max_depth: int,
+    ) -> (list[list[TaskTree]], bool):
+        """
+        :return: list[list[TaskTree]], the next layer of the task tree,
+            bool, find an optimal solution
+        Expand one layer of a task tree, see get_task_tree
+        """
+        next_layer = []
 
         if current_depth >= max_depth:
-            return task_tree, False
+            return next_layer, False
 
         if type == "combat" or type == "mine":
-            return task_tree, True
-
-        if current_depth > max_depth:
-            return task_tree, False
+            return next_layer, True
 
+        crafted_to_material = self.__graph.crafted_to_material
+        flag = False
         for item_ in required_item:
             this_recipe = []
             flag = False
-            if item_ in self.__crafted_to_material:
-                for item in self.__crafted_to_material[item_]:
+            if item_ in crafted_to_material:
+                for item in crafted_to_material[item_]:
                     if item["type"] == "mine":
                         flag = True
                         condition_str = ""
@@ -864,14 +811,16 @@ def get_task_tree(
                                 required_item=item["recipe"],
                                 condition=condition_str,
                                 type=item["type"],
+                                max_num=max_num,
+                                max_depth=max_depth,
                             )[0]
                         )
                 if flag == True:
-                    task_tree.next_layer.append(this_recipe)
+                    next_layer.append(this_recipe)
                 else:
                     flag = False
                     next_num = 0
-                    for item in self.__crafted_to_material[item_]:
+                    for item in crafted_to_material[item_]:
                         condition_str = ""
                         if prev_item in item["recipe"]:
                             continue
@@ -879,25 +828,83 @@ def get_task_tree(
                             condition_str = item["condition"]
                         newTree, flag = self.get_task_tree(
                             current_depth=current_depth + 1,
-                            required_item=item["recipe"],
+                            required_item=self._get_batch_recipe(
+                                item, required_item[item_]
+                            ),
                             prev_item=item_,
                             prev_num=required_item[item_],
                             condition=condition_str,
                             type=item["type"],
+                            count=item.get("count", 1),
+                            max_num=max_num,
+                            max_depth=max_depth,
                         )
                         if flag == True:
                             this_recipe.append(newTree)
                             next_num += 1
                             if next_num >= max_num:
                                 break
-                    task_tree.next_layer.append(this_recipe)
+                    next_layer.append(this_recipe)
 
-        return task_tree, flag
+        return next_layer, flag
+
+    def get_plan(
+        self,
+        goal: dict[str, int],
+        inventory: dict[str, int] = None,
+        action_costs: dict[str, float] = None,
+    ) -> (list[kb_planner.PlanStep], float):
+        """
+        :param goal: dict[str, int], names and numbers of the required items
+        :param inventory: dict[str, int], names and numbers of the owned items
+        :param action_costs: dict[str, float], cost of one action with each
+            type of recipe, see planner.DEFAULT_ACTION_COSTS
+        :return: list[PlanStep], the cheapest plan in execution order, float,
+            its estimated cost, math.inf if the goal is unreachable
+        Get the cheapest plan for a goal, see planner.Planner
+        """
+        if action_costs is not None:
+            return kb_planner.Planner(
+                self.__graph, action_costs, self.__tool_table
+            ).plan(goal, inventory)
+        if self.__planner is None:
+            self.__planner = kb_planner.Planner(
+                self.__graph, tool_table=self.__tool_table
+            )
+        return self.__planner.plan(goal, inventory)
+
+    def _get_batch_recipe(self, recipe: dict, num: int) -> dict[str, int]:
+        """
+        :param recipe: dict, a recipe in crafted_to_material
+        :param num: int, number of items to craft
+        :return: dict[str, int], the materials needed to craft num items
+        Crafting recipes are repeated as many times as their result count
+        requires, drops are left as they are.
+        """
+        if recipe["type"] in ("mine", "combat"):
+            return recipe["recipe"]
+        batches = -(-num // recipe.get("count", 1))
+        return {key: value * batches for key, value in recipe["recipe"].items()}
+
+    def invalidate_task_tree_cache(self):
+        """
+        Drop the memoized task trees. The cache is invalidated whenever the
+        knowledge base is loaded, call this after changing it otherwise.
+        """
+        self.__task_tree_cache = {}
+
+    @property
+    def graph(self) -> recipe_graph.RecipeGraph:
+        return self.__graph
+
+    @property
+    def tool_table(self) -> kb_tool_table.ToolTable:
+        return self.__tool_table
 
     @property
-    def material_to_crafted(self):
-        return self.__material_to_crafted
+    def material_to_crafted(self) -> recipe_graph.MaterialToCraftedView:
+        return self.__graph.material_to_crafted
 
     @property
-    def crafted_to_material(self):
-        return self.__crafted_to_material
+    def crafted_to_material(self) -> recipe_graph.CraftedToMaterialView:
+        return self.__graph.crafted_to_material
@@ -0,0 +1,348 @@
+import heapq
+import math
+
+import recipe_graph
+import tool_table as kb_tool_table
+
+# Estimated cost of one action with each type of recipe, i.e. of crafting or
+# smelting a recipe once, mining a block or killing a mob.
+DEFAULT_ACTION_COSTS = {
+    "player": 1.0,
+    "crafting_table": 1.0,
+    "furnace": 2.0,
+    "mine": 2.0,
+    "combat": 4.0,
+}
+
+# Items needed next to a recipe, without being consumed by it.
+STATIONS = {"crafting_table": "crafting_table", "furnace": "furnace"}
+
+
+class PlanStep:
+    def __init__(
+        self,
+        type: str,
+        item: str,
+        num: int,
+        recipe: dict[str, int],
+        condition: str,
+        batches: int = 1,
+    ):
+        self.type: str = type
+        self.item: str = item
+        # Number of items produced, a multiple of the recipe result count.
+        self.num: int = num
+        # Number of times the recipe is done.
+        self.batches: int = batches
+        # Materials consumed by the step in total, or the mined block or the
+        # killed mob for mine and combat steps.
+        self.recipe: dict[str, int] = recipe
+        self.condition: str = condition
+        self.cost: float = 0.0
+
+    def __str__(self) -> str:
+        material = next(iter(self.recipe), "")
+        if self.type == "mine":
+            return f"mine {self.num} {material} to get {self.item}"
+        if self.type == "combat":
+            return f"kill {material} to get {self.num} {self.item}"
+        if self.type == "furnace":
+            return f"smelt {self.num} {material} with furnace to get {self.item}"
+        if self.type == "crafting_table":
+            return f"craft {self.num} {self.item} with crafting table"
+        return f"craft {self.num} {self.item} with player crafting"
+
+    def __repr__(self) -> str:
+        return f"PlanStep({self.type}, {self.item}, {self.num}, {self.recipe})"
+
+
+class Planner:
+    """
+    A cost-based planner over a recipe graph.
+
+    The cost of an item is the cheapest cost of its recipes, and the cost of a
+    recipe is its action cost plus the costs of its materials, divided by the
+    number of items it crafts at once, plus the costs of the stations and
+    tools it requires. Costs are computed with Knuth's
+    generalization of Dijkstra's algorithm: an item is settled once all the
+    items a recipe depends on are settled, cheapest first, so every item is
+    settled at most once and cycles in the recipes cost nothing extra.
+
+    The plan then follows the cheapest recipes from the goal, aggregating the
+    quantities of every item over all the branches needing it, and batches
+    each recipe as many times as the aggregated quantity requires. Stations
+    and tools are produced once, however many steps require them.
+    """
+
+    def __init__(
+        self,
+        graph: recipe_graph.RecipeGraph,
+        action_costs=None,
+        tool_table: kb_tool_table.ToolTable = None,
+    ):
+        """
+        :param graph: RecipeGraph, the recipe graph to plan over
+        :param action_costs: dict[str, float], cost of one action with each
+            type of recipe, DEFAULT_ACTION_COSTS if None
+        :param tool_table: ToolTable, the tools harvesting each block, so that
+            a better tool in the inventory meets the requirement of a lower one
+        """
+        self.__graph = graph
+        self.__tool_table = tool_table or kb_tool_table.ToolTable()
+        self.__action_costs = dict(DEFAULT_ACTION_COSTS)
+        if action_costs is not None:
+            self.__action_costs.update(action_costs)
+
+        # Per recipe, indexed like the graph: the crafted item, the consumed
+        # materials and the items required but not consumed, or None if the
+        # recipe cannot be planned.
+        self.__recipe_item: list[int] = []
+        self.__materials: list[list[tuple[int, int]]] = []
+        self.__requirements: list[list[int]] = []
+        # Per item: the recipes depending on it, and whether as a requirement.
+        self.__dependents: dict[int, list[tuple[int, bool]]] = {}
+
+        for item_id in range(len(graph)):
+            for recipe_index in graph.get_recipe_range(item_id):
+                self._add_recipe(item_id, recipe_index)
+
+    def _add_recipe(self, item_id: int, recipe_index: int):
+        """
+        :param item_id: int, id of the crafted item
+        :param recipe_index: int, index of the recipe in the graph
+        Index the dependencies of a recipe, recipes must be added in order
+        """
+        graph = self.__graph
+        recipe_type = graph.get_recipe_type(recipe_index)
+        requirements = []
+        if recipe_type in ("mine", "combat"):
+            # The block or the mob is found in the world, not produced.
+            materials = []
+            tools = self._get_required_tools(graph.get_recipe_condition(recipe_index))
+            if tools is None:
+                requirements = None
+            else:
+                requirements = [graph.get_id(tool) for tool in tools]
+                if None in requirements:
+                    requirements = None
+        else:
+            materials = graph.get_ingredients(recipe_index)
+            if recipe_type in STATIONS:
+                requirements = [graph.get_id(STATIONS[recipe_type])]
+                if None in requirements:
+                    requirements = None
+
+        self.__recipe_item.append(item_id)
+        if requirements is None:
+            self.__materials.append(None)
+            self.__requirements.append(None)
+            return
+        self.__materials.append(materials)
+        self.__requirements.append(requirements)
+
+        for material_id, _ in materials:
+            self.__dependents.setdefault(material_id, []).append((recipe_index, False))
+        for requirement_id in requirements:
+            self.__dependents.setdefault(requirement_id, []).append(
+                (recipe_index, True)
+            )
+
+    def _get_required_tools(self, condition: str):
+        """
+        :param condition: str, condition of a mine or combat recipe
+        :return: list[str], the tools the condition requires, or None if the
+            condition cannot be met by producing items, e.g. an enchantment
+        """
+        tools = []
+        category = ""
+        for token in condition.split(","):
+            token = token.strip()
+            if token == "":
+                continue
+            negated = token.startswith("not ")
+            if negated:
+                token = token[len("not ") :]
+            if token.startswith("tool: "):
+                category = "tool"
+                token = token[len("tool: ") :]
+            elif token.startswith("enchant: "):
+                category = "enchant"
+                token = token[len("enchant: ") :]
+            elif token == "table_bonus":
+                category = ""
+                continue
+            if negated or category == "":
+                continue
+            if category == "enchant":
+                return None
+            if token not in tools:
+                tools.append(token)
+
+        # A listed pickaxe is the lowest one that works, any better one would
+        # do too, so only the first is required.
+        pickaxes = [tool for tool in tools if tool.endswith("pickaxe")]
+        return [tool for tool in tools if not tool.endswith("pickaxe")] + pickaxes[:1]
+
+    def _get_recipe_cost(
+        self, recipe_index: int, cost: list[float], owned: set[int]
+    ) -> float:
+        """
+        :return: float, the cost of a recipe once its dependencies are settled
+        """
+        recipe_type = self.__graph.get_recipe_type(recipe_index)
+        recipe_cost = self.__action_costs[recipe_type]
+        for material_id, num in self.__materials[recipe_index]:
+            recipe_cost += num * cost[material_id]
+        recipe_cost /= self.__graph.get_recipe_count(recipe_index)
+        for requirement_id in self.__requirements[recipe_index]:
+            if requirement_id not in owned:
+                recipe_cost += cost[requirement_id]
+        return recipe_cost
+
+    def _settle(self, goal_ids: set[int], owned: set[int]):
+        """
+        :param goal_ids: set[int], ids of the items to settle
+        :param owned: set[int], ids of the items in the inventory, which are
+            free as requirements
+        :return: list[float], cost of each item, list[int], cheapest recipe
+            of each item, list[int], the settled items in settling order
+        """
+        num_items = len(self.__graph)
+        cost = [math.inf] * num_items
+        best = [-1] * num_items
+        order = []
+
+        pending = []
+        heap = []
+        for recipe_index, item_id in enumerate(self.__recipe_item):
+            if self.__materials[recipe_index] is None:
+                pending.append(0)
+                continue
+            dependencies = {
+                material_id for material_id, _ in self.__materials[recipe_index]
+            }
+            dependencies.update(
+                requirement_id
+                for requirement_id in self.__requirements[recipe_index]
+                if requirement_id not in owned
+            )
+            pending.append(len(dependencies))
+            if not dependencies:
+                heapq.heappush(
+                    heap,
+                    (
+                        self._get_recipe_cost(recipe_index, cost, owned),
+                        item_id,
+                        recipe_index,
+                    ),
+                )
+
+        remaining_goals = set(goal_ids)
+        while heap and remaining_goals:
+            item_cost, item_id, recipe_index = heapq.heappop(heap)
+            if best[item_id] != -1:
+                continue
+            cost[item_id] = item_cost
+            best[item_id] = recipe_index
+            order.append(item_id)
+            remaining_goals.discard(item_id)
+
+            # An item is both a material and a requirement of some recipes,
+            # count it once for each of them.
+            seen = set()
+            for dependent, is_requirement in self.__dependents.get(item_id, []):
+                if is_requirement and item_id in owned:
+                    continue
+                if dependent in seen:
+                    continue
+                seen.add(dependent)
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    heapq.heappush(
+                        heap,
+                        (
+                            self._get_recipe_cost(dependent, cost, owned),
+                            self.__recipe_item[dependent],
+                            dependent,
+                        ),
+                    )
+
+        return cost, best, order
+
+    def plan(self, goal: dict[str, int], inventory: dict[str, int] = None):
+        """
+        :param goal: dict[str, int], names and numbers of the required items
+        :param inventory: dict[str, int], names and numbers of the items
+            already owned
+        :return: list[PlanStep], the steps in execution order, float, the
+            estimated cost of the plan, math.inf if the goal is unreachable
+        """
+        graph = self.__graph
+        inventory = inventory or {}
+        owned = {
+            graph.get_id(name)
+            for name, num in inventory.items()
+            if num > 0 and graph.get_id(name) is not None
+        }
+        for tool in self.__tool_table.get_covered_tools(inventory):
+            if graph.get_id(tool) is not None:
+                owned.add(graph.get_id(tool))
+
+        demand: dict[int, int] = {}
+        for name, num in goal.items():
+            if num <= inventory.get(name, 0):
+                continue
+            item_id = graph.get_id(name)
+            if item_id is None:
+                return [], math.inf
+            demand[item_id] = demand.get(item_id, 0) + num
+
+        cost, best, order = self._settle(set(demand), owned)
+        if any(best[item_id] == -1 for item_id in demand):
+            return [], math.inf
+
+        # Consumers are settled after the items they depend on, so walking
+        # the settling order backwards sees every demand of an item before
+        # the item itself.
+        required = set()
+        steps = []
+        for item_id in reversed(order):
+            name = graph.get_name(item_id)
+            num = demand.get(item_id, 0) - inventory.get(name, 0)
+            if num <= 0:
+                continue
+            recipe_index = best[item_id]
+            batches = -(-num // graph.get_recipe_count(recipe_index))
+            for requirement_id in self.__requirements[recipe_index]:
+                if requirement_id not in owned and requirement_id not in required:
+                    required.add(requirement_id)
+                    demand[requirement_id] = demand.get(requirement_id, 0) + 1
+            for material_id, material_num in self.__materials[recipe_index]:
+                demand[material_id] = (
+                    demand.get(material_id, 0) + material_num * batches
+                )
+
+            recipe_type = graph.get_recipe_type(recipe_index)
+            if recipe_type in ("mine", "combat"):
+                recipe = {
+                    graph.get_name(source_id): num
+                    for source_id, _ in graph.get_ingredients(recipe_index)
+                }
+            else:
+                recipe = {
+                    graph.get_name(material_id): material_num * batches
+                    for material_id, material_num in self.__materials[recipe_index]
+                }
+            step = PlanStep(
+                recipe_type,
+                name,
+                batches * graph.get_recipe_count(recipe_index),
+                recipe,
+                graph.get_recipe_condition(recipe_index),
+                batches,
+            )
+            step.cost = self.__action_costs[recipe_type] * batches
+            steps.append(step)
+
+        steps.reverse()
+        return steps, sum(step.cost for step in steps)
@@ -0,0 +1,173 @@
+import heapq
+import json
+import math
+import os
+import re
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> list[str]:
+    """
+    :param text: str, a question or a query
+    :return: list[str], the lowercase alphanumeric tokens of the text, so
+        "diamond_pickaxe" gives "diamond" and "pickaxe"
+    """
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+class QAStore:
+    """
+    Question-answer pairs with a token-level inverted index over the
+    questions.
+
+    Pairs are persisted as a compacted qa.json plus an append-only journal,
+    qa.journal, holding one JSON pair per line. Adding a pair only appends a
+    line to the journal; the journal is folded into qa.json once it has
+    grown as large as the store itself, so the cost of rewriting qa.json is
+    amortized over as many additions.
+    """
+
+    # BM25 parameters.
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, base_path: str, resume: bool = True, compact_threshold=1024):
+        """
+        :param base_path: str, directory of qa.json and qa.journal
+        :param resume: bool, load the stored pairs, or start empty and
+            discard them on the first addition
+        :param compact_threshold: int, minimum number of journal lines before
+            compacting
+        """
+        self.__json_path = f"{base_path}/qa.json"
+        self.__journal_path = f"{base_path}/qa.journal"
+        self.__compact_threshold = compact_threshold
+        self.__journal_size = 0
+        self.__discard_stored = not resume
+
+        self.__questions: list[str] = []
+        self.__answers: list[str] = []
+        self.__lengths: list[int] = []
+        self.__ids: dict[str, int] = {}
+        self.__total_length = 0
+        # A map from tokens to the ids of the questions containing them and
+        # the number of occurrences.
+        self.__postings: dict[str, dict[int, int]] = {}
+
+        if resume:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.__questions)
+
+    def _load(self):
+        """
+        Load qa.json and replay the journal
+        """
+        if os.path.exists(self.__json_path):
+            with open(self.__json_path, "r") as f:
+                for question, answer in json.load(f).items():
+                    self._index(question, answer)
+        if os.path.exists(self.__journal_path):
+            with open(self.__journal_path, "r") as f:
+                for line in f:
+                    try:
+                        question, answer = json.loads(line)
+                    except ValueError:
+                        # A torn last line from an interrupted write.
+                        break
+                    self._index(question, answer)
+                    self.__journal_size += 1
+
+    def _index(self, question: str, answer: str):
+        """
+        :param question: str, question
+        :param answer: str, answer
+        Add a pair to the index, or replace the answer of a known question
+        """
+        if question in self.__ids:
+            self.__answers[self.__ids[question]] = answer
+            return
+
+        doc_id = len(self.__questions)
+        self.__ids[question] = doc_id
+        self.__questions.append(question)
+        self.__answers.append(answer)
+        tokens = tokenize(question)
+        self.__lengths.append(len(tokens))
+        self.__total_length += len(tokens)
+        for token in tokens:
+            postings = self.__postings.setdefault(token, {})
+            postings[doc_id] = postings.get(doc_id, 0) + 1
+
+    def add(self, question: str, answer: str):
+        """
+        :param question: str, question
+        :param answer: str, answer
+        Add a question-answer pair and append it to the journal
+        """
+        if self.__discard_stored:
+            self.__discard_stored = False
+            self.compact()
+
+        self._index(question, answer)
+        with open(self.__journal_path, "a") as f:
+            f.write(json.dumps([question, answer]) + "\n")
+        self.__journal_size += 1
+
+        if self.__journal_size >= max(self.__compact_threshold, len(self)):
+            self.compact()
+
+    def compact(self):
+        """
+        Write all pairs to qa.json and empty the journal. qa.json is replaced
+        atomically, and the journal is only emptied afterwards, so a crash
+        never loses a pair.
+        """
+        tmp_path = f"{self.__json_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(dict(zip(self.__questions, self.__answers)), f, indent=4)
+        os.replace(tmp_path, self.__json_path)
+        open(self.__journal_path, "w").close()
+        self.__journal_size = 0
+
+    def get(self, query: str, top_k: int = None, rank: bool = True) -> dict[str, str]:
+        """
+        :param query: str, keywords
+        :param top_k: int, maximum number of pairs, all matches if None
+        :param rank: bool, order by BM25 score, or by insertion otherwise
+        :return: dict[str, str], the questions containing any token of the
+            query and their answers
+        """
+        scores: dict[int, float] = {}
+        num_docs = len(self.__questions)
+        average_length = self.__total_length / num_docs if num_docs else 0.0
+        for token in set(tokenize(query)):
+            postings = self.__postings.get(token)
+            if not postings:
+                continue
+            idf = math.log(1 + (num_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for doc_id, frequency in postings.items():
+                norm = self.K1 * (
+                    1 - self.B + self.B * self.__lengths[doc_id] / average_length
+                )
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (
+                    self.K1 + 1
+                ) / (frequency + norm)
+
+        if rank:
+            key = lambda doc_id: (-scores[doc_id], doc_id)
+        else:
+            key = None
+        if top_k is not None:
+            doc_ids = heapq.nsmallest(top_k, scores, key=key)
+        else:
+            doc_ids = sorted(scores, key=key)
+        return {self.__questions[doc_id]: self.__answers[doc_id] for doc_id in doc_ids}
+
+    def items(self):
+        """
+        :return: iterator of tuple[str, str], all pairs in insertion order
+        """
+        return zip(self.__questions, self.__answers)
@@ -0,0 +1,360 @@
+from array import array
+from collections.abc import Iterator, Mapping
+
+RECIPE_TYPES = ("player", "crafting_table", "furnace", "mine", "combat")
+
+# Recipes of these types are crafted from several materials. A material is
+# linked to an item it crafts once, whatever the station. Drops keep one link
+# per type instead.
+CRAFTING_TYPES = frozenset(("player", "crafting_table", "furnace"))
+
+
+class RecipeGraphBuilder:
+    """
+    A mutable recipe graph, filled while data.tar is parsed and frozen into a
+    RecipeGraph afterwards. Items, types and conditions are interned to ids,
+    and duplicate recipes and edges are rejected with sets.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        # Recipes are [crafted id, type id, [(ingredient id, count)], condition,
+        # number of items crafted].
+        self.recipes: list[list] = []
+        self.recipes_of: dict[int, list[int]] = {}
+        self.recipe_keys: set[tuple] = set()
+        # Mine recipes by (crafted id, block id), to attach conditions.
+        self.mine_recipes: dict[tuple[int, int], int] = {}
+        # Uses are [material id, crafted id, type id, condition].
+        self.uses: list[list] = []
+        self.uses_of: dict[int, list[int]] = {}
+        self.use_keys: dict[tuple, int] = {}
+
+    def intern(self, name: str) -> int:
+        """
+        :param name: str, name of an item
+        :return: int, id of the item, allocated on first use
+        """
+        item_id = self.ids.get(name)
+        if item_id is None:
+            item_id = len(self.names)
+            self.ids[name] = item_id
+            self.names.append(name)
+        return item_id
+
+    def add_recipe(
+        self, crafted: str, recipe: dict[str, int], recipe_type: str, count: int = 1
+    ):
+        """
+        :param crafted: str, name of the crafted item
+        :param recipe: dict[str, int], materials and their counts
+        :param recipe_type: str, one of RECIPE_TYPES
+        :param count: int, number of items crafted at once
+        Add a recipe unless the same one was added before
+        """
+        crafted_id = self.intern(crafted)
+        type_id = RECIPE_TYPES.index(recipe_type)
+        ingredients = [(self.intern(name), num) for name, num in recipe.items()]
+        key = (crafted_id, type_id, frozenset(ingredients))
+        if key in self.recipe_keys:
+            return
+        self.recipe_keys.add(key)
+
+        self.recipes_of.setdefault(crafted_id, []).append(len(self.recipes))
+        if recipe_type == "mine" and len(ingredients) == 1:
+            self.mine_recipes[(crafted_id, ingredients[0][0])] = len(self.recipes)
+        self.recipes.append([crafted_id, type_id, ingredients, None, count])
+
+    def add_use(self, material: str, crafted: str, recipe_type: str):
+        """
+        :param material: str, name of the material
+        :param crafted: str, name of the item crafted from the material
+        :param recipe_type: str, one of RECIPE_TYPES
+        Link a material to an item it crafts unless they are already linked
+        """
+        material_id = self.intern(material)
+        crafted_id = self.intern(crafted)
+        type_id = RECIPE_TYPES.index(recipe_type)
+        if recipe_type in CRAFTING_TYPES:
+            key = (material_id, crafted_id)
+        else:
+            key = (material_id, crafted_id, type_id)
+        if key in self.use_keys:
+            return
+        # A crafting link also blocks later crafting links of other types.
+        self.use_keys[key] = len(self.uses)
+        self.use_keys.setdefault((material_id, crafted_id), len(self.uses))
+
+        self.uses_of.setdefault(material_id, []).append(len(self.uses))
+        self.uses.append([material_id, crafted_id, type_id, None])
+
+    def add_drop(self, source: str, dropped: str, recipe_type: str):
+        """
+        :param source: str, name of the block or mob
+        :param dropped: str, name of the dropped item
+        :param recipe_type: str, "mine" or "combat"
+        Add the recipe and the link of a drop
+        """
+        self.add_recipe(dropped, {source: 1}, recipe_type)
+        self.add_use(source, dropped, recipe_type)
+
+    def add_mine_condition(self, block: str, dropped: str, condition: str):
+        """
+        :param block: str, name of the mined block
+        :param dropped: str, name of the dropped item
+        :param condition: str, the condition to append
+        Append a condition to the mine recipe and link of a drop
+        """
+        block_id = self.ids[block]
+        dropped_id = self.ids[dropped]
+        recipe = self.recipes[self.mine_recipes[(dropped_id, block_id)]]
+        recipe[3] = condition if recipe[3] is None else f"{recipe[3]},{condition}"
+        use = self.uses[
+            self.use_keys[(block_id, dropped_id, RECIPE_TYPES.index("mine"))]
+        ]
+        use[3] = condition if use[3] is None else f"{use[3]},{condition}"
+
+    def get_mine_drops(self, block: str) -> list[str]:
+        """
+        :param block: str, name of the mined block
+        :return: list[str], names of the items dropped by the block
+        """
+        block_id = self.ids.get(block)
+        mine = RECIPE_TYPES.index("mine")
+        return [
+            self.names[self.uses[use][1]]
+            for use in self.uses_of.get(block_id, [])
+            if self.uses[use][2] == mine
+        ]
+
+    def build(self) -> "RecipeGraph":
+        """
+        :return: RecipeGraph, the frozen graph
+        """
+        num_items = len(self.names)
+        conditions = [""]
+        condition_ids = {"": 0}
+
+        def intern_condition(condition):
+            if condition is None:
+                return 0
+            if condition not in condition_ids:
+                condition_ids[condition] = len(conditions)
+                conditions.append(condition)
+            return condition_ids[condition]
+
+        graph = RecipeGraph()
+        graph._names = self.names
+        graph._ids = self.ids
+        graph._conditions = conditions
+
+        # Recipes and their ingredients, grouped by crafted item.
+        graph._recipe_offsets = array("I", [0])
+        graph._recipe_types = array("B")
+        graph._recipe_conditions = array("I")
+        graph._recipe_counts = array("I")
+        graph._ingredient_offsets = array("I", [0])
+        graph._ingredient_ids = array("I")
+        graph._ingredient_counts = array("I")
+        for item_id in range(num_items):
+            for recipe_index in self.recipes_of.get(item_id, []):
+                _, type_id, ingredients, condition, count = self.recipes[recipe_index]
+                graph._recipe_types.append(type_id)
+                graph._recipe_conditions.append(intern_condition(condition))
+                graph._recipe_counts.append(count)
+                for ingredient_id, num in ingredients:
+                    graph._ingredient_ids.append(ingredient_id)
+                    graph._ingredient_counts.append(num)
+                graph._ingredient_offsets.append(len(graph._ingredient_ids))
+            graph._recipe_offsets.append(len(graph._recipe_types))
+
+        # Links from materials to crafted items, grouped by material.
+        graph._use_offsets = array("I", [0])
+        graph._use_ids = array("I")
+        graph._use_types = array("B")
+        graph._use_conditions = array("I")
+        for item_id in range(num_items):
+            for use_index in self.uses_of.get(item_id, []):
+                _, crafted_id, type_id, condition = self.uses[use_index]
+                graph._use_ids.append(crafted_id)
+                graph._use_types.append(type_id)
+                graph._use_conditions.append(intern_condition(condition))
+            graph._use_offsets.append(len(graph._use_ids))
+
+        return graph
+
+
+class RecipeGraph:
+    """
+    An immutable recipe graph. Item names are interned to integer ids and the
+    recipes and links of each item are stored as contiguous slices of flat
+    arrays (compressed sparse rows), addressed through per-item offsets.
+    """
+
+    def __init__(self):
+        self._names: list[str] = []
+        self._ids: dict[str, int] = {}
+        self._conditions: list[str] = [""]
+        self._recipe_offsets = array("I", [0])
+        self._recipe_types = array("B")
+        self._recipe_conditions = array("I")
+        self._recipe_counts = array("I")
+        self._ingredient_offsets = array("I", [0])
+        self._ingredient_ids = array("I")
+        self._ingredient_counts = array("I")
+        self._use_offsets = array("I", [0])
+        self._use_ids = array("I")
+        self._use_types = array("B")
+        self._use_conditions = array("I")
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def get_id(self, name: str):
+        """
+        :param name: str, name of an item
+        :return: int, id of the item, or None if the graph has no such item
+        """
+        return self._ids.get(name)
+
+    def get_name(self, item_id: int) -> str:
+        """
+        :param item_id: int, id of an item
+        :return: str, name of the item
+        """
+        return self._names[item_id]
+
+    def get_recipe_range(self, item_id: int) -> range:
+        """
+        :param item_id: int, id of an item
+        :return: range, indices of the recipes crafting the item
+        """
+        return range(self._recipe_offsets[item_id], self._recipe_offsets[item_id + 1])
+
+    def get_recipe_type(self, recipe_index: int) -> str:
+        return RECIPE_TYPES[self._recipe_types[recipe_index]]
+
+    def get_recipe_condition(self, recipe_index: int) -> str:
+        """
+        :return: str, the condition of the recipe, "" if it has none
+        """
+        return self._conditions[self._recipe_conditions[recipe_index]]
+
+    def get_recipe_count(self, recipe_index: int) -> int:
+        """
+        :return: int, the number of items the recipe crafts at once
+        """
+        return self._recipe_counts[recipe_index]
+
+    def get_ingredients(self, recipe_index: int) -> list[tuple[int, int]]:
+        """
+        :param recipe_index: int, index of a recipe
+        :return: list[tuple[int, int]], ids and counts of the materials
+        """
+        start = self._ingredient_offsets[recipe_index]
+        end = self._ingredient_offsets[recipe_index + 1]
+        return list(
+            zip(self._ingredient_ids[start:end], self._ingredient_counts[start:end])
+        )
+
+    def get_recipes(self, name: str) -> list[dict]:
+        """
+        :param name: str, name of an item
+        :return: list[dict], the recipes crafting the item, in the format of
+            KnowledgeBase.crafted_to_material
+        """
+        item_id = self._ids.get(name)
+        if item_id is None:
+            return []
+        recipes = []
+        for recipe_index in self.get_recipe_range(item_id):
+            recipe = {
+                "recipe": {
+                    self._names[ingredient_id]: num
+                    for ingredient_id, num in self.get_ingredients(recipe_index)
+                },
+                "type": RECIPE_TYPES[self._recipe_types[recipe_index]],
+            }
+            condition_id = self._recipe_conditions[recipe_index]
+            if condition_id:
+                recipe["condition"] = self._conditions[condition_id]
+            if self._recipe_counts[recipe_index] != 1:
+                recipe["count"] = self._recipe_counts[recipe_index]
+            recipes.append(recipe)
+        return recipes
+
+    def get_uses(self, name: str) -> list[dict]:
+        """
+        :param name: str, name of an item
+        :return: list[dict], the items crafted from the item, in the format of
+            KnowledgeBase.material_to_crafted
+        """
+        item_id = self._ids.get(name)
+        if item_id is None:
+            return []
+        uses = []
+        for use_index in range(
+            self._use_offsets[item_id], self._use_offsets[item_id + 1]
+        ):
+            use = {
+                "item": self._names[self._use_ids[use_index]],
+                "type": RECIPE_TYPES[self._use_types[use_index]],
+            }
+            condition_id = self._use_conditions[use_index]
+            if condition_id:
+                use["condition"] = self._conditions[condition_id]
+            uses.append(use)
+        return uses
+
+    @property
+    def crafted_to_material(self) -> "CraftedToMaterialView":
+        return CraftedToMaterialView(self)
+
+    @property
+    def material_to_crafted(self) -> "MaterialToCraftedView":
+        return MaterialToCraftedView(self)
+
+
+class _GraphView(Mapping):
+    """
+    A read-only mapping from item names to the dicts of one side of the graph.
+    Only items with at least one entry are keys.
+    """
+
+    def __init__(self, graph: RecipeGraph, offsets: array, getter):
+        self._graph = graph
+        self._offsets = offsets
+        self._getter = getter
+
+    def _has_entries(self, item_id: int) -> bool:
+        return self._offsets[item_id] != self._offsets[item_id + 1]
+
+    def __contains__(self, name) -> bool:
+        item_id = self._graph.get_id(name)
+        return item_id is not None and self._has_entries(item_id)
+
+    def __getitem__(self, name: str) -> list[dict]:
+        if name not in self:
+            raise KeyError(name)
+        return self._getter(name)
+
+    def __iter__(self) -> Iterator[str]:
+        for item_id in range(len(self._graph)):
+            if self._has_entries(item_id):
+                yield self._graph.get_name(item_id)
+
+    def __len__(self) -> int:
+        return sum(
+            1 for item_id in range(len(self._graph)) if self._has_entries(item_id)
+        )
+
+
+class CraftedToMaterialView(_GraphView):
+    def __init__(self, graph: RecipeGraph):
+        super().__init__(graph, graph._recipe_offsets, graph.get_recipes)
+
+
+class MaterialToCraftedView(_GraphView):
+    def __init__(self, graph: RecipeGraph):
+        super().__init__(graph, graph._use_offsets, graph.get_uses)
@@ -0,0 +1,84 @@
+import heapq
+import math
+
+from qa_store import tokenize
+
+
+class Retriever:
+    """
+    A local TF-IDF index over short text facts with top-k cosine search.
+
+    Documents and queries are sparse vectors of log-scaled term frequencies
+    weighted by smoothed inverse document frequencies and normalized to unit
+    length. The vectors are stored as an inverted index, so a query only
+    touches the documents sharing a token with it.
+    """
+
+    def __init__(self, documents: list[str]):
+        """
+        :param documents: list[str], the facts to index
+        """
+        self.__documents = documents
+        frequencies = []
+        document_frequencies: dict[str, int] = {}
+        for document in documents:
+            frequency: dict[str, int] = {}
+            for token in tokenize(document):
+                frequency[token] = frequency.get(token, 0) + 1
+            frequencies.append(frequency)
+            for token in frequency:
+                document_frequencies[token] = document_frequencies.get(token, 0) + 1
+
+        num_documents = len(documents)
+        self.__idf = {
+            token: math.log((num_documents + 1) / (document_frequency + 1)) + 1
+            for token, document_frequency in document_frequencies.items()
+        }
+
+        # A map from tokens to the ids and weights of the documents.
+        self.__postings: dict[str, list[tuple[int, float]]] = {}
+        for document_id, frequency in enumerate(frequencies):
+            for token, weight in self._get_vector(frequency).items():
+                self.__postings.setdefault(token, []).append((document_id, weight))
+
+    def __len__(self) -> int:
+        return len(self.__documents)
+
+    def _get_vector(self, frequency: dict[str, int]) -> dict[str, float]:
+        """
+        :param frequency: dict[str, int], tokens and their numbers
+        :return: dict[str, float], the unit TF-IDF vector, without unknown
+            tokens
+        """
+        vector = {
+            token: (1 + math.log(num)) * self.__idf[token]
+            for token, num in frequency.items()
+            if token in self.__idf
+        }
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {token: weight / norm for token, weight in vector.items()}
+
+    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
+        """
+        :param query: str, the query
+        :param k: int, maximum number of documents
+        :return: list[tuple[str, float]], the documents most similar to the
+            query and their cosine similarities, most similar first
+        """
+        frequency: dict[str, int] = {}
+        for token in tokenize(query):
+            frequency[token] = frequency.get(token, 0) + 1
+
+        scores: dict[int, float] = {}
+        for token, query_weight in self._get_vector(frequency).items():
+            for document_id, weight in self.__postings[token]:
+                scores[document_id] = (
+                    scores.get(document_id, 0.0) + query_weight * weight
+                )
+
+        best = heapq.nsmallest(
+            k, scores, key=lambda document_id: (-scores[document_id], document_id)
+        )
+        return [
+            (self.__documents[document_id], scores[document_id]) for document_id in best
+        ]
@@ -0,0 +1,92 @@
+import hashlib
+import os
+import pickle
+import sys
+
+# Bump whenever the layout of the snapshot content or the parsing of data.tar
+# changes.
+SNAPSHOT_VERSION = 5
+
+
+def get_snapshot_path(base_path: str, recipe: bool, loot: bool, drop: bool) -> str:
+    """
+    :param base_path: str, path to the knowledge base
+    :param recipe: whether recipes are loaded
+    :param loot: whether loot tables are loaded
+    :param drop: whether drop tables are loaded
+    :return: str, path to the snapshot of this combination of options
+    """
+    return f"{base_path}/snapshot-{int(recipe)}{int(loot)}{int(drop)}.pickle"
+
+
+def hash_file(path: str) -> str:
+    """
+    :param path: str, path to the file
+    :return: str, the SHA-256 hex digest of the file
+    """
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def load_snapshot(snapshot_path: str, tar_path: str):
+    """
+    :param snapshot_path: str, path to the snapshot
+    :param tar_path: str, path to the data.tar the snapshot was built from
+    :return: dict, the snapshot content, or None if the snapshot is missing,
+        from another version or stale
+    Load a snapshot if it is fresh. The tar is only hashed when its size or
+    modification time differs from the ones recorded in the snapshot.
+    """
+    try:
+        with open(snapshot_path, "rb") as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION:
+        return None
+
+    stat = os.stat(tar_path)
+    if (stat.st_size, stat.st_mtime_ns) != snapshot["tar_stat"]:
+        if hash_file(tar_path) != snapshot["tar_hash"]:
+            return None
+
+    return snapshot["content"]
+
+
+def save_snapshot(snapshot_path: str, tar_path: str, content: dict):
+    """
+    :param snapshot_path: str, path to the snapshot
+    :param tar_path: str, path to the data.tar the snapshot is built from
+    :param content: dict, the snapshot content
+    Save a snapshot keyed by the hash of the tar. The file is replaced
+    atomically so that concurrent readers never see a partial snapshot.
+    """
+    stat = os.stat(tar_path)
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "tar_hash": hash_file(tar_path),
+        "tar_stat": (stat.st_size, stat.st_mtime_ns),
+        "content": content,
+    }
+
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def main():
+    """
+    Build the snapshot of the default knowledge base, i.e. with recipes, loot
+    tables and drop tables loaded.
+    """
+    import knowledge_base
+
+    base_path = sys.argv[1] if len(sys.argv) > 1 else "data"
+    kb = knowledge_base.KnowledgeBase(base_path=base_path, snapshot=False)
+    print(f"saved snapshot to {kb.save_snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,29 @@
+import asyncio
+import concurrent.futures
+import io
+import json
+import multiprocessing
+import os
+import tarfile
+import tempfile
+import time
 import unittest
+from .async_planner import AsyncPlanner, _get_plan, _init_worker
 from .knowledge_base import KnowledgeBase
+from .qa_store import QAStore
+from .recipe_graph import RecipeGraphBuilder
+from .TaskTree import TaskTreeState
+from .tool_table import ToolTable
+
+# data.tar is not tracked, see README.zh.md for where to put it.
+requires_data = unittest.skipUnless(
+    os.path.exists(f"{os.path.dirname(__file__)}/data/data.tar"),
+    "data/data.tar is missing",
+)
 
 
 class KnowledgeBaseTest(unittest.TestCase):
+    @requires_data
     def test_load_nothing(self):
         kb: KnowledgeBase = KnowledgeBase()
 
@@ -10,6 +31,7 @@ def test_load_nothing(self):
 
         del kb
 
+    @requires_data
     def test_load_recipe_only(self):
         kb: KnowledgeBase = KnowledgeBase()
 
@@ -17,6 +39,329 @@ def test_load_recipe_only(self):
 
         del kb
 
+    @requires_data
+    def test_snapshot_matches_tar(self):
+        kb_from_tar = KnowledgeBase(snapshot=False)
+        kb_from_tar.save_snapshot()
+
+        kb_from_snapshot = KnowledgeBase()
+
+        self.assertEqual(
+            kb_from_snapshot.crafted_to_material, kb_from_tar.crafted_to_material
+        )
+        self.assertEqual(
+            kb_from_snapshot.material_to_crafted, kb_from_tar.material_to_crafted
+        )
+
+    def test_recipe_graph_rejects_duplicates(self):
+        builder = RecipeGraphBuilder()
+        builder.add_recipe("stick", {"oak_planks": 2}, "player")
+        builder.add_recipe("stick", {"oak_planks": 2}, "player")
+        builder.add_use("oak_planks", "stick", "player")
+        builder.add_use("oak_planks", "stick", "crafting_table")
+        builder.add_drop("oak_log", "oak_log", "mine")
+        builder.add_mine_condition("oak_log", "oak_log", "tool: wooden_axe")
+
+        graph = builder.build()
+
+        self.assertEqual(
+            graph.crafted_to_material["stick"],
+            [{"recipe": {"oak_planks": 2}, "type": "player"}],
+        )
+        self.assertEqual(
+            graph.material_to_crafted["oak_planks"],
+            [{"item": "stick", "type": "player"}],
+        )
+        self.assertEqual(
+            graph.material_to_crafted["oak_log"],
+            [{"item": "oak_log", "type": "mine", "condition": "tool: wooden_axe"}],
+        )
+        self.assertNotIn("oak_planks", graph.crafted_to_material)
+
+    def test_nested_tags_with_cycle(self):
+        tags = {
+            "a": ["minecraft:x", "#minecraft:b"],
+            # A cycle back to a, and a tag without namespace.
+            "b": ["minecraft:y", "#a"],
+            "c": ["#minecraft:b", {"id": "minecraft:z", "required": False}],
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            with tarfile.open(f"{directory}/data.tar", "w") as tar:
+                for name, values in tags.items():
+                    content = json.dumps({"values": values}).encode()
+                    info = tarfile.TarInfo(f"tags/items/{name}.json")
+                    info.size = len(content)
+                    tar.addfile(info, io.BytesIO(content))
+            kb = KnowledgeBase(
+                base_path=os.path.relpath(directory, os.path.dirname(__file__)),
+                recipe=False,
+                loot=False,
+                drop=False,
+                snapshot=False,
+            )
+
+            self.assertEqual(kb._resolve_tag("a"), ["minecraft:x", "minecraft:y"])
+            # b was cut short while a was resolved, and must not be memoized so.
+            self.assertEqual(kb._resolve_tag("b"), ["minecraft:y", "minecraft:x"])
+            self.assertEqual(
+                kb._resolve_tag("#minecraft:c"),
+                ["minecraft:y", "minecraft:x", "minecraft:z"],
+            )
+            self.assertIsNone(kb._resolve_tag("missing"))
+
+    @requires_data
+    def test_task_tree_is_memoized(self):
+        kb = KnowledgeBase()
+
+        first, _ = kb.get_task_tree({"diamond_pickaxe": 1})
+        second, _ = kb.get_task_tree({"diamond_pickaxe": 1})
+        self.assertIs(first.next_layer, second.next_layer)
+
+        kb.invalidate_task_tree_cache()
+        third, _ = kb.get_task_tree({"diamond_pickaxe": 1})
+        self.assertIsNot(first.next_layer, third.next_layer)
+
+    @requires_data
+    def test_plan_is_ordered_and_aggregated(self):
+        kb = KnowledgeBase()
+
+        steps, cost = kb.get_plan({"diamond_pickaxe": 1})
+
+        items = [step.item for step in steps]
+        self.assertEqual(items[-1], "diamond_pickaxe")
+        self.assertEqual(items.count("crafting_table"), 1)
+        self.assertEqual(len(items), len(set(items)))
+        self.assertLess(items.index("crafting_table"), items.index("wooden_pickaxe"))
+        self.assertEqual(cost, sum(step.cost for step in steps))
+
+        steps, _ = kb.get_plan({"diamond_pickaxe": 1}, {"diamond_pickaxe": 1})
+        self.assertEqual(steps, [])
+
+    @requires_data
+    def test_task_tree_state_follows_inventory(self):
+        kb = KnowledgeBase()
+        task_tree, _ = kb.get_task_tree({"diamond_pickaxe": 1})
+        state = TaskTreeState(task_tree, kb, max_num=10)
+        current_status = {}
+
+        for delta in [
+            {"oak_log": 3},
+            {"crafting_table": 1, "oak_planks": 6, "stick": 2},
+            {"wooden_pickaxe": 1, "oak_planks": -3},
+            {"stone_pickaxe": 1, "furnace": 1, "iron_ingot": 3},
+        ]:
+            for key, value in delta.items():
+                current_status[key] = current_status.get(key, 0) + value
+
+            self.assertEqual(
+                state.apply_delta(delta),
+                task_tree.get_current_action(kb, dict(current_status), max_num=10),
+            )
+
+    @requires_data
+    def test_task_tree_state_drops_used_up_items(self):
+        kb = KnowledgeBase()
+        task_tree, _ = kb.get_task_tree({"wooden_pickaxe": 1})
+        state = TaskTreeState(task_tree, kb, max_num=10)
+
+        actions = state.update({"crafting_table": 1, "oak_planks": 8, "stick": 2})
+        self.assertEqual(actions[0][0], "craft 1 wooden_pickaxe with crafting table")
+
+        # The crafting table is used up, so it has to be crafted again.
+        actions = state.apply_delta({"crafting_table": -1})
+        self.assertEqual(actions[0][0], "craft 1 crafting_table with player crafting")
+        self.assertEqual(
+            actions,
+            task_tree.get_current_action(kb, {"oak_planks": 8, "stick": 2}, max_num=10),
+        )
+
+    @requires_data
+    def test_quantities_follow_recipe_counts(self):
+        kb = KnowledgeBase()
+
+        task_tree, _ = kb.get_task_tree({"iron_pickaxe": 3})
+        self.assertEqual(
+            task_tree.next_layer[0][0].required_item, {"iron_ingot": 9, "stick": 6}
+        )
+
+        steps, _ = kb.get_plan({"stick": 8})
+        stick_step = next(step for step in steps if step.item == "stick")
+        self.assertEqual(stick_step.num, 8)
+        self.assertEqual(stick_step.batches, 2)
+
+    @requires_data
+    def test_shared_actions_are_batched_once(self):
+        kb = KnowledgeBase()
+        task_tree, _ = kb.get_task_tree({"iron_pickaxe": 1, "stone_pickaxe": 1})
+        inventory = {"cobblestone": 3, "iron_ingot": 3, "crafting_table": 1}
+
+        # Both pickaxes need 2 sticks, made by one craft from 2 planks, and the
+        # alternatives to cobblestone are not added up.
+        actions = task_tree.get_current_action(
+            kb, dict(inventory, oak_planks=2), max_num=10
+        )
+        self.assertEqual(
+            actions[0],
+            (
+                "craft 4 stick with player crafting",
+                "to craft stick, you need: oak_planks*2, ",
+            ),
+        )
+
+        # The sticks of both pickaxes need planks, although they share a node.
+        actions = task_tree.get_current_action(
+            kb, dict(inventory, oak_log=1), max_num=10
+        )
+        self.assertEqual(actions[0][0], "craft 4 oak_planks with player crafting")
+
+    def test_tool_table_follows_harvest_tools(self):
+        items = [
+            {"id": 1, "name": "wooden_pickaxe"},
+            {"id": 2, "name": "stone_pickaxe"},
+            {"id": 3, "name": "iron_pickaxe"},
+        ]
+        blocks = [
+            {
+                "name": "stone",
+                "material": "mineable/pickaxe",
+                "harvestTools": {"1": True, "2": True, "3": True},
+            },
+            {
+                "name": "iron_ore",
+                "material": "mineable/pickaxe",
+                "harvestTools": {"2": True, "3": True},
+            },
+            {"name": "dirt", "material": "mineable/shovel"},
+        ]
+
+        table = ToolTable(blocks, items, material="mineable/pickaxe")
+
+        self.assertEqual(table.get_blocks(), ["stone", "iron_ore"])
+        self.assertEqual(table.get_minimum_tool("stone"), "wooden_pickaxe")
+        self.assertEqual(table.get_minimum_tool("iron_ore"), "stone_pickaxe")
+        mask = table.get_inventory_mask({"wooden_pickaxe": 1})
+        self.assertTrue(table.can_harvest("stone", mask))
+        self.assertFalse(table.can_harvest("iron_ore", mask))
+        mask = table.get_inventory_mask({"wooden_pickaxe": 0})
+        self.assertFalse(table.can_harvest("stone", mask))
+        self.assertTrue(table.can_harvest("dirt", mask))
+        self.assertEqual(
+            table.get_covered_tools({"iron_pickaxe": 1}),
+            ["wooden_pickaxe", "stone_pickaxe", "iron_pickaxe"],
+        )
+
+    def test_qa_store_ranks_and_persists(self):
+        with tempfile.TemporaryDirectory() as base_path:
+            store = QAStore(base_path, compact_threshold=2)
+            store.add("Where can I get diamond?", "mining diamond ore")
+            store.add("What can I do with diamond?", "crafting diamond pickaxe")
+            store.add("How to craft a diamond_pickaxe?", "3 diamonds, 2 sticks")
+
+            self.assertEqual(
+                list(store.get("craft pickaxe")), ["How to craft a diamond_pickaxe?"]
+            )
+            self.assertEqual(len(store.get("diamond")), 3)
+            self.assertEqual(len(store.get("diamond", top_k=2)), 2)
+
+            store.add("Where can I get diamond?", "deep underground")
+            self.assertTrue(os.path.exists(f"{base_path}/qa.journal"))
+
+            resumed = QAStore(base_path)
+            self.assertEqual(list(resumed.items()), list(store.items()))
+            self.assertEqual(
+                resumed.get("where")["Where can I get diamond?"], "deep underground"
+            )
+
+    @requires_data
+    def test_retrieve_finds_recipes(self):
+        kb = KnowledgeBase()
+
+        facts = kb.retrieve("how to get iron ingot", k=3)
+        self.assertEqual(len(facts), 3)
+        self.assertIn("iron_ingot", facts[0])
+        self.assertEqual(kb.retrieve("", k=3), [])
+
+    @requires_data
+    def test_shared_memory_matches_loaded(self):
+        kb = KnowledgeBase()
+        name = kb.publish()
+        try:
+            attached = KnowledgeBase(shared_memory=name)
+            self.assertEqual(
+                dict(attached.crafted_to_material), dict(kb.crafted_to_material)
+            )
+            self.assertEqual(
+                dict(attached.material_to_crafted), dict(kb.material_to_crafted)
+            )
+            self.assertEqual(
+                attached.get_plan({"diamond_pickaxe": 1})[1],
+                kb.get_plan({"diamond_pickaxe": 1})[1],
+            )
+            attached.detach()
+            self.assertEqual(dict(attached.crafted_to_material), {})
+
+            # Spawned workers share the resource tracker of this process.
+            with concurrent.futures.ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=({"shared_memory": name},),
+            ) as executor:
+                steps, cost = executor.submit(
+                    _get_plan, {"diamond_pickaxe": 1}, {}
+                ).result()
+            expected_steps, expected_cost = kb.get_plan({"diamond_pickaxe": 1})
+            self.assertEqual(list(map(str, steps)), list(map(str, expected_steps)))
+            self.assertEqual(cost, expected_cost)
+            # The arena outlives the worker.
+            KnowledgeBase(shared_memory=name).detach()
+        finally:
+            kb.unpublish()
+
+    @requires_data
+    def test_async_planner_coalesces_requests(self):
+        kb = KnowledgeBase()
+
+        async def plan():
+            planner = AsyncPlanner(max_workers=1)
+            try:
+                await planner.start()
+                first = asyncio.ensure_future(planner.get_plan({"diamond_pickaxe": 1}))
+                second = asyncio.ensure_future(planner.get_plan({"diamond_pickaxe": 1}))
+                await asyncio.sleep(0)
+                self.assertEqual(planner.pending_calls, 1)
+                await asyncio.gather(first, second)
+                self.assertIs(first.result(), second.result())
+                self.assertEqual(planner.pending_calls, 0)
+                return first.result()
+            finally:
+                planner.close()
+
+        steps, cost = asyncio.run(plan())
+        expected_steps, expected_cost = kb.get_plan({"diamond_pickaxe": 1})
+        self.assertEqual(list(map(str, steps)), list(map(str, expected_steps)))
+        self.assertEqual(cost, expected_cost)
+
+    @requires_data
+    def test_async_planner_timeout_keeps_call(self):
+        async def wait():
+            planner = AsyncPlanner(max_workers=1, timeout=0.5)
+            try:
+                await planner.start()
+                first = asyncio.ensure_future(planner._call(time.sleep, 0.8))
+                await asyncio.sleep(0.4)
+                # Joins the call in flight, which the timeout of the first
+                # caller must not cancel.
+                second = asyncio.ensure_future(planner._call(time.sleep, 0.8))
+                with self.assertRaises(asyncio.TimeoutError):
+                    await first
+                self.assertIsNone(await second)
+            finally:
+                planner.close()
+
+        asyncio.run(wait())
+
+    @requires_data
     def test_task_loading(self):
         kb = KnowledgeBase()
 
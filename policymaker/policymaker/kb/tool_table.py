@@ -0,0 +1,113 @@
+class ToolTable:
+    """
+    Which tools can harvest which blocks, derived from blocks.json and
+    items.json so that it follows the data version.
+
+    Every tool gets a bit, and every block the mask of the tools harvesting
+    it, so checking whether an inventory can harvest a block is a single mask
+    test. A tool covers another one when it harvests every block the other
+    one does, e.g. an iron pickaxe covers a stone pickaxe.
+    """
+
+    def __init__(self, blocks: list[dict] = (), items: list[dict] = (), material=None):
+        """
+        :param blocks: list[dict], the blocks in blocks.json
+        :param items: list[dict], the items in items.json
+        :param material: str, only include blocks of this material, e.g.
+            "mineable/pickaxe", or all blocks if None
+        """
+        item_names = {item["id"]: item["name"] for item in items}
+
+        self.__bits: dict[str, int] = {}
+        self.__tool_ids: dict[str, int] = {}
+        self.__block_masks: dict[str, int] = {}
+        for block in blocks:
+            if material is not None and block.get("material") != material:
+                continue
+            mask = 0
+            for tool_id in block.get("harvestTools", {}):
+                tool = item_names.get(int(tool_id))
+                if tool is None:
+                    continue
+                if tool not in self.__bits:
+                    self.__bits[tool] = len(self.__bits)
+                    self.__tool_ids[tool] = int(tool_id)
+                mask |= 1 << self.__bits[tool]
+            if mask:
+                self.__block_masks[block["name"]] = mask
+
+        # Blocks harvested by each tool, as a mask over the blocks.
+        harvests = {tool: 0 for tool in self.__bits}
+        for block_bit, mask in enumerate(self.__block_masks.values()):
+            for tool, bit in self.__bits.items():
+                if mask >> bit & 1:
+                    harvests[tool] |= 1 << block_bit
+
+        self.__covers: dict[str, int] = {}
+        for tool in self.__bits:
+            self.__covers[tool] = 0
+            for other, bit in self.__bits.items():
+                if harvests[other] & ~harvests[tool] == 0:
+                    self.__covers[tool] |= 1 << bit
+
+        # The tool to get for each block is the one harvesting the fewest
+        # blocks, i.e. the lowest tier, then the one with the smallest id.
+        self.__minimum_tools: dict[str, str] = {}
+        for block, mask in self.__block_masks.items():
+            tools = [tool for tool, bit in self.__bits.items() if mask >> bit & 1]
+            self.__minimum_tools[block] = min(
+                tools,
+                key=lambda tool: (harvests[tool].bit_count(), self.__tool_ids[tool]),
+            )
+
+    def get_tools(self) -> list[str]:
+        """
+        :return: list[str], names of the tools harvesting some block
+        """
+        return list(self.__bits)
+
+    def get_blocks(self) -> list[str]:
+        """
+        :return: list[str], names of the blocks requiring a tool, in the
+            order of blocks.json
+        """
+        return list(self.__block_masks)
+
+    def get_minimum_tool(self, block: str):
+        """
+        :param block: str, name of a block
+        :return: str, the lowest tool harvesting the block, or None if the
+            block does not require a tool
+        """
+        return self.__minimum_tools.get(block)
+
+    def get_inventory_mask(self, inventory: dict) -> int:
+        """
+        :param inventory: dict, the inventory
+        :return: int, the mask of the tools in the inventory
+        """
+        mask = 0
+        for tool, bit in self.__bits.items():
+            if inventory.get(tool, 0) > 0:
+                mask |= 1 << bit
+        return mask
+
+    def can_harvest(self, block: str, inventory_mask: int) -> bool:
+        """
+        :param block: str, name of a block
+        :param inventory_mask: int, see get_inventory_mask
+        :return: bool, whether the block can be harvested with the inventory
+        """
+        mask = self.__block_masks.get(block)
+        return mask is None or mask & inventory_mask != 0
+
+    def get_covered_tools(self, inventory: dict) -> list[str]:
+        """
+        :param inventory: dict, the inventory
+        :return: list[str], the tools in the inventory and the tools they cover
+        """
+        covered = 0
+        for tool in self.__bits:
+            if inventory.get(tool, 0) > 0:
+                covered |= self.__covers[tool]
+        return [tool for tool, bit in self.__bits.items() if covered >> bit & 1]
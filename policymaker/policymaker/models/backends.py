@@ -0,0 +1,125 @@
+from typing import Callable, Dict, List, NotRequired, Optional, TypedDict
+
+from .model_wrapper import ModelWrapper
+from .openai_chat_wrapper import OpenAIChatWrapper
+from .replay_model_wrapper import ReplayModelWrapper
+
+
+class BackendOptions(TypedDict):
+    """Options for creating the model of a backend.
+
+    Attributes:
+        api_key: The API key, or None if the backend needs none.
+        model_name: The name of the model, or None for the default of the
+            backend.
+        base_url: The URL of the API of the backend.
+        replay_path: The path of the recorded answers of the replay backend.
+        record_path: The path to record the answers of the model to, for the
+            replay backend, or None not to record them.
+        max_retries: The number of times the client of the backend retries a
+            failed request.
+    """
+
+    api_key: Optional[str]
+    model_name: NotRequired[Optional[str]]
+    base_url: NotRequired[Optional[str]]
+    replay_path: NotRequired[Optional[str]]
+    record_path: NotRequired[Optional[str]]
+    max_retries: NotRequired[int]
+
+
+BackendFactory = Callable[[BackendOptions], ModelWrapper]
+
+# A map from the names of the backends to the functions creating their models.
+_backends: Dict[str, BackendFactory] = {}
+
+
+def register_backend(name: str, factory: BackendFactory):
+    """Registers a model backend.
+
+    Args:
+        name: The name of the backend.
+        factory: The function creating the model of the backend from options.
+    """
+
+    if name in _backends:
+        raise ValueError(f"backend {name} already exists")
+
+    _backends[name] = factory
+
+
+def get_backends() -> List[str]:
+    """Gets the names of the registered model backends.
+
+    Returns:
+        The names of the backends.
+    """
+
+    return list(_backends)
+
+
+def create_model(backend: str, options: BackendOptions) -> ModelWrapper:
+    """Creates the model of a backend.
+
+    Args:
+        backend: The name of the backend.
+        options: The options for the backend.
+
+    Returns:
+        The model, recording its answers if a record path is given.
+    """
+
+    factory = _backends.get(backend)
+    if factory is None:
+        raise ValueError(f"unknown model backend: {backend}")
+
+    model = factory(options)
+
+    record_path = options.get("record_path", None)
+    if record_path is not None:
+        if backend == "replay":
+            raise ValueError("the replay backend cannot be recorded")
+
+        # Prompts answered before are replayed, the others are asked and recorded.
+        model = ReplayModelWrapper(record_path, model)
+
+    return model
+
+
+def _create_openai_model(options: BackendOptions) -> ModelWrapper:
+    if options["api_key"] is None:
+        raise ValueError("the openai backend needs an API key")
+
+    return OpenAIChatWrapper(
+        options["api_key"],
+        options.get("model_name", None) or "gpt-3.5-turbo",
+        max_retries=options.get("max_retries", 2),
+    )
+
+
+def _create_local_model(options: BackendOptions) -> ModelWrapper:
+    """Creates a model served by an OpenAI-compatible server, e.g. llama.cpp or
+    vLLM."""
+
+    if options.get("base_url", None) is None:
+        raise ValueError("the local backend needs the URL of its server")
+
+    return OpenAIChatWrapper(
+        # Local servers usually ignore the key, but the client requires one.
+        options["api_key"] or "none",
+        options.get("model_name", None) or "default",
+        base_url=options["base_url"],
+        max_retries=options.get("max_retries", 2),
+    )
+
+
+def _create_replay_model(options: BackendOptions) -> ModelWrapper:
+    if options.get("replay_path", None) is None:
+        raise ValueError("the replay backend needs the path of recorded answers")
+
+    return ReplayModelWrapper(options["replay_path"])
+
+
+register_backend("openai", _create_openai_model)
+register_backend("local", _create_local_model)
+register_backend("replay", _create_replay_model)
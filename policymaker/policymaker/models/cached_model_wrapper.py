@@ -0,0 +1,207 @@
+import copy
+import hashlib
+import logging
+import re
+import sqlite3
+import time
+from collections import OrderedDict
+from typing import AsyncIterator, List, Optional, Tuple, TypedDict
+
+from .model_wrapper import ModelWrapper
+
+
+class CacheStats(TypedDict):
+    """Counters of a model cache.
+
+    Attributes:
+        hits: The number of answers served from the cache.
+        memory_hits: The number of answers served from the in-memory tier.
+        disk_hits: The number of answers served from the on-disk tier.
+        misses: The number of messages sent to the model.
+    """
+
+    hits: int
+    memory_hits: int
+    disk_hits: int
+    misses: int
+
+
+class CachedModelWrapper(ModelWrapper):
+    """Wrapper caching the answers of another model wrapper.
+
+    Messages are keyed by the hash of their normalized text, so messages
+    differing only in whitespace share an answer. Answers are kept in memory in
+    a least recently used cache, and optionally on disk in an SQLite database so
+    that they outlive the process. Answers older than the time to live are
+    not served from either tier.
+    """
+
+    _WHITESPACE_PATTERN = re.compile(r"\s+")
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        max_size: int = 256,
+        ttl: float = 60.0,
+        sqlite_path: Optional[str] = None,
+    ):
+        """
+        Args:
+            model: The model wrapper to cache the answers of.
+            max_size: The maximum number of answers kept in memory.
+            ttl: The number of seconds an answer is served for.
+            sqlite_path: The path of the SQLite database of the on-disk tier, or
+                None to keep answers in memory only.
+        """
+
+        self._model: ModelWrapper = model
+        self._max_size: int = max_size
+        self._ttl: float = ttl
+        self._logger = logging.getLogger("model_cache")
+        # A map from keys to the answer and its creation time, least recently used
+        # first.
+        self._entries: OrderedDict[str, Tuple[str, float]] = OrderedDict()
+        self._stats: CacheStats = CacheStats(
+            {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0}
+        )
+
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path is not None:
+            self._db = sqlite3.connect(sqlite_path)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers"
+                " (key TEXT PRIMARY KEY, answer TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS answers_created ON answers (created)"
+            )
+            self._db.commit()
+
+    @property
+    def stats(self) -> CacheStats:
+        """The counters of the cache."""
+
+        return CacheStats(**self._stats)
+
+    async def ask(self, message: str) -> str:
+        key = CachedModelWrapper.get_key(message)
+
+        answer = self._get(key)
+        if answer is not None:
+            self._stats["hits"] += 1
+            return answer
+
+        self._stats["misses"] += 1
+        answer = await self._model.ask(message)
+        self._put(key, answer, time.time())
+
+        return answer
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        key = CachedModelWrapper.get_key(message)
+
+        answer = self._get(key)
+        if answer is not None:
+            self._stats["hits"] += 1
+            yield answer
+            return
+
+        self._stats["misses"] += 1
+        chunks: List[str] = []
+        async for chunk in self._model.ask_stream(message):
+            chunks.append(chunk)
+            yield chunk
+
+        # Only complete answers are cached.
+        self._put(key, "".join(chunks), time.time())
+
+    def for_client(self, client: str) -> ModelWrapper:
+        # The client shares the cache, and asks the model for the client.
+        wrapper = copy.copy(self)
+        wrapper._model = self._model.for_client(client)
+
+        return wrapper
+
+    def clear(self):
+        """Removes all answers from both tiers."""
+
+        self._entries.clear()
+
+        if self._db is not None:
+            self._db.execute("DELETE FROM answers")
+            self._db.commit()
+
+    def close(self):
+        """Closes the on-disk tier."""
+
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    @staticmethod
+    def get_key(message: str) -> str:
+        """Gets the cache key of a message.
+
+        Args:
+            message: The message.
+
+        Returns:
+            The hash of the message with its whitespace collapsed.
+        """
+
+        normalized = CachedModelWrapper._WHITESPACE_PATTERN.sub(" ", message).strip()
+
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def _get(self, key: str) -> Optional[str]:
+        now = time.time()
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            answer, created = entry
+            if now - created < self._ttl:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return answer
+
+            del self._entries[key]
+
+        if self._db is not None:
+            row = self._db.execute(
+                "SELECT answer, created FROM answers WHERE key = ? AND created > ?",
+                (key, now - self._ttl),
+            ).fetchone()
+            if row is not None:
+                answer, created = row
+                self._put_memory(key, answer, created)
+                self._stats["disk_hits"] += 1
+                return answer
+
+        return None
+
+    def _put(self, key: str, answer: str, created: float):
+        self._put_memory(key, answer, created)
+
+        if self._db is not None:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?)",
+                    (key, answer, created),
+                )
+                # Expired answers are never served again, drop them on every write.
+                self._db.execute(
+                    "DELETE FROM answers WHERE created <= ?", (created - self._ttl,)
+                )
+                self._db.commit()
+
+            except sqlite3.Error as e:
+                self._logger.warning(f"failed to store an answer on disk: {e}")
+
+    def _put_memory(self, key: str, answer: str, created: float):
+        self._entries[key] = (answer, created)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
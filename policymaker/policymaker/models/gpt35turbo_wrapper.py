@@ -1,30 +1,15 @@
-from openai import AsyncOpenAI
+from .openai_chat_wrapper import OpenAIChatWrapper
 
-from .model_wrapper import ModelWrapper
 
-
-class GPT35TurboWrapper(ModelWrapper):
+class GPT35TurboWrapper(OpenAIChatWrapper):
     """Wrapper for the gpt-3.5-turbo model"""
 
-    def __init__(self, openai_api_key: str):
-        self._openai_client: AsyncOpenAI = AsyncOpenAI(
-            api_key=openai_api_key,
-        )
-
-    async def ask(self, message: str) -> str:
-        chat_completion = await self._openai_client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": message,
-                }
-            ],
-            model="gpt-3.5-turbo",
-        )
-
-        answer = chat_completion.choices[0].message.content
-
-        if answer is None:
-            raise ValueError("No answer from the model")
+    def __init__(self, openai_api_key: str, max_retries: int = 2):
+        """
+        Args:
+            openai_api_key: The OpenAI API key.
+            max_retries: The number of times the OpenAI client retries a failed
+                request.
+        """
 
-        return answer
+        super().__init__(openai_api_key, "gpt-3.5-turbo", max_retries=max_retries)
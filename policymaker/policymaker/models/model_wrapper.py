@@ -1,4 +1,5 @@
 from abc import ABC, abstractmethod
+from typing import AsyncIterator
 
 
 class ModelWrapper(ABC):
@@ -16,3 +17,33 @@ async def ask(self, message: str) -> str:
         """
 
         raise NotImplementedError
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        """Send a message to the model and iterate over the response as it is
+        generated
+
+        Models that cannot stream yield the whole response at once.
+
+        Args:
+            message: The message to send to the model
+
+        Returns:
+            An iterator over consecutive chunks of the response
+        """
+
+        yield await self.ask(message)
+
+    def for_client(self, client: str) -> "ModelWrapper":
+        """Gets the model to be used by one of several clients sharing it, e.g.
+        one of the agents of a fleet
+
+        Models that do not tell clients apart return themselves.
+
+        Args:
+            client: The name of the client
+
+        Returns:
+            The model for the client
+        """
+
+        return self
@@ -0,0 +1,71 @@
+from typing import AsyncIterator, Optional
+
+from openai import AsyncOpenAI
+
+from .model_wrapper import ModelWrapper
+
+
+class OpenAIChatWrapper(ModelWrapper):
+    """Wrapper for chat models served through the OpenAI API, or through an
+    OpenAI-compatible one such as a local llama.cpp or vLLM server"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: Optional[str] = None,
+        max_retries: int = 2,
+    ):
+        """
+        Args:
+            api_key: The API key.
+            model: The name of the model.
+            base_url: The URL of the API, or None for the OpenAI API.
+            max_retries: The number of times the OpenAI client retries a failed
+                request.
+        """
+
+        self._model: str = model
+        self._openai_client: AsyncOpenAI = AsyncOpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            max_retries=max_retries,
+        )
+
+    async def ask(self, message: str) -> str:
+        chat_completion = await self._openai_client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": message,
+                }
+            ],
+            model=self._model,
+        )
+
+        answer = chat_completion.choices[0].message.content
+
+        if answer is None:
+            raise ValueError("No answer from the model")
+
+        return answer
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        stream = await self._openai_client.chat.completions.create(
+            messages=[
+                {
+                    "role": "user",
+                    "content": message,
+                }
+            ],
+            model=self._model,
+            stream=True,
+        )
+
+        async for chunk in stream:
+            if len(chunk.choices) == 0:
+                continue
+
+            content = chunk.choices[0].delta.content
+            if content is not None and content != "":
+                yield content
@@ -0,0 +1,407 @@
+import asyncio
+import logging
+import random
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple, Type
+
+import openai
+
+from .model_wrapper import ModelWrapper
+
+
+class RateLimitedModelWrapper(ModelWrapper):
+    """Wrapper sharing another model wrapper between agents within the quotas of
+    the provider.
+
+    Requests are admitted under two token buckets, one of requests and one of
+    tokens per minute, with at most a given number of requests in flight.
+    Waiting requests are admitted round robin across clients, so that a busy
+    agent cannot starve the others; each agent asks through its own client from
+    for_client(). Requests failing with a transient error are retried after a
+    jittered exponential backoff, and a rate limit error pauses all requests.
+    Identical messages in flight are sent once and their answer is shared.
+    """
+
+    _BACKOFF_BASE: float = 0.5
+    _BACKOFF_MAX: float = 30.0
+    # The approximate number of characters per token, to estimate usage.
+    _CHARS_PER_TOKEN: int = 4
+    _DEFAULT_CLIENT: str = ""
+    _TRANSIENT_ERRORS: Tuple[Type[Exception], ...] = (
+        openai.APIConnectionError,
+        openai.InternalServerError,
+        openai.RateLimitError,
+    )
+
+    def __init__(
+        self,
+        model: ModelWrapper,
+        requests_per_minute: int = 3500,
+        tokens_per_minute: int = 90000,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+    ):
+        """
+        Args:
+            model: The model wrapper to send the messages to.
+            requests_per_minute: The quota of requests per minute, or 0 for no
+                quota.
+            tokens_per_minute: The quota of prompt and answer tokens per minute,
+                or 0 for no quota.
+            max_concurrency: The maximum number of requests in flight.
+            max_retries: The number of times a request failing with a transient
+                error is retried.
+        """
+
+        self._model: ModelWrapper = model
+        self._max_retries: int = max_retries
+        self._logger = logging.getLogger("model_limiter")
+
+        self._requests: _TokenBucket = _TokenBucket(requests_per_minute)
+        self._tokens: _TokenBucket = _TokenBucket(tokens_per_minute)
+        self._semaphore: asyncio.Semaphore = asyncio.Semaphore(max_concurrency)
+        # The monotonic time until which no request is admitted after a rate limit
+        # error.
+        self._paused_until: float = 0.0
+
+        # A map from clients to their waiting requests, the next client to be
+        # served first.
+        self._waiting: OrderedDict[str, Deque[Tuple[asyncio.Future, int]]] = (
+            OrderedDict()
+        )
+        self._dispatcher: Optional[asyncio.Task] = None
+        # A map from the messages in flight to their answers.
+        self._in_flight: Dict[str, _SharedAnswer] = {}
+
+    async def ask(self, message: str) -> str:
+        return await self._ask(message, RateLimitedModelWrapper._DEFAULT_CLIENT)
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        async for chunk in self._follow(
+            message, RateLimitedModelWrapper._DEFAULT_CLIENT, True
+        ):
+            yield chunk
+
+    def for_client(self, client: str) -> ModelWrapper:
+        return _ClientModelWrapper(self, client)
+
+    async def _ask(self, message: str, client: str) -> str:
+        chunks = [chunk async for chunk in self._follow(message, client, False)]
+
+        return "".join(chunks)
+
+    async def _follow(
+        self, message: str, client: str, stream: bool
+    ) -> AsyncIterator[str]:
+        """Iterates over the answer to a message, joining the identical request in
+        flight if any.
+
+        Args:
+            message: The message.
+            client: The client asking.
+            stream: Whether the answer is streamed if a request is sent.
+
+        Returns:
+            An iterator over consecutive chunks of the answer.
+        """
+
+        answer = self._in_flight.get(message)
+        if answer is None:
+            answer = _SharedAnswer()
+            answer.producer = asyncio.create_task(
+                self._produce(message, client, stream, answer)
+            )
+            self._in_flight[message] = answer
+
+        answer.followers += 1
+        try:
+            index = 0
+            while True:
+                changed = answer.changed
+                if index < len(answer.chunks):
+                    chunk = answer.chunks[index]
+                    index += 1
+                    yield chunk
+
+                elif answer.is_done:
+                    if answer.error is not None:
+                        raise answer.error
+                    return
+
+                else:
+                    await changed.wait()
+
+        finally:
+            # Nobody needs the answer anymore.
+            answer.followers -= 1
+            if answer.followers == 0 and not answer.producer.done():
+                answer.producer.cancel()
+
+    async def _produce(
+        self, message: str, client: str, stream: bool, answer: "_SharedAnswer"
+    ):
+        """Sends a message to the model, retrying on transient errors, and shares
+        the answer.
+
+        Args:
+            message: The message.
+            client: The client the request is admitted for.
+            stream: Whether the answer is streamed.
+            answer: The shared answer to fill.
+        """
+
+        try:
+            for attempt in range(self._max_retries + 1):
+                await self._acquire(client, self._estimate_tokens(message))
+                try:
+                    if stream:
+                        async for chunk in self._model.ask_stream(message):
+                            answer.push(chunk)
+
+                    else:
+                        answer.push(await self._model.ask(message))
+
+                    return
+
+                except RateLimitedModelWrapper._TRANSIENT_ERRORS as e:
+                    # Chunks already shared cannot be taken back.
+                    if len(answer.chunks) > 0 or attempt == self._max_retries:
+                        raise
+
+                    delay = self._get_backoff(attempt, e)
+                    self._logger.warning(
+                        f"request failed, retrying in {delay:.1f}s: {e}"
+                    )
+
+                finally:
+                    self._semaphore.release()
+                    # The answer counts against the quota as well.
+                    self._tokens.consume(self._estimate_tokens("".join(answer.chunks)))
+
+                await asyncio.sleep(delay)
+
+        except Exception as e:
+            answer.error = e
+
+        finally:
+            del self._in_flight[message]
+            answer.finish()
+
+    async def _acquire(self, client: str, tokens: int):
+        """Waits until a request of a client is admitted, and takes a slot of the
+        concurrency limit, to be released by the caller.
+
+        Args:
+            client: The client.
+            tokens: The estimated number of tokens of the request.
+        """
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(client, deque()).append((waiter, tokens))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+        try:
+            await waiter
+
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self._semaphore.release()
+            raise
+
+    async def _dispatch(self):
+        """Admits the waiting requests one by one, as slots and quotas allow."""
+
+        try:
+            while True:
+                await self._semaphore.acquire()
+
+                try:
+                    while (request := self._peek()) is not None:
+                        client, (waiter, tokens) = request
+                        delay = max(
+                            self._paused_until - time.monotonic(),
+                            self._requests.get_delay(1),
+                            self._tokens.get_delay(tokens),
+                        )
+                        if delay <= 0:
+                            break
+                        await asyncio.sleep(delay)
+
+                except BaseException:
+                    self._semaphore.release()
+                    raise
+
+                if request is None:
+                    self._semaphore.release()
+                    return
+
+                # Serve the next client next time.
+                queue = self._waiting[client]
+                queue.popleft()
+                if len(queue) > 0:
+                    self._waiting.move_to_end(client)
+                else:
+                    del self._waiting[client]
+
+                self._requests.consume(1)
+                self._tokens.consume(tokens)
+                waiter.set_result(None)
+
+        finally:
+            self._dispatcher = None
+
+    def _peek(self) -> Optional[Tuple[str, Tuple[asyncio.Future, int]]]:
+        """Gets the next request to admit, dropping cancelled ones.
+
+        Returns:
+            The client and the request, or None if no request is waiting.
+        """
+
+        while len(self._waiting) > 0:
+            client, queue = next(iter(self._waiting.items()))
+            while len(queue) > 0 and queue[0][0].done():
+                queue.popleft()
+
+            if len(queue) > 0:
+                return client, queue[0]
+
+            del self._waiting[client]
+
+        return None
+
+    def _get_backoff(self, attempt: int, error: Exception) -> float:
+        """Gets the delay before retrying a failed request.
+
+        Args:
+            attempt: The number of the failed attempt, from 0.
+            error: The error.
+
+        Returns:
+            The number of seconds to wait.
+        """
+
+        delay = random.uniform(
+            0,
+            min(
+                RateLimitedModelWrapper._BACKOFF_MAX,
+                RateLimitedModelWrapper._BACKOFF_BASE * 2**attempt,
+            ),
+        )
+
+        if isinstance(error, openai.RateLimitError):
+            try:
+                delay = max(delay, float(error.response.headers["retry-after"]))
+            except (KeyError, ValueError):
+                pass
+
+            # The quota is shared, so all requests back off.
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+        return delay
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return -(-len(text) // RateLimitedModelWrapper._CHARS_PER_TOKEN)
+
+
+class _ClientModelWrapper(ModelWrapper):
+    """A client of a rate limited model wrapper, whose requests are admitted in
+    turn with those of the other clients."""
+
+    def __init__(self, limiter: RateLimitedModelWrapper, client: str):
+        self._limiter: RateLimitedModelWrapper = limiter
+        self._client: str = client
+
+    async def ask(self, message: str) -> str:
+        return await self._limiter._ask(message, self._client)
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        async for chunk in self._limiter._follow(message, self._client, True):
+            yield chunk
+
+    def for_client(self, client: str) -> ModelWrapper:
+        return self._limiter.for_client(client)
+
+
+class _SharedAnswer:
+    """An answer being received, read by all the requests of its message."""
+
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.error: Optional[Exception] = None
+        self.followers: int = 0
+        self.is_done: bool = False
+        self.producer: Optional[asyncio.Task] = None
+        # Set and replaced whenever the answer changes.
+        self.changed: asyncio.Event = asyncio.Event()
+
+    def push(self, chunk: str):
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self):
+        self.is_done = True
+        self._notify()
+
+    def _notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+class _TokenBucket:
+    """A token bucket holding up to a minute of tokens, refilled continuously.
+
+    Amounts larger than the bucket are let through once it is full, and the
+    bucket goes into debt for them.
+    """
+
+    def __init__(self, per_minute: float):
+        """
+        Args:
+            per_minute: The number of tokens per minute, or 0 for no limit.
+        """
+
+        self._capacity: float = per_minute
+        self._rate: float = per_minute / 60.0
+        self._level: float = per_minute
+        self._updated: float = time.monotonic()
+
+    def get_delay(self, amount: float) -> float:
+        """Gets the time until an amount of tokens is available.
+
+        Args:
+            amount: The amount.
+
+        Returns:
+            The number of seconds to wait, 0 if available now.
+        """
+
+        if self._rate == 0:
+            return 0.0
+
+        self._refill()
+        missing = min(amount, self._capacity) - self._level
+
+        return max(missing, 0.0) / self._rate
+
+    def consume(self, amount: float):
+        """Takes an amount of tokens, possibly going into debt.
+
+        Args:
+            amount: The amount.
+        """
+
+        if self._rate == 0:
+            return
+
+        self._refill()
+        self._level -= amount
+
+    def _refill(self):
+        now = time.monotonic()
+        self._level = min(
+            self._capacity, self._level + (now - self._updated) * self._rate
+        )
+        self._updated = now
@@ -0,0 +1,116 @@
+import json
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+from .cached_model_wrapper import CachedModelWrapper
+from .model_wrapper import ModelWrapper
+
+
+class ReplayModelWrapper(ModelWrapper):
+    """Wrapper serving recorded answers, to run offline and deterministically.
+
+    Answers are recorded in a JSON Lines file of {"prompt": ..., "answer": ...}
+    objects, and served to the prompts equal to theirs up to whitespace. Lines
+    without a prompt form a script, whose answers are served in order, over and
+    over, to the prompts without a recorded answer. Given a model, prompts
+    without a recorded answer are asked to it instead and its answers are
+    appended to the file, so that a run recorded once can be replayed offline.
+    """
+
+    def __init__(self, path: str, model: Optional[ModelWrapper] = None):
+        """
+        Args:
+            path: The path of the recorded answers.
+            model: The model to ask and record the answers of for prompts without
+                a recorded answer, or None to serve recorded answers only.
+        """
+
+        self._path: str = path
+        self._model: Optional[ModelWrapper] = model
+        # A map from the cache keys of the prompts to their answers.
+        self._answers: Dict[str, str] = {}
+        self._script: List[str] = []
+        self._script_position: int = 0
+
+        if model is not None and not os.path.exists(path):
+            return
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip() == "":
+                    continue
+
+                record = json.loads(line)
+                if "prompt" in record:
+                    self._answers[CachedModelWrapper.get_key(record["prompt"])] = (
+                        record["answer"]
+                    )
+                else:
+                    self._script.append(record["answer"])
+
+    async def ask(self, message: str) -> str:
+        answer = self._get(message)
+        if answer is not None:
+            return answer
+
+        answer = await self._model.ask(message)
+        self._record(message, answer)
+
+        return answer
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        answer = self._get(message)
+        if answer is not None:
+            yield answer
+            return
+
+        chunks: List[str] = []
+        stream = self._model.ask_stream(message)
+        try:
+            async for chunk in stream:
+                chunks.append(chunk)
+                yield chunk
+
+        except GeneratorExit:
+            # The consumer stopped early, read the rest so that the whole answer
+            # is recorded rather than none or part of it.
+            async for chunk in stream:
+                chunks.append(chunk)
+            self._record(message, "".join(chunks))
+            raise
+
+        self._record(message, "".join(chunks))
+
+    def _get(self, message: str) -> Optional[str]:
+        """Gets the answer to serve to a message.
+
+        Args:
+            message: The message.
+
+        Returns:
+            The recorded or scripted answer, or None if the model is to be asked.
+
+        Raises:
+            ValueError: If there is no answer to serve and no model to ask.
+        """
+
+        answer = self._answers.get(CachedModelWrapper.get_key(message))
+        if answer is not None:
+            return answer
+
+        if self._model is not None:
+            return None
+
+        if len(self._script) == 0:
+            raise ValueError(f"no answer recorded in {self._path} for the prompt")
+
+        answer = self._script[self._script_position]
+        self._script_position = (self._script_position + 1) % len(self._script)
+
+        return answer
+
+    def _record(self, message: str, answer: str):
+        self._answers[CachedModelWrapper.get_key(message)] = answer
+
+        with open(self._path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"prompt": message, "answer": answer}) + "\n")
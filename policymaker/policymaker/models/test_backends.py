@@ -0,0 +1,136 @@
+import contextlib
+import json
+import os
+import tempfile
+import unittest
+from typing import AsyncIterator, List
+
+from policymaker.models import backends
+from policymaker.models.backends import BackendOptions
+from policymaker.models.model_wrapper import ModelWrapper
+from policymaker.models.replay_model_wrapper import ReplayModelWrapper
+
+
+class _StubModel(ModelWrapper):
+    """A model answering every message with its words reversed, word by word
+    when streaming."""
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    async def ask(self, message: str) -> str:
+        self.messages.append(message)
+
+        return " ".join(reversed(message.split()))
+
+    async def ask_stream(self, message: str) -> AsyncIterator[str]:
+        self.messages.append(message)
+        for index, word in enumerate(reversed(message.split())):
+            yield word if index == 0 else f" {word}"
+
+
+class BackendsTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, "answers.jsonl")
+
+        self.stub = _StubModel()
+        backends.register_backend("stub", lambda options: self.stub)
+        self.addCleanup(backends._backends.pop, "stub")
+
+    def write_records(self, records: List[dict]):
+        with open(self.path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    def read_records(self) -> List[dict]:
+        with open(self.path, "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f]
+
+    def test_registry(self):
+        self.assertEqual(backends.get_backends()[:3], ["openai", "local", "replay"])
+        self.assertIn("stub", backends.get_backends())
+        self.assertIs(backends.create_model("stub", {"api_key": None}), self.stub)
+
+        with self.assertRaises(ValueError):
+            backends.register_backend("stub", lambda options: self.stub)
+        with self.assertRaises(ValueError):
+            backends.create_model("missing", {"api_key": None})
+        with self.assertRaises(ValueError):
+            backends.create_model("openai", {"api_key": None})
+        with self.assertRaises(ValueError):
+            backends.create_model("local", {"api_key": None})
+        with self.assertRaises(ValueError):
+            backends.create_model("replay", {"api_key": None})
+
+    async def test_script_is_served_round_robin(self):
+        self.write_records(
+            [
+                {"answer": "first"},
+                {"prompt": "known", "answer": "recorded"},
+                {"answer": "second"},
+            ]
+        )
+        model = backends.create_model(
+            "replay", {"api_key": None, "replay_path": self.path}
+        )
+
+        answers = [await model.ask(f"prompt {i}") for i in range(3)]
+        answers.append(await model.ask("known"))
+        answers.append("".join([chunk async for chunk in model.ask_stream("other")]))
+
+        self.assertEqual(answers, ["first", "second", "first", "recorded", "second"])
+
+    async def test_prompts_match_up_to_whitespace(self):
+        self.write_records([{"prompt": "how to get\nwood", "answer": "mine a log"}])
+        model = ReplayModelWrapper(self.path)
+
+        self.assertEqual(await model.ask("  how to\tget wood "), "mine a log")
+        with self.assertRaises(ValueError):
+            await model.ask("how to get stone")
+
+    async def test_record_path_appends_unseen_prompts(self):
+        self.write_records([{"prompt": "seen prompt", "answer": "old"}])
+        options: BackendOptions = {"api_key": None, "record_path": self.path}
+        model = backends.create_model("stub", options)
+
+        self.assertEqual(await model.ask("seen  prompt"), "old")
+        self.assertEqual(await model.ask("new prompt"), "prompt new")
+        self.assertEqual(await model.ask("new prompt"), "prompt new")
+        streamed = [chunk async for chunk in model.ask_stream("streamed prompt")]
+
+        self.assertEqual(streamed, ["prompt", " streamed"])
+        self.assertEqual(self.stub.messages, ["new prompt", "streamed prompt"])
+        self.assertEqual(
+            self.read_records(),
+            [
+                {"prompt": "seen prompt", "answer": "old"},
+                {"prompt": "new prompt", "answer": "prompt new"},
+                {"prompt": "streamed prompt", "answer": "prompt streamed"},
+            ],
+        )
+
+        # The recording is replayed offline.
+        replay = backends.create_model(
+            "replay", {"api_key": None, "replay_path": self.path}
+        )
+        self.assertEqual(await replay.ask("streamed prompt"), "prompt streamed")
+
+        with self.assertRaises(ValueError):
+            backends.create_model(
+                "replay",
+                {"api_key": None, "replay_path": self.path, "record_path": self.path},
+            )
+
+    async def test_stream_stopped_early_is_recorded_in_full(self):
+        model = ReplayModelWrapper(self.path, self.stub)
+
+        async with contextlib.aclosing(model.ask_stream("a b c")) as stream:
+            async for chunk in stream:
+                self.assertEqual(chunk, "c")
+                break
+
+        self.assertEqual(self.read_records(), [{"prompt": "a b c", "answer": "c b a"}])
+        self.assertEqual(await model.ask("a b c"), "c b a")
+        self.assertEqual(self.stub.messages, ["a b c"])
@@ -0,0 +1,113 @@
+import os
+import tempfile
+import unittest
+from typing import List
+from unittest import mock
+
+from policymaker.models.cached_model_wrapper import CachedModelWrapper
+from policymaker.models.model_wrapper import ModelWrapper
+
+
+class _CountingModel(ModelWrapper):
+    """A model answering with the number of messages it was sent so far."""
+
+    def __init__(self):
+        self.messages: List[str] = []
+
+    async def ask(self, message: str) -> str:
+        self.messages.append(message)
+
+        return f"answer {len(self.messages)}"
+
+
+class CachedModelWrapperTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch(
+            "policymaker.models.cached_model_wrapper.time.time", lambda: self.now
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.sqlite_path = os.path.join(directory.name, "model_cache.sqlite")
+
+    async def test_whitespace_is_normalized(self):
+        model = _CountingModel()
+        cache = CachedModelWrapper(model)
+
+        first = await cache.ask("How do I  get\n wood?")
+        second = await cache.ask("  How do I get wood? ")
+        streamed = [chunk async for chunk in cache.ask_stream("How\tdo I get wood?")]
+
+        self.assertEqual(first, "answer 1")
+        self.assertEqual(second, "answer 1")
+        self.assertEqual(streamed, ["answer 1"])
+        self.assertEqual(len(model.messages), 1)
+        self.assertNotEqual(
+            CachedModelWrapper.get_key("get wood"),
+            CachedModelWrapper.get_key("getwood"),
+        )
+
+    async def test_least_recently_used_is_evicted(self):
+        model = _CountingModel()
+        cache = CachedModelWrapper(model, max_size=2)
+
+        await cache.ask("a")
+        await cache.ask("b")
+        # "a" becomes the most recently used, so "b" is evicted by "c".
+        await cache.ask("a")
+        await cache.ask("c")
+
+        self.assertEqual(await cache.ask("a"), "answer 1")
+        self.assertEqual(await cache.ask("b"), "answer 4")
+        self.assertEqual(model.messages, ["a", "b", "c", "b"])
+        self.assertEqual(cache.stats["misses"], 4)
+        self.assertEqual(cache.stats["memory_hits"], 2)
+
+    async def test_expired_answers_are_not_served(self):
+        model = _CountingModel()
+        cache = CachedModelWrapper(model, ttl=60.0)
+
+        await cache.ask("a")
+        self.now += 59.0
+        self.assertEqual(await cache.ask("a"), "answer 1")
+
+        self.now += 1.0
+        self.assertEqual(await cache.ask("a"), "answer 2")
+        self.assertEqual(len(model.messages), 2)
+
+    async def test_answers_outlive_the_process_on_disk(self):
+        model = _CountingModel()
+        cache = CachedModelWrapper(model, ttl=60.0, sqlite_path=self.sqlite_path)
+        await cache.ask("a")
+        cache.close()
+
+        # A new cache has an empty memory tier and reads the answer from disk.
+        resumed = CachedModelWrapper(model, ttl=60.0, sqlite_path=self.sqlite_path)
+        self.now += 30.0
+        self.assertEqual(await resumed.ask("  a "), "answer 1")
+        self.assertEqual(resumed.stats["disk_hits"], 1)
+        # Then from memory.
+        self.assertEqual(await resumed.ask("a"), "answer 1")
+        self.assertEqual(resumed.stats["memory_hits"], 1)
+        resumed.close()
+
+        expired = CachedModelWrapper(model, ttl=60.0, sqlite_path=self.sqlite_path)
+        self.now += 30.0
+        self.assertEqual(await expired.ask("a"), "answer 2")
+        self.assertEqual(expired.stats["disk_hits"], 0)
+        expired.close()
+
+    async def test_clear_empties_both_tiers(self):
+        model = _CountingModel()
+        cache = CachedModelWrapper(model, sqlite_path=self.sqlite_path)
+        await cache.ask("a")
+
+        cache.clear()
+        cache.close()
+
+        resumed = CachedModelWrapper(model, sqlite_path=self.sqlite_path)
+        self.assertEqual(await resumed.ask("a"), "answer 2")
+        resumed.close()
@@ -0,0 +1,147 @@
+import asyncio
+import unittest
+from typing import List, Optional, Tuple
+from unittest import mock
+
+from policymaker.models.model_wrapper import ModelWrapper
+from policymaker.models.rate_limited_model_wrapper import RateLimitedModelWrapper
+
+_sleep = asyncio.sleep
+
+
+class _FakeClock:
+    """A monotonic clock advanced by the sleeps instead of the time passing."""
+
+    _YIELDS: int = 10
+
+    def __init__(self):
+        self.now: float = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float):
+        # Let the tasks which are ready run at the current time first.
+        for _ in range(_FakeClock._YIELDS):
+            await _sleep(0)
+        self.now += max(delay, 0.0)
+
+
+class _FakeModel(ModelWrapper):
+    """A model recording when it is asked, optionally held until released."""
+
+    def __init__(self, clock: _FakeClock, answer: str = "ok"):
+        self.calls: List[Tuple[float, str]] = []
+        self.gate: Optional[asyncio.Event] = None
+        self._answer: str = answer
+        self._clock: _FakeClock = clock
+
+    async def ask(self, message: str) -> str:
+        self.calls.append((self._clock.now, message))
+        if self.gate is not None:
+            await self.gate.wait()
+
+        return self._answer
+
+
+class RateLimitedModelWrapperTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.clock = _FakeClock()
+        patchers = [
+            mock.patch(
+                "policymaker.models.rate_limited_model_wrapper.time", self.clock
+            ),
+            mock.patch("asyncio.sleep", self.clock.sleep),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_requests_per_minute_pace_requests(self):
+        model = _FakeModel(self.clock)
+        limiter = RateLimitedModelWrapper(
+            model, requests_per_minute=2, tokens_per_minute=0
+        )
+
+        answers = await asyncio.gather(*(limiter.ask(f"message {i}") for i in range(4)))
+
+        self.assertEqual(answers, ["ok"] * 4)
+        # The bucket holds two requests, then refills one every 30 seconds.
+        self.assertEqual([time for time, _ in model.calls], [0.0, 0.0, 30.0, 60.0])
+
+    async def test_tokens_per_minute_pace_requests(self):
+        model = _FakeModel(self.clock, answer="")
+        limiter = RateLimitedModelWrapper(
+            model, requests_per_minute=0, tokens_per_minute=10
+        )
+
+        # Every message of 20 characters is estimated at 5 tokens.
+        await asyncio.gather(*(limiter.ask(f"{i:020d}") for i in range(4)))
+
+        self.assertEqual([time for time, _ in model.calls], [0.0, 0.0, 30.0, 60.0])
+
+    async def test_answers_count_against_tokens(self):
+        model = _FakeModel(self.clock, answer="x" * 40)
+        limiter = RateLimitedModelWrapper(
+            model, requests_per_minute=0, tokens_per_minute=20
+        )
+
+        await limiter.ask("x" * 40)
+        await limiter.ask("y" * 40)
+
+        # The first request and its answer used up the 20 tokens.
+        self.assertEqual([time for time, _ in model.calls], [0.0, 30.0])
+
+    async def test_identical_messages_share_one_call(self):
+        model = _FakeModel(self.clock)
+        model.gate = asyncio.Event()
+        limiter = RateLimitedModelWrapper(model)
+
+        async def stream(client: ModelWrapper) -> str:
+            return "".join([chunk async for chunk in client.ask_stream("same")])
+
+        tasks = [
+            asyncio.ensure_future(limiter.for_client("a").ask("same")),
+            asyncio.ensure_future(limiter.for_client("b").ask("same")),
+            asyncio.ensure_future(stream(limiter.for_client("c"))),
+        ]
+        await _sleep(0.01)
+        model.gate.set()
+
+        self.assertEqual(await asyncio.gather(*tasks), ["ok"] * 3)
+        self.assertEqual(len(model.calls), 1)
+
+        # Once answered, the message is sent again.
+        await limiter.ask("same")
+        self.assertEqual(len(model.calls), 2)
+
+    async def test_busy_client_does_not_starve_others(self):
+        model = _FakeModel(self.clock)
+        limiter = RateLimitedModelWrapper(
+            model, requests_per_minute=0, tokens_per_minute=0, max_concurrency=1
+        )
+        busy = limiter.for_client("busy")
+        other = limiter.for_client("other")
+
+        tasks = [busy.ask(f"busy {i}") for i in range(3)] + [other.ask("other")]
+        await asyncio.gather(*tasks)
+
+        # The other client is served as soon as the first slot frees up.
+        self.assertEqual(
+            [message for _, message in model.calls],
+            ["busy 0", "other", "busy 1", "busy 2"],
+        )
+
+    async def test_cancelled_request_frees_its_slot(self):
+        model = _FakeModel(self.clock)
+        model.gate = asyncio.Event()
+        limiter = RateLimitedModelWrapper(model, max_concurrency=1)
+
+        stuck = asyncio.ensure_future(limiter.ask("stuck"))
+        await _sleep(0.01)
+        stuck.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await stuck
+
+        model.gate.set()
+        self.assertEqual(await asyncio.wait_for(limiter.ask("next"), 1), "ok")
@@ -1,75 +1,243 @@
 import asyncio
 import copy
 import logging
-from typing import Any, Optional, Tuple, TypedDict
+from typing import Any, Dict, List, NotRequired, Optional, Tuple, TypedDict
 
 import aiohttp
 import jsonschema
 
-from .agent import Agent
+from .agent import Agent, AgentOptions
 from .bot import Bot
+from .bot_apis.client import Client as BotApiClient
+from .bot_apis.validation import ValidationMode, set_validation_mode
+from .models.model_wrapper import ModelWrapper
 
 
 class PolicyMakerOptions(TypedDict):
     """Options for the policy maker.
 
     Attributes:
-        bot_host: The host of the bot.
-        bot_port: The port of the bot.
-        openai_api_key: The OpenAI API key.
+        bot_host: The host of the bot, without a registry.
+        bot_port: The port of the bot, without a registry.
+        openai_api_key: The OpenAI API key, or the API key of the local server,
+            if any.
+        registry_address: The address of the registry, or None to disable it.
+        num_bots: The number of bots to get from the registry.
+        validation_mode: How thoroughly bot API responses are validated.
+        validation_sample_rate: In sampled validation mode, validate one in this
+            many response payloads.
+        observation_max_tokens: The token budget of the observation in each
+            prompt.
+        model_cache_ttl: The number of seconds answers of the model are reused
+            for identical prompts, or 0 to disable the cache.
+        model_cache_path: The path of the SQLite database keeping answers of the
+            model across runs, or None to keep them in memory only.
+        model_requests_per_minute: The quota of requests to the model per minute,
+            or 0 for no quota.
+        model_tokens_per_minute: The quota of tokens sent to and received from the
+            model per minute, or 0 for no quota.
+        model_max_concurrency: The maximum number of requests to the model in
+            flight.
+        model_max_retries: The number of times a request to the model failing
+            with a transient error is retried.
+        model_backend: The name of the backend serving the model, see
+            models.backends.
+        model_name: The name of the model, or None for the default of the
+            backend.
+        model_base_url: The URL of the API of the local backend.
+        model_replay_path: The path of the recorded answers of the replay
+            backend.
+        model_record_path: The path to record the answers of the model to, for
+            the replay backend, or None not to record them.
     """
 
     bot_host: str
     bot_port: int
-    openai_api_key: str
+    openai_api_key: Optional[str]
     registry_address: Optional[str]
+    num_bots: NotRequired[int]
+    validation_mode: NotRequired[ValidationMode]
+    validation_sample_rate: NotRequired[int]
+    observation_max_tokens: NotRequired[int]
+    model_cache_ttl: NotRequired[float]
+    model_cache_path: NotRequired[Optional[str]]
+    model_requests_per_minute: NotRequired[int]
+    model_tokens_per_minute: NotRequired[int]
+    model_max_concurrency: NotRequired[int]
+    model_max_retries: NotRequired[int]
+    model_backend: NotRequired[str]
+    model_name: NotRequired[Optional[str]]
+    model_base_url: NotRequired[Optional[str]]
+    model_replay_path: NotRequired[Optional[str]]
+    model_record_path: NotRequired[Optional[str]]
 
 
 class PolicyMaker:
+    """A policy maker driving a fleet of bots.
+
+    Every bot is controlled by its own agent, and all of them run on one event
+    loop, sharing one HTTP session and one model client. Bots can be added and
+    removed while the policy maker is running.
+    """
+
+    # Bots are distinct hosts, so the total number of connections is only
+    # limited per host.
+    _SESSION_CONNECTION_LIMIT: int = 0
+    # The number of times the registry is asked for a bot not driven yet.
+    _REGISTRY_MAX_ATTEMPTS: int = 3
+
     def __init__(self, options: PolicyMakerOptions):
         self._options: PolicyMakerOptions = copy.deepcopy(options)
 
         self._logger = logging.getLogger("policymaker")
 
-        if options["registry_address"] is not None:
-            self._logger.info("getting bot host and port from registry...")
-            (
-                self._options["bot_host"],
-                self._options["bot_port"],
-            ) = asyncio.get_event_loop().run_until_complete(
-                PolicyMaker._get_from_registry(options["registry_address"])
-            )
-            self._logger.info(
-                f"got bot at {self._options['bot_host']}:{self._options['bot_port']}"
-            )
-
-        self._bot: Bot = Bot(
-            {
-                "host": self._options["bot_host"],
-                "port": self._options["bot_port"],
-            }
+        set_validation_mode(
+            self._options.get("validation_mode", ValidationMode.STRICT),
+            self._options.get("validation_sample_rate", None),
         )
 
-        self._agent: Agent = Agent(
-            {
-                "openai_api_key": self._options["openai_api_key"],
-            },
-            self._bot,
-        )
+        self._agent_options: AgentOptions = {
+            "openai_api_key": self._options["openai_api_key"],
+            "observation_max_tokens": self._options.get("observation_max_tokens", 256),
+            "model_cache_ttl": self._options.get("model_cache_ttl", 0),
+            "model_cache_path": self._options.get("model_cache_path", None),
+            "model_requests_per_minute": self._options.get(
+                "model_requests_per_minute", 3500
+            ),
+            "model_tokens_per_minute": self._options.get(
+                "model_tokens_per_minute", 90000
+            ),
+            "model_max_concurrency": self._options.get("model_max_concurrency", 8),
+            "model_max_retries": self._options.get("model_max_retries", 5),
+            "model_backend": self._options.get("model_backend", "openai"),
+            "model_name": self._options.get("model_name", None),
+            "model_base_url": self._options.get("model_base_url", None),
+            "model_replay_path": self._options.get("model_replay_path", None),
+            "model_record_path": self._options.get("model_record_path", None),
+        }
+        # A map from bot addresses to the bots and their agents.
+        self._bots: Dict[str, Tuple[Bot, Agent]] = {}
+        self._is_running: bool = False
+        self._model: ModelWrapper = Agent.create_model(self._agent_options)
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @property
+    def bots(self) -> List[str]:
+        """The addresses of the bots, as host:port."""
+
+        return list(self._bots)
 
     async def start(self):
         """Starts the policy maker."""
 
-        await self._bot.start()
+        if self._is_running:
+            raise RuntimeError("policy maker is already running")
 
-        await self._agent.start()
+        self._session = BotApiClient.create_session(
+            connection_limit=PolicyMaker._SESSION_CONNECTION_LIMIT
+        )
+        self._is_running = True
+
+        try:
+            if self._options["registry_address"] is None:
+                await self.add_bot(self._options["bot_host"], self._options["bot_port"])
+                return
+
+            for _ in range(self._options.get("num_bots", 1)):
+                await self._add_bot_from_registry(self._options["registry_address"])
+
+        except BaseException:
+            # Do not leave the bots started so far and the session behind.
+            await self.stop()
+            raise
 
     async def stop(self):
         """Stops the policy maker."""
 
-        await self._agent.stop()
+        if not self._is_running:
+            raise RuntimeError("policy maker is not running")
+
+        for address in list(self._bots):
+            await self.remove_bot(address)
+
+        assert self._session is not None
+        await self._session.close()
+        self._session = None
+
+        self._is_running = False
+
+    async def add_bot(self, host: str, port: int) -> str:
+        """Starts driving a bot.
+
+        Args:
+            host: The host of the bot.
+            port: The port of the bot.
+
+        Returns:
+            The address of the bot.
+        """
+
+        if not self._is_running:
+            raise RuntimeError("policy maker is not running")
 
-        await self._bot.stop()
+        address = f"{host}:{port}"
+        if address in self._bots:
+            raise RuntimeError(f"bot {address} already exists")
+
+        bot = Bot({"host": host, "port": port}, self._session)
+        # Every agent is a client of its own, so that the model is shared fairly.
+        agent = Agent(self._agent_options, bot, self._model.for_client(address))
+
+        await bot.start()
+        try:
+            await agent.start()
+
+        except BaseException:
+            await bot.stop()
+            raise
+
+        self._bots[address] = (bot, agent)
+
+        return address
+
+    async def remove_bot(self, address: str):
+        """Stops driving a bot.
+
+        Args:
+            address: The address of the bot, as returned by add_bot().
+        """
+
+        if address not in self._bots:
+            raise RuntimeError(f"bot {address} does not exist")
+
+        bot, agent = self._bots.pop(address)
+
+        await agent.stop()
+
+        await bot.stop()
+
+    async def _add_bot_from_registry(self, registry_address: str):
+        """Starts driving a bot got from the registry.
+
+        A bot already driven is not added again, and the registry is asked for
+        another one, up to a few times before the bot is skipped.
+
+        Args:
+            registry_address: The address of the registry.
+        """
+
+        for _ in range(PolicyMaker._REGISTRY_MAX_ATTEMPTS):
+            self._logger.info("getting bot host and port from registry...")
+            host, port = await self._get_from_registry(registry_address)
+            self._logger.info(f"got bot at {host}:{port}")
+
+            if f"{host}:{port}" not in self._bots:
+                await self.add_bot(host, port)
+                return
+
+            self._logger.warning(f"bot {host}:{port} already exists, asking again")
+
+        self._logger.warning("registry returned no new bot, skipping it")
 
     _API_VERSION = "0.0.0"
     _REGISTRY_POLICYMAKERS_POST_RESPONSE_SCHEMA = {
@@ -88,8 +256,7 @@ async def stop(self):
         },
     }
 
-    @staticmethod
-    async def _get_from_registry(registry_address: str) -> Tuple[str, int]:
+    async def _get_from_registry(self, registry_address: str) -> Tuple[str, int]:
         """Get the bot host and port from the registry.
 
         Args:
@@ -102,15 +269,15 @@ async def _get_from_registry(registry_address: str) -> Tuple[str, int]:
         response_data: Any = None
 
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{registry_address}/api/policymakers",
-                    json={
-                        "apiVersion": PolicyMaker._API_VERSION,
-                        "data": {},
-                    },
-                ) as response:
-                    response_data = await response.json()
+            assert self._session is not None
+            async with self._session.post(
+                f"{registry_address}/api/policymakers",
+                json={
+                    "apiVersion": PolicyMaker._API_VERSION,
+                    "data": {},
+                },
+            ) as response:
+                response_data = await response.json()
         except Exception as e:
             raise RuntimeError(f"error while getting from registry: {e}")
 
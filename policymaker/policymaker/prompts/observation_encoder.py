@@ -0,0 +1,229 @@
+import math
+from typing import Dict, List, Optional, Tuple
+
+from ..bot_apis.observation_data import Entity, ObservationData, Vec3
+
+
+class ObservationEncoder:
+    """Encodes observations as compact text for prompts.
+
+    Blocks are grouped by name with their counts, entities by name with their
+    counts and the distance to the nearest one, and the equipment by item name
+    with the total count. Names that would repeat, like display names, are
+    left out. When the text exceeds the token budget, the farthest entities
+    and then the least common blocks are dropped first.
+    """
+
+    # Approximate number of characters per token of English text.
+    _CHARS_PER_TOKEN: int = 4
+
+    # Blocks that carry no information for the agent.
+    _IGNORED_BLOCKS = frozenset(("air", "cave_air", "void_air"))
+
+    def __init__(self, max_tokens: Optional[int] = 256):
+        """
+        Args:
+            max_tokens: The token budget of the encoded observation, or None for
+                no budget.
+        """
+
+        self._max_tokens: Optional[int] = max_tokens
+
+    def encode(self, observation: ObservationData) -> str:
+        """Encodes an observation.
+
+        Args:
+            observation: The observation to encode.
+
+        Returns:
+            The encoded observation, within the token budget.
+        """
+
+        status = self._encode_status(observation)
+        equipment = self._encode_equipment(observation)
+        blocks = self._group_blocks(observation)
+        entities = self._group_entities(observation)
+
+        # Drop the entries least likely to matter until the text fits.
+        text = self._join(status, equipment, blocks, entities, 0, 0)
+        num_dropped_entities = 0
+        num_dropped_blocks = 0
+        while not self._fits(text) and num_dropped_entities < len(entities):
+            num_dropped_entities += 1
+            text = self._join(
+                status, equipment, blocks, entities, 0, num_dropped_entities
+            )
+        while not self._fits(text) and num_dropped_blocks < len(blocks):
+            num_dropped_blocks += 1
+            text = self._join(
+                status,
+                equipment,
+                blocks,
+                entities,
+                num_dropped_blocks,
+                num_dropped_entities,
+            )
+
+        return text
+
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Estimates the number of tokens of a text.
+
+        Args:
+            text: The text.
+
+        Returns:
+            The estimated number of tokens.
+        """
+
+        return math.ceil(len(text) / ObservationEncoder._CHARS_PER_TOKEN)
+
+    def _fits(self, text: str) -> bool:
+        return (
+            self._max_tokens is None
+            or ObservationEncoder.estimate_tokens(text) <= self._max_tokens
+        )
+
+    @staticmethod
+    def _join(
+        status: str,
+        equipment: str,
+        blocks: List[str],
+        entities: List[str],
+        num_dropped_blocks: int,
+        num_dropped_entities: int,
+    ) -> str:
+        lines = [status]
+
+        if equipment != "":
+            lines.append(f"equipment: {equipment}")
+
+        lines.append(
+            "blocks: " + ObservationEncoder._join_entries(blocks, num_dropped_blocks)
+        )
+
+        lines.append(
+            "entities: "
+            + ObservationEncoder._join_entries(entities, num_dropped_entities)
+        )
+
+        return "\n".join(lines)
+
+    @staticmethod
+    def _join_entries(entries: List[str], num_dropped: int) -> str:
+        kept = entries[: len(entries) - num_dropped]
+
+        if num_dropped > 0:
+            kept = kept + [f"+{num_dropped} more"]
+
+        if len(kept) == 0:
+            return "none"
+
+        return ", ".join(kept)
+
+    @staticmethod
+    def _encode_status(observation: ObservationData) -> str:
+        position = observation["entity"]["position"]
+        fields = [
+            f"position: {round(position['x'])},{round(position['y'])},"
+            f"{round(position['z'])}",
+            f"health: {round(observation['health'])}",
+            f"food: {round(observation['food'])}",
+            f"time: {'day' if observation['time']['isDay'] else 'night'}",
+        ]
+
+        if observation.get("biome") is not None:
+            fields.append(f"biome: {observation['biome']['name']}")
+
+        fields.append(f"dimension: {observation['game']['dimension']}")
+
+        if observation["isRaining"]:
+            fields.append("raining")
+
+        return "; ".join(fields)
+
+    @staticmethod
+    def _encode_equipment(observation: ObservationData) -> str:
+        counts: Dict[str, int] = {}
+        for item in observation["entity"]["equipment"]:
+            if item is not None:
+                counts[item["name"]] = counts.get(item["name"], 0) + item["count"]
+
+        return ", ".join(
+            ObservationEncoder._format_count(name, count)
+            for name, count in counts.items()
+        )
+
+    @staticmethod
+    def _group_blocks(observation: ObservationData) -> List[str]:
+        """
+        Returns:
+            The blocks with their counts, most common first.
+        """
+
+        counts: Dict[str, int] = {}
+        for block in observation["blocksNearby"]:
+            if block["name"] in ObservationEncoder._IGNORED_BLOCKS:
+                continue
+
+            counts[block["name"]] = counts.get(block["name"], 0) + block.get("count", 1)
+
+        return [
+            ObservationEncoder._format_count(name, count)
+            for name, count in sorted(counts.items(), key=lambda x: (-x[1], x[0]))
+        ]
+
+    @staticmethod
+    def _group_entities(observation: ObservationData) -> List[str]:
+        """
+        Returns:
+            The entities with their counts and the distance to the nearest one,
+            nearest first.
+        """
+
+        entities = observation["entities"]
+        if isinstance(entities, dict):
+            # The bot sends the entities keyed by id.
+            entities = list(entities.values())
+
+        self_entity = observation["entity"]
+        groups: Dict[str, Tuple[int, float]] = {}
+        for entity in entities:
+            if entity["id"] == self_entity["id"]:
+                continue
+
+            name = ObservationEncoder._get_entity_name(entity)
+            distance = ObservationEncoder._get_distance(
+                self_entity["position"], entity["position"]
+            )
+            count, nearest = groups.get(name, (0, math.inf))
+            groups[name] = (count + 1, min(nearest, distance))
+
+        return [
+            f"{ObservationEncoder._format_count(name, count)}@{round(nearest)}m"
+            for name, (count, nearest) in sorted(
+                groups.items(), key=lambda x: (x[1][1], x[0])
+            )
+        ]
+
+    @staticmethod
+    def _get_entity_name(entity: Entity) -> str:
+        # Undefined fields are left out by the bot.
+        if entity.get("name") is not None:
+            return entity["name"]
+
+        if entity.get("displayName") is not None:
+            return entity["displayName"]
+
+        return "unknown"
+
+    @staticmethod
+    def _get_distance(a: Vec3, b: Vec3) -> float:
+        return math.sqrt(
+            (a["x"] - b["x"]) ** 2 + (a["y"] - b["y"]) ** 2 + (a["z"] - b["z"]) ** 2
+        )
+
+    @staticmethod
+    def _format_count(name: str, count: int) -> str:
+        return name if count == 1 else f"{name}*{count}"
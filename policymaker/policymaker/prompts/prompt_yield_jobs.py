@@ -1,5 +1,5 @@
 import json
-from typing import Any, Dict, List, TypedDict
+from typing import Any, AsyncIterable, AsyncIterator, Dict, List, TypedDict
 
 import jsonschema
 
@@ -19,6 +19,107 @@ class Answer(TypedDict):
     items: List[AnswerItem]
 
 
+class JsonArrayStreamParser:
+    """Incremental parser of a JSON array of objects.
+
+    Text is fed chunk by chunk, and every object of the array is returned as
+    soon as its closing brace is fed. Text before the opening bracket of the
+    array, e.g. a code fence, is skipped.
+    """
+
+    def __init__(self):
+        self._buffer: str = ""
+        # The position in the buffer up to which the text was scanned.
+        self._position: int = 0
+        # The position of the opening brace of the current object.
+        self._start: int = -1
+        self._depth: int = 0
+        self._in_string: bool = False
+        self._escaped: bool = False
+        self._is_array_started: bool = False
+        self._is_array_ended: bool = False
+
+    @property
+    def is_ended(self) -> bool:
+        """Whether the closing bracket of the array was fed."""
+
+        return self._is_array_ended
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Feeds a chunk of text.
+
+        Args:
+            chunk: The chunk following the previously fed text.
+
+        Returns:
+            The objects of the array completed by the chunk.
+
+        Raises:
+            ValueError: If the text is not a JSON array of objects.
+        """
+
+        self._buffer += chunk
+        items = []
+
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer) and not self._is_array_ended:
+            char = buffer[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+
+            elif not self._is_array_started:
+                if char == "[":
+                    self._is_array_started = True
+
+            elif char == '"':
+                if self._depth == 0:
+                    raise ValueError("array items must be objects")
+                self._in_string = True
+
+            elif char in "{[":
+                if self._depth == 0:
+                    if char == "[":
+                        raise ValueError("array items must be objects")
+                    self._start = position
+                self._depth += 1
+
+            elif char in "}]":
+                if self._depth == 0:
+                    if char == "}":
+                        raise ValueError("unbalanced braces in answer")
+                    self._is_array_ended = True
+                else:
+                    self._depth -= 1
+                    if self._depth == 0:
+                        try:
+                            items.append(json.loads(buffer[self._start : position + 1]))
+                        except json.JSONDecodeError:
+                            raise ValueError("failed to parse answer item as JSON")
+
+            elif self._depth == 0 and not (char.isspace() or char == ","):
+                raise ValueError("array items must be objects")
+
+            position += 1
+
+        # Drop the text of the completed objects.
+        if self._depth == 0:
+            self._buffer = ""
+            self._position = 0
+        else:
+            self._buffer = buffer[self._start :]
+            self._position = position - self._start
+            self._start = 0
+
+        return items
+
+
 class PromptYieldJobs(Prompt):
     """Prompt for yielding jobs"""
 
@@ -78,6 +179,34 @@ def parse_answer(self, answer: str) -> Answer:
             }
         )
 
+    async def parse_answer_stream(
+        self, chunks: AsyncIterable[str]
+    ) -> AsyncIterator[AnswerItem]:
+        """Parse an answer as it is generated
+
+        Args:
+            chunks: consecutive chunks of the answer
+
+        Returns:
+            An iterator over the items of the answer, each yielded as soon as it is
+            complete
+        """
+
+        parser = JsonArrayStreamParser()
+        async for chunk in chunks:
+            for item in parser.feed(chunk):
+                # Validate the item format.
+                try:
+                    jsonschema.validate(instance=item, schema=_JSON_SCHEMA["items"])
+
+                except jsonschema.ValidationError as e:
+                    raise jsonschema.ValidationError(f"invalid answer format: {e}")
+
+                yield AnswerItem({"action": item["action"], "args": item["args"]})
+
+        if not parser.is_ended:
+            raise ValueError("failed to parse answer as JSON")
+
 
 _JSON_SCHEMA = {
     "type": "array",
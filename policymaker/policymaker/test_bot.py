@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from policymaker.bot import Bot
+from policymaker.bot_apis.test_observation_state import make_block, make_bot
+
+
+class BotTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.bot = Bot({"host": "localhost", "port": 0})
+        # Observing only needs the API client, not the event loops of start().
+        self.bot._is_running = True
+        self.post = mock.AsyncMock()
+        self.bot._api_client.post = self.post
+
+    async def test_observe_applies_deltas(self):
+        delta = {
+            "fields": {"health": 10.0},
+            "removedFields": [],
+            "entities": {},
+            "removedEntities": ["2"],
+            "blocksNearby": [make_block("gravel")],
+            "removedBlocksNearby": ["dirt"],
+        }
+        self.post.side_effect = [
+            {"revision": "1", "bot": make_bot()},
+            {"revision": "2", "baseRevision": "1", "delta": delta},
+        ]
+
+        first = await self.bot.observe()
+        second = await self.bot.observe()
+
+        self.assertIs(second, first)
+        self.assertEqual(
+            second,
+            make_bot(
+                health=10.0,
+                entities={"1": make_bot()["entities"]["1"]},
+                blocksNearby=[
+                    make_block("stone"),
+                    make_block("sand"),
+                    make_block("gravel"),
+                ],
+            ),
+        )
+        self.assertEqual(
+            self.post.await_args_list,
+            [mock.call("/observe", {}), mock.call("/observe", {"revision": "1"})],
+        )
+
+    async def test_observe_falls_back_to_full_observation(self):
+        delta = {
+            "fields": {"health": 1.0},
+            "removedFields": [],
+            "entities": {},
+            "removedEntities": [],
+            "blocksNearby": [],
+            "removedBlocksNearby": [],
+        }
+        self.post.side_effect = [
+            {"revision": "1", "bot": make_bot()},
+            # A delta from a revision the bot does not have.
+            {"revision": "3", "baseRevision": "2", "delta": delta},
+            {"revision": "4", "bot": make_bot(health=15.0)},
+        ]
+
+        await self.bot.observe()
+        with self.assertLogs("bot", "WARNING"):
+            observation = await self.bot.observe()
+
+        self.assertEqual(observation, make_bot(health=15.0))
+        self.assertEqual(self.bot._observation_state.revision, "4")
+        self.assertEqual(
+            self.post.await_args_list[1:],
+            [mock.call("/observe", {"revision": "1"}), mock.call("/observe", {})],
+        )